@@ -0,0 +1,29 @@
+"""add webhook.forward_headers
+
+Revision ID: a1f3c9d2b7e4
+Revises: fix_user_column_names
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1f3c9d2b7e4'
+down_revision: Union[str, Sequence[str], None] = 'fix_user_column_names'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('webhook', sa.Column('forward_headers', postgresql.JSON(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('webhook', 'forward_headers')
@@ -0,0 +1,28 @@
+"""add webhook.idempotency_header
+
+Revision ID: b5d8e2f61c03
+Revises: a1f3c9d2b7e4
+Create Date: 2026-10-19 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8e2f61c03'
+down_revision: Union[str, Sequence[str], None] = 'a1f3c9d2b7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('webhook', sa.Column('idempotency_header', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('webhook', 'idempotency_header')
@@ -0,0 +1,103 @@
+"""
+Compare the ASGI auth middleware with the previous BaseHTTPMiddleware version.
+
+    cd backend && poetry run python scripts/bench_auth_middleware.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+os.environ.setdefault("JWT_SECRET", "bench-secret-" + "x" * 32)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app.middleware.auth_middleware import EXEMPT_PATH_PREFIXES, AuthValidationMiddleware
+from app.utils.auth_utils import create_jwt, decode_jwt
+
+
+class LegacyAuthValidationMiddleware(BaseHTTPMiddleware):
+    """The middleware as it was before: BaseHTTPMiddleware and a full JWT decode per request."""
+
+    async def dispatch(self, request: Request, call_next: Callable[[Request], Response]) -> Response:
+        path = request.url.path
+        if request.method.upper() == "OPTIONS":
+            return await call_next(request)
+        if any(path.startswith(prefix) for prefix in EXEMPT_PATH_PREFIXES):
+            return await call_next(request)
+        if path.startswith("/api/v1/execution/") and path.endswith("/resume"):
+            return await call_next(request)
+
+        token = request.cookies.get("token")
+        user_id_cookie = request.cookies.get("user_id")
+        if not token or not user_id_cookie:
+            return JSONResponse({"detail": "Not authenticated"}, status_code=401)
+        payload = decode_jwt(token)
+        if not payload:
+            return JSONResponse({"detail": "Invalid or expired token"}, status_code=403)
+        if int(payload.get("user_id")) != int(user_id_cookie):
+            return JSONResponse({"detail": "Authentication mismatch"}, status_code=401)
+        request.state.user_id = int(payload["user_id"])
+        return await call_next(request)
+
+
+async def whoami(request: Request) -> Response:
+    return JSONResponse({"user_id": request.state.user_id})
+
+
+def build_app(middleware_class) -> Starlette:
+    return Starlette(
+        routes=[Route("/api/v1/workflow/whoami", whoami)],
+        middleware=[Middleware(middleware_class)],
+    )
+
+
+async def run(middleware_class, requests: int, concurrency: int) -> float:
+    cookies = {"token": create_jwt(1), "user_id": "1"}
+    transport = httpx.ASGITransport(app=build_app(middleware_class))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+        response = await client.get("/api/v1/workflow/whoami")
+        assert response.json() == {"user_id": 1}, response.text
+
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await client.get("/api/v1/workflow/whoami")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    for name, middleware_class in (
+        ("BaseHTTPMiddleware + decode_jwt", LegacyAuthValidationMiddleware),
+        ("ASGI + cached decode", AuthValidationMiddleware),
+    ):
+        elapsed = await run(middleware_class, args.requests, args.concurrency)
+        print(
+            f"{name:34s} {args.requests / elapsed:9.0f} req/s"
+            f"  {elapsed / args.requests * 1e6:8.1f} us/req"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
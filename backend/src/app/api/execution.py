@@ -1,5 +1,9 @@
+import os
+import uuid
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Header
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from ..core.db.db import async_get_db
@@ -12,13 +16,37 @@ from ..schemas.execution_schema import (
     NodeExecutionCreate, 
     ExecutionResponse
 )
-from ..utils.redis import add_to_execution_queue, get_execution_status
+from ..utils.redis import (
+    add_to_execution_queue,
+    get_execution_resume_token,
+    get_execution_status,
+    claim_idempotency_key,
+    release_idempotency_key,
+    request_execution_cancel,
+    request_execution_resume,
+    stream_execution_events,
+)
+from ..utils.rate_limit import enforce_admission, enforce_rate_limits, enforce_resume_rate_limit
+from ..utils.request_body import read_body
 from ..models.execution_model import Execution
-from ..schemas.execution_schema import ExecutionStatus, ExecutionStatusUpdate
+from ..schemas.execution_schema import (
+    ExecutionPriority,
+    ExecutionResume,
+    ExecutionStatus,
+    ExecutionStatusUpdate,
+)
+from ..core.db.execution_writer import DEFERRED_EXECUTION_WRITES, flush_pending_executions
 
 
 router = APIRouter(prefix="/api/v1/execution")
 
+FLUSH_LOCK_WAIT_SECONDS = 5.0
+RESUME_MAX_BODY_BYTES = int(os.getenv("RESUME_MAX_BODY_BYTES", str(64 * 1024)))
+
+# Interactive is reserved for single-node runs from the editor, where someone is
+# waiting on the result; whole-workflow runs queue alongside webhook traffic.
+WORKFLOW_RUN_PRIORITY = ExecutionPriority.WEBHOOK
+
 
 async def get_user_credentials(user_id: int, db: AsyncSession) -> dict:
     credentials_query = select(Credential).where(Credential.user_id == user_id)
@@ -42,14 +70,31 @@ async def execute_workflow(
     data: WorkflowExecutionCreate, 
     request: Request,
     db: AsyncSession = Depends(async_get_db),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
 ):
 
+    claimed = False
     try:
 
         authed_user_id = getattr(request.state, "user_id", None)
         if authed_user_id is None:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
+        execution_id = str(uuid.uuid4())
+        idempotency_scope = f"workflow:{authed_user_id}:{data.workflow_id}"
+        if idempotency_key:
+            existing_id = await claim_idempotency_key(idempotency_scope, idempotency_key, execution_id)
+            if existing_id:
+                return ExecutionResponse(
+                    execution_id=existing_id,
+                    status="duplicate",
+                    message="Workflow execution already queued for this Idempotency-Key"
+                )
+            claimed = True
+
+        await enforce_admission()
+        await enforce_rate_limits(authed_user_id, data.workflow_id)
+
         workflow_query = select(Workflow).where(
             Workflow.id == data.workflow_id,
             Workflow.user_id == authed_user_id,
@@ -77,9 +122,11 @@ async def execute_workflow(
         connections = connections_result.scalars().all()
         
         execution_data = {
+            "execution_id": execution_id,
             "user_id": authed_user_id,
             "workflow_id": data.workflow_id,
             "execution_type": data.execution_type,
+            "priority": (data.priority or WORKFLOW_RUN_PRIORITY).capped_at(WORKFLOW_RUN_PRIORITY).value,
             "workflow_name": workflow.name,
             "workflow_title": workflow.title,
             "credentials": user_credentials,
@@ -100,6 +147,9 @@ async def execute_workflow(
         
 
         execution_id = await add_to_execution_queue(execution_data)
+        # The execution is queued now; keep the claim even if recording it fails so a
+        # retry with the same key is reported as a duplicate instead of running twice.
+        claimed = False
 
         db.add(
             Execution(
@@ -119,8 +169,12 @@ async def execute_workflow(
         )
         
     except HTTPException:
+        if claimed:
+            await release_idempotency_key(idempotency_scope, idempotency_key, execution_id)
         raise
     except Exception as e:
+        if claimed:
+            await release_idempotency_key(idempotency_scope, idempotency_key, execution_id)
         raise HTTPException(
             status_code=500, 
             detail=f"Internal server error: {str(e)}"
@@ -142,6 +196,9 @@ async def execute_node(
         if authed_user_id is None:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
+        await enforce_admission()
+        await enforce_rate_limits(authed_user_id, data.workflow_id)
+
         workflow_query = select(Workflow).where(
             Workflow.id == data.workflow_id,
             Workflow.user_id == authed_user_id
@@ -176,6 +233,7 @@ async def execute_node(
             "workflow_id": data.workflow_id,
             "node_id": data.node_id,
             "execution_type": data.execution_type,
+            "priority": ExecutionPriority.INTERACTIVE.value,
             "workflow_name": workflow.name,
             "workflow_title": workflow.title,
             "credentials": user_credentials,
@@ -244,6 +302,14 @@ async def update_execution_status_endpoint(
             select(Execution).where(Execution.execution_id == data.execution_id)
         )
         execution = result.scalar_one_or_none()
+        if not execution and DEFERRED_EXECUTION_WRITES:
+            # The row may still be waiting in the deferred write batch, possibly one
+            # another instance is writing right now; wait for that flush to commit.
+            await flush_pending_executions(lock_wait_seconds=FLUSH_LOCK_WAIT_SECONDS)
+            result = await db.execute(
+                select(Execution).where(Execution.execution_id == data.execution_id)
+            )
+            execution = result.scalar_one_or_none()
         if not execution:
             raise HTTPException(status_code=404, detail="Execution not found")
 
@@ -260,6 +326,139 @@ async def update_execution_status_endpoint(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@router.post("/{execution_id}/resume", status_code=202)
+async def resume_execution_endpoint(execution_id: str, request: Request):
+    """
+    Callback for executions suspended on an external event.
+
+    Authenticated by the execution's resume token (see the resume-token route), so
+    third-party services can call it without a user session. Being open, it is
+    rate limited per client and only accepts small bodies.
+    """
+    try:
+        await enforce_resume_rate_limit(request.client.host if request.client else "unknown")
+        raw_body = await read_body(request, RESUME_MAX_BODY_BYTES)
+        try:
+            data = ExecutionResume.model_validate_json(raw_body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+
+        if not await request_execution_resume(execution_id, data.token, data.data):
+            raise HTTPException(status_code=404, detail="No waiting execution for this token")
+        return {"execution_id": execution_id, "status": "resume_requested"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/{execution_id}/resume-token")
+async def get_resume_token_endpoint(
+    execution_id: str,
+    request: Request,
+    db: AsyncSession = Depends(async_get_db),
+):
+    """The resume token of the caller's own waiting execution, for wiring up a callback."""
+    try:
+        authed_user_id = getattr(request.state, "user_id", None)
+        if authed_user_id is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+        owned = (await db.execute(
+            select(Execution.execution_id).where(
+                Execution.execution_id == execution_id,
+                Execution.user_id == authed_user_id,
+            )
+        )).scalar_one_or_none()
+        if owned is None:
+            raise HTTPException(status_code=404, detail="Execution not found")
+
+        token = await get_execution_resume_token(execution_id)
+        if token is None:
+            raise HTTPException(status_code=409, detail="Execution is not waiting")
+        return {"execution_id": execution_id, "resume_token": token}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+FINISHED_EXECUTION_STATUSES = {
+    ExecutionStatus.COMPLETED.value,
+    ExecutionStatus.FAILED.value,
+    ExecutionStatus.TIMED_OUT.value,
+    ExecutionStatus.CANCELLED.value,
+}
+
+
+@router.post("/{execution_id}/cancel", status_code=202)
+async def cancel_execution_endpoint(
+    execution_id: str,
+    request: Request,
+    db: AsyncSession = Depends(async_get_db),
+):
+    """Ask the executors to stop an execution; its status becomes cancelled once they do."""
+    try:
+        authed_user_id = getattr(request.state, "user_id", None)
+        if authed_user_id is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+        query = select(Execution).where(
+            Execution.execution_id == execution_id,
+            Execution.user_id == authed_user_id,
+        )
+        execution = (await db.execute(query)).scalar_one_or_none()
+        if execution is None and DEFERRED_EXECUTION_WRITES:
+            await flush_pending_executions(lock_wait_seconds=FLUSH_LOCK_WAIT_SECONDS)
+            execution = (await db.execute(query)).scalar_one_or_none()
+        if execution is None:
+            raise HTTPException(status_code=404, detail="Execution not found")
+        if execution.status in FINISHED_EXECUTION_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Execution already {execution.status}")
+
+        await request_execution_cancel(execution_id)
+        return {"execution_id": execution_id, "status": "cancel_requested"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/{execution_id}/stream/{node_id}")
+async def stream_execution_endpoint(
+    execution_id: str,
+    node_id: str,
+    request: Request,
+    db: AsyncSession = Depends(async_get_db),
+):
+    """Live tokens of an ai_agent node run with "stream": true, as server-sent events."""
+    try:
+        authed_user_id = getattr(request.state, "user_id", None)
+        if authed_user_id is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+        query = select(Execution.execution_id).where(
+            Execution.execution_id == execution_id,
+            Execution.user_id == authed_user_id,
+        )
+        owned = (await db.execute(query)).scalar_one_or_none()
+        if owned is None and DEFERRED_EXECUTION_WRITES:
+            await flush_pending_executions(lock_wait_seconds=FLUSH_LOCK_WAIT_SECONDS)
+            owned = (await db.execute(query)).scalar_one_or_none()
+        if owned is None:
+            raise HTTPException(status_code=404, detail="Execution not found")
+
+        return StreamingResponse(
+            stream_execution_events(execution_id, node_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 @router.get("/list")
 async def list_executions(
     request: Request,
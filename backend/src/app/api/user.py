@@ -4,7 +4,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..models.user_model import User
-from ..utils.auth_utils import hash_password, verify_password, create_jwt, decode_jwt
+from ..utils.auth_utils import (
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
+    create_jwt,
+    decode_jwt,
+)
 from ..core.db.db import async_get_db
 from ..schemas.user_schema import UserCreate, UserRead, UserSignIn
 
@@ -23,7 +29,7 @@ async def register_user(
         if existingUser:
             raise HTTPException(status_code=400, detail="User already exists")
 
-        hashed_pw = hash_password(user.password)
+        hashed_pw = await hash_password_async(user.password)
         new_user = User(
             email=user.email,
             password=hashed_pw,
@@ -64,9 +70,14 @@ async def login_user(
         result = await db.execute(select(User).where(User.email == user.email))
         db_user = result.scalar_one_or_none()
 
-        if not db_user or not verify_password(user.password, db_user.password):
+        if not db_user or not await verify_password_async(user.password, db_user.password):
             raise HTTPException(status_code=400, detail="Invalid credentials")
 
+        if password_needs_rehash(db_user.password):
+            # BCRYPT_ROUNDS changed since this hash was made.
+            db_user.password = await hash_password_async(user.password)
+            await db.commit()
+
         token = create_jwt(db_user.id)
         cookie_kwargs = {
             "httponly": True,
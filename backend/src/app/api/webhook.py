@@ -1,8 +1,12 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 import hmac
 import hashlib
+import orjson
+import os
 import time
+import uuid
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -13,11 +17,56 @@ from ..models.node_model import Node
 from ..models.connection_model import Connection
 from ..models.credential_model import Credential
 from ..models.execution_model import Execution
-from ..schemas.execution_schema import ExecutionStatus
-from ..utils.redis import add_to_execution_queue
+from ..schemas.execution_schema import ExecutionPriority, ExecutionStatus
+from ..schemas.webhook_schema import WebhookCreate, WebhookRead, WebhookUpdate
+from ..utils.redis import (
+    add_to_execution_queue,
+    claim_idempotency_key,
+    release_idempotency_key,
+)
+from ..utils.rate_limit import enforce_admission, enforce_rate_limits
+from ..utils.request_body import read_body
+from ..core.db.execution_writer import DEFERRED_EXECUTION_WRITES
 
 
 router = APIRouter(prefix="/api/v1/webhook")
+# Configuration lives under the workflow routes so it stays behind cookie auth;
+# the delivery prefix above is exempt from it.
+manage_router = APIRouter(prefix="/api/v1/workflow/webhook", tags=["webhooks"])
+
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", str(1024 * 1024)))
+WEBHOOK_IDEMPOTENCY_BODY_HASH = bool(int(os.getenv("WEBHOOK_IDEMPOTENCY_BODY_HASH", "0")))
+
+
+def _parse_json_body(raw_body: bytes) -> Any:
+    if not raw_body:
+        return None
+    try:
+        return orjson.loads(raw_body)
+    except Exception:
+        return None
+
+
+def _idempotency_key(request: Request, webhook: Webhook, method: str, full_path: str, raw_body: bytes) -> Optional[str]:
+    if webhook.idempotency_header:
+        delivery_id = request.headers.get(webhook.idempotency_header)
+        if delivery_id:
+            return f"header:{delivery_id}"
+    if WEBHOOK_IDEMPOTENCY_BODY_HASH:
+        digest = hashlib.sha256(f"{method}\n{full_path}\n".encode("utf-8") + raw_body).hexdigest()
+        return f"body:{digest}"
+    return None
+
+
+def _select_headers(request: Request, forward_headers: Optional[List[str]]) -> Dict[str, str]:
+    if forward_headers is None:
+        return dict(request.headers)
+    out: Dict[str, str] = {}
+    for name in forward_headers:
+        value = request.headers.get(name)
+        if value is not None:
+            out[name.lower()] = value
+    return out
 
 
 async def _get_user_credentials(user_id: int, db: AsyncSession) -> dict:
@@ -34,12 +83,116 @@ async def _get_user_credentials(user_id: int, db: AsyncSession) -> dict:
     return out
 
 
+async def _ensure_route_is_free(db: AsyncSession, method: str, path: str, webhook_id: Optional[int] = None):
+    # Deliveries are matched on path and method alone, across all users.
+    query = select(Webhook).where((Webhook.path == path) & (Webhook.method == method))
+    if webhook_id is not None:
+        query = query.where(Webhook.id != webhook_id)
+    result = await db.execute(query)
+    if result.scalar_one_or_none():
+        raise HTTPException(status_code=409, detail="A webhook with this method and path exists")
+
+
+@manage_router.post("/create")
+async def create_webhook(
+    webhook: WebhookCreate, db: AsyncSession = Depends(async_get_db), request: Request = None
+):
+    try:
+        authed_user_id = getattr(request.state, "user_id", None)
+        if authed_user_id is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+        result = await db.execute(
+            select(Workflow).where(
+                (Workflow.id == webhook.workflow_id) & (Workflow.user_id == authed_user_id)
+            )
+        )
+        if not result.scalar_one_or_none():
+            raise HTTPException(status_code=404, detail="Workflow not found")
+
+        await _ensure_route_is_free(db, webhook.method, webhook.path)
+
+        new_webhook = Webhook(
+            id=None,
+            name=webhook.name,
+            method=webhook.method,
+            path=webhook.path,
+            header=webhook.header or "",
+            secret=webhook.secret or "",
+            workflow_id=webhook.workflow_id,
+            forward_headers=webhook.forward_headers,
+            idempotency_header=webhook.idempotency_header,
+        )
+        db.add(new_webhook)
+        await db.commit()
+
+        return {
+            "message": "Webhook created successfully",
+            "data": WebhookRead.model_validate(new_webhook).model_dump(),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@manage_router.post("/update")
+async def update_webhook(
+    data: WebhookUpdate, db: AsyncSession = Depends(async_get_db), request: Request = None
+):
+    try:
+        authed_user_id = getattr(request.state, "user_id", None)
+        if authed_user_id is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+        result = await db.execute(
+            select(Webhook)
+            .join(Workflow, Webhook.workflow_id == Workflow.id)
+            .where((Webhook.id == data.id) & (Workflow.user_id == authed_user_id))
+        )
+        webhook = result.scalar_one_or_none()
+        if not webhook:
+            raise HTTPException(status_code=404, detail="Webhook not found")
+
+        sent = data.model_fields_set
+        if data.name is not None:
+            webhook.name = data.name
+        method = data.method or webhook.method
+        path = data.path or webhook.path
+        if (method, path) != (webhook.method, webhook.path):
+            await _ensure_route_is_free(db, method, path, webhook.id)
+            webhook.method = method
+            webhook.path = path
+        if "header" in sent:
+            webhook.header = data.header or ""
+        if "secret" in sent:
+            webhook.secret = data.secret or ""
+        if webhook.header and not webhook.secret:
+            raise HTTPException(status_code=400, detail="A signature header needs a secret")
+        # Null is meaningful for these two: forward every header / no delivery id.
+        if "forward_headers" in sent:
+            webhook.forward_headers = data.forward_headers
+        if "idempotency_header" in sent:
+            webhook.idempotency_header = data.idempotency_header
+
+        await db.commit()
+
+        return {
+            "message": "Webhook updated successfully",
+            "data": WebhookRead.model_validate(webhook).model_dump(),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 @router.api_route("/{webhook_path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
 async def handle_webhook(webhook_path: str, request: Request, db: AsyncSession = Depends(async_get_db)):
     try:
         method = request.method.upper()
         full_path = "/" + webhook_path if not webhook_path.startswith("/") else webhook_path
-        raw_body = await request.body()
+        raw_body = await read_body(request, WEBHOOK_MAX_BODY_BYTES)
 
         result = await db.execute(
             select(Webhook).where((Webhook.path == full_path) & (Webhook.method == method))
@@ -68,60 +221,42 @@ async def handle_webhook(webhook_path: str, request: Request, db: AsyncSession =
             if not hmac.compare_digest(computed, signature):
                 raise HTTPException(status_code=401, detail="Invalid signature")
 
-        wf_result = await db.execute(select(Workflow).where(Workflow.id == webhook.workflow_id))
-        workflow = wf_result.scalar_one_or_none()
-        if not workflow:
-            raise HTTPException(status_code=404, detail="Workflow not found")
-
-        nodes_result = await db.execute(select(Node).where(Node.workflow_id == workflow.id))
-        nodes = nodes_result.scalars().all()
-
-        conns_result = await db.execute(select(Connection).where(Connection.workflow_id == workflow.id))
-        connections = conns_result.scalars().all()
-
-        credentials = await _get_user_credentials(workflow.user_id, db)
+        execution_id = str(uuid.uuid4())
+        idempotency_scope = f"webhook:{webhook.id}"
+        idempotency_key = _idempotency_key(request, webhook, method, full_path, raw_body)
+        if idempotency_key:
+            existing_id = await claim_idempotency_key(idempotency_scope, idempotency_key, execution_id)
+            if existing_id:
+                return {"execution_id": existing_id, "status": "duplicate"}
 
         try:
-            body = await request.json()
+            execution_data = await _build_webhook_execution(
+                execution_id, webhook, method, full_path, raw_body, request, db
+            )
+            # With deferred writes the Execution row rides along with the Redis
+            # enqueue and is inserted in bulk by the background writer.
+            execution_id = await add_to_execution_queue(
+                execution_data, defer_record=DEFERRED_EXECUTION_WRITES
+            )
         except Exception:
-            body = None
-
-        trigger_payload = {
-            "headers": dict(request.headers),
-            "query": dict(request.query_params),
-            "body": body,
-            "method": method,
-            "path": full_path,
-        }
-
-        execution_data = {
-            "user_id": workflow.user_id,
-            "workflow_id": workflow.id,
-            "execution_type": "workflow",
-            "workflow_name": workflow.name,
-            "workflow_title": workflow.title,
-            "credentials": credentials,
-            "connections": [{"from": c.from_node_id, "to": c.to_node_id} for c in connections],
-            "nodes": [
-                {
-                    "id": n.id,
-                    "positionX": n.positionX,
-                    "positionY": n.positionY,
-                    "data": n.data,
-                }
-                for n in nodes
-            ],
-            "trigger": trigger_payload,
-        }
+            if idempotency_key:
+                await release_idempotency_key(idempotency_scope, idempotency_key, execution_id)
+            raise
 
-        execution_id = await add_to_execution_queue(execution_data)
+        # The execution is queued now, so the claim stays even if recording it fails;
+        # a retried delivery must come back as a duplicate rather than run twice.
+        if DEFERRED_EXECUTION_WRITES:
+            return JSONResponse(
+                status_code=202,
+                content={"execution_id": execution_id, "status": "queued"},
+            )
 
         async with db.begin():
             db.add(
                 Execution(
                     execution_id=execution_id,
-                    user_id=workflow.user_id,
-                    workflow_id=workflow.id,
+                    user_id=execution_data["user_id"],
+                    workflow_id=execution_data["workflow_id"],
                     node_id=None,
                     status=ExecutionStatus.QUEUED.value,
                 )
@@ -134,3 +269,63 @@ async def handle_webhook(webhook_path: str, request: Request, db: AsyncSession =
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+async def _build_webhook_execution(
+    execution_id: str,
+    webhook: Webhook,
+    method: str,
+    full_path: str,
+    raw_body: bytes,
+    request: Request,
+    db: AsyncSession,
+) -> Dict[str, Any]:
+    wf_result = await db.execute(select(Workflow).where(Workflow.id == webhook.workflow_id))
+    workflow = wf_result.scalar_one_or_none()
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    await enforce_admission()
+    await enforce_rate_limits(workflow.user_id, workflow.id)
+
+    nodes_result = await db.execute(select(Node).where(Node.workflow_id == workflow.id))
+    nodes = nodes_result.scalars().all()
+
+    conns_result = await db.execute(select(Connection).where(Connection.workflow_id == workflow.id))
+    connections = conns_result.scalars().all()
+
+    credentials = await _get_user_credentials(workflow.user_id, db)
+
+    body = _parse_json_body(raw_body)
+
+    trigger_payload = {
+        "headers": _select_headers(request, webhook.forward_headers),
+        "query": dict(request.query_params),
+        "body": body,
+        "method": method,
+        "path": full_path,
+    }
+
+    execution_data = {
+        "execution_id": execution_id,
+        "user_id": workflow.user_id,
+        "workflow_id": workflow.id,
+        "execution_type": "workflow",
+        "priority": ExecutionPriority.WEBHOOK.value,
+        "workflow_name": workflow.name,
+        "workflow_title": workflow.title,
+        "credentials": credentials,
+        "connections": [{"from": c.from_node_id, "to": c.to_node_id} for c in connections],
+        "nodes": [
+            {
+                "id": n.id,
+                "positionX": n.positionX,
+                "positionY": n.positionY,
+                "data": n.data,
+            }
+            for n in nodes
+        ],
+        "trigger": trigger_payload,
+    }
+
+    return execution_data
+
+
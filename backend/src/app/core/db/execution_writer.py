@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+
+from redis.asyncio import Redis
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .db import local_session
+from ...models.execution_model import Execution
+from ...utils.redis import PENDING_EXECUTION_RECORDS_KEY
+
+
+logger = logging.getLogger(__name__)
+
+DEFERRED_EXECUTION_WRITES = bool(int(os.getenv("WEBHOOK_DEFERRED_WRITES", "0")))
+EXECUTION_WRITER_BATCH_SIZE = int(os.getenv("EXECUTION_WRITER_BATCH_SIZE", "500"))
+EXECUTION_WRITER_INTERVAL_SECONDS = float(os.getenv("EXECUTION_WRITER_INTERVAL_SECONDS", "0.2"))
+EXECUTION_WRITER_STATEMENT_TIMEOUT_MS = int(os.getenv("EXECUTION_WRITER_STATEMENT_TIMEOUT_MS", "10000"))
+
+# Only one writer (across backend instances) may trim the pending list at a time.
+# The lock outlives the batch INSERT's statement timeout by a wide margin, and the
+# trim is refused if it lapsed anyway, so a slow insert cannot let two writers trim.
+WRITER_LOCK_KEY = "execution_records:writer_lock"
+WRITER_LOCK_TTL_MS = 3 * EXECUTION_WRITER_STATEMENT_TIMEOUT_MS
+WRITER_LOCK_POLL_SECONDS = 0.05
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Trim the batch that was read and extend the lock, but only while it is still ours.
+_TRIM_IF_LOCKED_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('LTRIM', KEYS[2], tonumber(ARGV[2]), -1)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+def _to_row(raw: bytes) -> Dict[str, Any]:
+    record = json.loads(raw)
+    created_at = datetime.fromisoformat(record["created_at"])
+    return {
+        "execution_id": record["execution_id"],
+        "user_id": record["user_id"],
+        "workflow_id": record.get("workflow_id"),
+        "node_id": record.get("node_id"),
+        "status": record.get("status", "queued"),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+async def flush_pending_executions(
+    max_batches: int | None = None, lock_wait_seconds: float = 0.0
+) -> int:
+    """
+    Insert pending `Execution` rows with multi-row INSERTs.
+
+    Records are only trimmed from Redis after the batch commits, so a crash between
+    the two steps replays the batch; ON CONFLICT DO NOTHING makes that harmless.
+    If another writer holds the lock, waits up to lock_wait_seconds for it so callers
+    that need a specific row see the in-flight batch committed. Returns the number of
+    records drained.
+    """
+    if not local_session:
+        raise RuntimeError("Database session is not configured. Check DATABASE_URL.")
+
+    redis_url = os.getenv("REDIS_URL", "redis://localhost")
+    redis: Redis = Redis.from_url(redis_url)
+    lock_token = str(uuid.uuid4())
+    drained = 0
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lock_wait_seconds
+        while not await redis.set(WRITER_LOCK_KEY, lock_token, nx=True, px=WRITER_LOCK_TTL_MS):
+            if loop.time() >= deadline:
+                return 0
+            await asyncio.sleep(WRITER_LOCK_POLL_SECONDS)
+        try:
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                raw_records: List[bytes] = await redis.lrange(
+                    PENDING_EXECUTION_RECORDS_KEY, 0, EXECUTION_WRITER_BATCH_SIZE - 1
+                )
+                if not raw_records:
+                    break
+
+                rows = []
+                for raw in raw_records:
+                    try:
+                        rows.append(_to_row(raw))
+                    except Exception:
+                        logger.exception("Dropping malformed pending execution record")
+
+                if rows:
+                    stmt = pg_insert(Execution).values(rows).on_conflict_do_nothing(
+                        index_elements=["execution_id"]
+                    )
+                    async with local_session() as db:
+                        async with db.begin():
+                            await db.execute(
+                                text(f"SET LOCAL statement_timeout = {EXECUTION_WRITER_STATEMENT_TIMEOUT_MS}")
+                            )
+                            await db.execute(stmt)
+
+                trimmed = await redis.eval(
+                    _TRIM_IF_LOCKED_SCRIPT,
+                    2,
+                    WRITER_LOCK_KEY,
+                    PENDING_EXECUTION_RECORDS_KEY,
+                    lock_token,
+                    len(raw_records),
+                    WRITER_LOCK_TTL_MS,
+                )
+                if not trimmed:
+                    # The lock lapsed and another writer may have read the same batch;
+                    # leave the trim to it (the replayed insert is a no-op).
+                    logger.warning("Execution writer lost its lock; leaving the batch untrimmed")
+                    break
+                drained += len(raw_records)
+                batches += 1
+        finally:
+            await redis.eval(_RELEASE_LOCK_SCRIPT, 1, WRITER_LOCK_KEY, lock_token)
+    finally:
+        await redis.close()
+    return drained
+
+
+async def run_execution_writer(stop_event: asyncio.Event) -> None:
+    """Background loop draining deferred execution records until stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            await flush_pending_executions()
+        except Exception:
+            logger.exception("Execution writer failed to flush pending records")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=EXECUTION_WRITER_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    # Final drain so a clean shutdown does not leave rows behind.
+    try:
+        await flush_pending_executions()
+    except Exception:
+        logger.exception("Execution writer failed during shutdown flush")
@@ -1,4 +1,6 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv()
 from fastapi import FastAPI
@@ -6,11 +8,27 @@ from fastapi.middleware.cors import CORSMiddleware
 from .api.user import router as user_router
 from .api.credentials import router as credential_router
 from .api.workflow import router as workflow_router
-from .api.webhook import router as webhook_router
+from .api.webhook import router as webhook_router, manage_router as webhook_manage_router
 from .api.execution import router as execution_router
 from .middleware.auth_middleware import AuthValidationMiddleware
+from .core.db.execution_writer import DEFERRED_EXECUTION_WRITES, run_execution_writer
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop_event = asyncio.Event()
+    writer_task = None
+    if DEFERRED_EXECUTION_WRITES:
+        writer_task = asyncio.create_task(run_execution_writer(stop_event))
+    try:
+        yield
+    finally:
+        stop_event.set()
+        if writer_task:
+            await writer_task
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 allowed_origins_env = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000")
@@ -31,6 +49,7 @@ app.include_router(user_router)
 app.include_router(credential_router)
 app.include_router(workflow_router)
 app.include_router(webhook_router)
+app.include_router(webhook_manage_router)
 app.include_router(execution_router)
 
 
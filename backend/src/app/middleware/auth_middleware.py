@@ -1,10 +1,10 @@
-from typing import Callable
 import os
+import re
 from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from ..utils.auth_utils import decode_jwt
+from ..utils.auth_utils import decode_jwt_cached
 
 
 EXEMPT_PATH_PREFIXES = (
@@ -15,35 +15,67 @@ EXEMPT_PATH_PREFIXES = (
     "/api/v1/webhook",
 )
 
+_EXEMPT_PATH_RE = re.compile(
+    "|".join(re.escape(prefix) for prefix in EXEMPT_PATH_PREFIXES)
+    # Resume callbacks carry their own per-execution token
+    + r"|/api/v1/execution/[^/]+/resume$"
+)
+
+ENGINE_STATUS_UPDATE_PATH = "/api/v1/execution/status/update"
+
+
+class AuthValidationMiddleware:
+    """
+    Cookie JWT check as plain ASGI middleware.
+
+    Unlike BaseHTTPMiddleware it does not wrap the downstream app in a task and
+    response stream; requests that pass are handed on untouched.
+    """
 
-class AuthValidationMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Response]) -> Response:
-        path = request.url.path
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        if request.method.upper() == "OPTIONS":
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
 
-        if any(path.startswith(prefix) for prefix in EXEMPT_PATH_PREFIXES):
-            return await call_next(request)
+        path = scope["path"]
+        if _EXEMPT_PATH_RE.match(path):
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
 
         # Allow engine status updates via shared secret without user cookies
-        if path == "/api/v1/execution/status/update":
+        if path == ENGINE_STATUS_UPDATE_PATH:
             expected_secret = os.getenv("ENGINE_STATUS_SECRET")
             provided_secret = request.headers.get("X-Engine-Secret")
             if expected_secret and provided_secret == expected_secret:
-                return await call_next(request)
+                await self.app(scope, receive, send)
+                return
             # If secret is configured and missing/mismatch, block explicitly
             if expected_secret:
-                return JSONResponse({"detail": "Unauthorized status update"}, status_code=401)
+                await JSONResponse({"detail": "Unauthorized status update"}, status_code=401)(scope, receive, send)
+                return
             # If no secret configured, fall through to normal auth checks
 
+        error = self._authenticate(request)
+        if error is not None:
+            await error(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _authenticate(request: Request):
+        """Set request.state.user_id, or return the error response to send."""
         token = request.cookies.get("token")
         user_id_cookie = request.cookies.get("user_id")
 
         if not token or not user_id_cookie:
             return JSONResponse({"detail": "Not authenticated"}, status_code=401)
 
-        payload = decode_jwt(token)
+        payload = decode_jwt_cached(token)
         if not payload:
             return JSONResponse({"detail": "Invalid or expired token"}, status_code=403)
 
@@ -57,7 +89,4 @@ class AuthValidationMiddleware(BaseHTTPMiddleware):
             return JSONResponse({"detail": "Authentication mismatch"}, status_code=401)
 
         request.state.user_id = user_id_from_token
-
-        return await call_next(request)
-
-
+        return None
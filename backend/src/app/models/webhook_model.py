@@ -1,4 +1,5 @@
 from sqlalchemy import String, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..core.db.db import Base
@@ -17,3 +18,9 @@ class Webhook(Base):
     workflow_id: Mapped[int] = mapped_column(ForeignKey("workflow.id"), nullable=False)
 
     workflow = relationship("Workflow", back_populates="webhooks")
+
+    # Request headers copied into the execution trigger; None forwards every header.
+    forward_headers: Mapped[list] = mapped_column(JSON, nullable=True, default=None)
+
+    # Header carrying the provider's delivery id, used to drop retried deliveries.
+    idempotency_header: Mapped[str] = mapped_column(String(64), nullable=True, default=None)
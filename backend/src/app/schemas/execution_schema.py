@@ -8,8 +8,11 @@ from typing import Dict, Optional
 class ExecutionStatus(str, Enum):
     QUEUED = "queued"
     PROCESSING = "processing"
+    WAITING = "waiting"
     COMPLETED = "completed"
     FAILED = "failed"
+    TIMED_OUT = "timed_out"
+    CANCELLED = "cancelled"
 
 
 class ExecutionType(str, Enum):
@@ -17,6 +20,17 @@ class ExecutionType(str, Enum):
     NODE = "node"
 
 
+class ExecutionPriority(str, Enum):
+    INTERACTIVE = "interactive"
+    WEBHOOK = "webhook"
+    BATCH = "batch"
+
+    def capped_at(self, ceiling: "ExecutionPriority") -> "ExecutionPriority":
+        """This priority, or ceiling if this one would jump ahead of it."""
+        order = list(ExecutionPriority)
+        return self if order.index(self) >= order.index(ceiling) else ceiling
+
+
 class ExecutionBase(BaseModel):
     workflow_id: Annotated[int, Field(gt=0)]
     execution_type: ExecutionType
@@ -25,6 +39,8 @@ class ExecutionBase(BaseModel):
 class WorkflowExecutionCreate(BaseModel):
     workflow_id: Annotated[int, Field(gt=0)]
     execution_type: ExecutionType = ExecutionType.WORKFLOW
+    # The server picks the class from the trigger; a client may only ask for a lower one.
+    priority: Optional[ExecutionPriority] = None
 
 
 class NodeExecutionCreate(BaseModel):
@@ -57,6 +73,11 @@ class ExecutionStatusUpdate(BaseModel):
     error: Optional[Dict] = None
 
 
+class ExecutionResume(BaseModel):
+    token: str
+    data: Optional[Dict] = None
+
+
 class ExecuteNode(BaseModel):
     workflow_id: Annotated[int, Field(gt=0)]
     node_id: Annotated[int, Field(gt=0)]
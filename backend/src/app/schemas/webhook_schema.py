@@ -1,29 +1,87 @@
-from typing import Annotated
-from pydantic import BaseModel, Field
+import re
+from typing import Annotated, List, Optional
+
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, field_validator, model_validator
+
+WEBHOOK_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+MAX_FORWARD_HEADERS = 32
+
+# RFC 9110 token characters.
+_HEADER_NAME_RE = re.compile(r"[a-z0-9!#$%&'*+.^_`|~-]{1,64}")
+
+
+def _header_name(value: str) -> str:
+    name = value.strip().lower()
+    if not _HEADER_NAME_RE.fullmatch(name):
+        raise ValueError(f"Invalid header name {value!r}")
+    return name
+
+
+def _method(value: str) -> str:
+    method = value.strip().upper()
+    if method not in WEBHOOK_METHODS:
+        raise ValueError(f"Method must be one of {', '.join(WEBHOOK_METHODS)}")
+    return method
+
+
+def _path(value: str) -> str:
+    # handle_webhook looks deliveries up by their path with a leading slash.
+    path = "/" + value.strip().lstrip("/")
+    if len(path) < 2 or len(path) > 20:
+        raise ValueError("Path must be 1 to 19 characters after the leading slash")
+    return path
+
+
+HeaderName = Annotated[str, AfterValidator(_header_name)]
+WebhookMethod = Annotated[str, AfterValidator(_method)]
+WebhookPath = Annotated[str, AfterValidator(_path)]
 
 
 class WebhookBase(BaseModel):
-    name: Annotated[str, Field(min_length=2, max_length=20)]
-    method: Annotated[str, Field(min_length=2, max_length=20)]
-    path: Annotated[str, Field(min_length=2, max_length=20)]
-    header: Annotated[str, Field(min_length=2, max_length=20)]
-    secret: Annotated[str, Field(min_length=2, max_length=30)]
-    workflowId: Annotated[int, Field(min_length=2, max_length=30)]
+    # Headers copied into the execution trigger; None forwards every header.
+    forward_headers: Optional[Annotated[List[HeaderName], Field(max_length=MAX_FORWARD_HEADERS)]] = None
+    # Header carrying the provider's delivery id, used to drop retried deliveries.
+    idempotency_header: Optional[HeaderName] = None
 
+    @field_validator("forward_headers")
+    @classmethod
+    def _dedupe_forward_headers(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        return list(dict.fromkeys(value)) if value is not None else None
 
-class WebhookRead(WebhookBase):
+
+class WebhookCreate(WebhookBase):
+    workflow_id: Annotated[int, Field(gt=0)]
     name: Annotated[str, Field(min_length=2, max_length=20)]
-    method: Annotated[str, Field(min_length=2, max_length=20)]
-    path: Annotated[str, Field(min_length=2, max_length=20)]
-    header: Annotated[str, Field(min_length=2, max_length=20)]
-    workflowId: Annotated[int, Field(min_length=2, max_length=30)]
+    method: WebhookMethod
+    path: WebhookPath
+    # Signature header; deliveries must then be signed with secret.
+    header: Optional[Annotated[HeaderName, Field(max_length=20)]] = None
+    secret: Optional[Annotated[str, Field(min_length=2, max_length=30)]] = None
+
+    @model_validator(mode="after")
+    def _signed_webhooks_need_a_secret(self):
+        if self.header and not self.secret:
+            raise ValueError("A signature header needs a secret")
+        return self
 
 
 class WebhookUpdate(WebhookBase):
-    id: Annotated[int, Field(...)]
-    user_id: Annotated[int, Field(...)]
-    secret: Annotated[str, Field(...)]
+    """Only the fields sent are changed; forward_headers may be set back to null."""
+
+    id: Annotated[int, Field(gt=0)]
+    name: Optional[Annotated[str, Field(min_length=2, max_length=20)]] = None
+    method: Optional[WebhookMethod] = None
+    path: Optional[WebhookPath] = None
+    header: Optional[Annotated[HeaderName, Field(max_length=20)]] = None
+    secret: Optional[Annotated[str, Field(min_length=2, max_length=30)]] = None
 
 
-class WebhookDelete(WebhookBase):
-    pass
+class WebhookRead(WebhookBase):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    workflow_id: int
+    name: str
+    method: str
+    path: str
+    header: Optional[str] = None
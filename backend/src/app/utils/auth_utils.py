@@ -1,8 +1,18 @@
+import asyncio
 import bcrypt
+import hashlib
 import jwt
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import os
+from typing import Optional, Set, Tuple
 from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from .redis import get_redis
 
 # Load environment variables from a .env file if present
 load_dotenv()
@@ -12,15 +22,94 @@ if not JWT_SECRET:
     raise RuntimeError("JWT_SECRET is not set. Configure environment variable JWT_SECRET.")
 JWT_ALGO = "HS256"
 
+# Changing the cost rehashes each user's password on their next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so these hash in parallel off the event loop.
+BCRYPT_THREADS = int(os.getenv("BCRYPT_THREADS", "4"))
+# Hashes running or queued beyond which sign-in/sign-up answer 503.
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+BCRYPT_METRICS_KEY = "backend:metrics"
+
+# Verified tokens are reused for at most this long (and never past their exp).
+AUTH_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "60"))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+
+
+logger = logging.getLogger(__name__)
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_THREADS, thread_name_prefix="bcrypt")
+_bcrypt_pending = 0
+# Metric writes in flight, held so they are not garbage-collected mid-write.
+_metric_tasks: Set[asyncio.Task] = set()
+
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
 
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
 
 
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def _record_bcrypt_timing(operation: str, queued_seconds: float, run_seconds: float) -> None:
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hincrby(BCRYPT_METRICS_KEY, f"bcrypt.{operation}.count", 1)
+            pipe.hincrbyfloat(BCRYPT_METRICS_KEY, f"bcrypt.{operation}.seconds", run_seconds)
+            pipe.hincrbyfloat(BCRYPT_METRICS_KEY, f"bcrypt.{operation}.queued_seconds", queued_seconds)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Could not record bcrypt metrics: %s", e)
+
+
+def _release_bcrypt_slot() -> None:
+    global _bcrypt_pending
+    _bcrypt_pending -= 1
+
+
+async def _run_bcrypt(operation: str, fn, *args):
+    global _bcrypt_pending
+    if _bcrypt_pending >= BCRYPT_MAX_PENDING:
+        raise HTTPException(status_code=503, detail="Server busy, try again shortly", headers={"Retry-After": "1"})
+    loop = asyncio.get_running_loop()
+    submitted = time.perf_counter()
+    started = 0.0
+
+    def _timed():
+        nonlocal started
+        started = time.perf_counter()
+        return fn(*args)
+
+    future = _bcrypt_executor.submit(_timed)
+    _bcrypt_pending += 1
+    # The slot is held until the hash actually finishes, even if the request is
+    # cancelled while it runs; the callback fires on the bcrypt thread.
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release_bcrypt_slot))
+    result = await asyncio.wrap_future(future)
+    finished = time.perf_counter()
+    # Metrics are best effort and must not add a Redis round trip to the login.
+    task = loop.create_task(_record_bcrypt_timing(operation, started - submitted, finished - started))
+    _metric_tasks.add(task)
+    task.add_done_callback(_metric_tasks.discard)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bcrypt("hash", hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _run_bcrypt("verify", verify_password, password, hashed)
+
+
 def create_jwt(user_id: int) -> str:
     payload = {"user_id": user_id, "exp": datetime.utcnow() + timedelta(days=1)}
 
@@ -34,3 +123,30 @@ def decode_jwt(token: str):
         return None
     except jwt.InvalidTokenError:
         return None
+
+
+# sha256(token) -> (payload, unix time the entry stops being valid)
+_verified_tokens: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+
+
+def decode_jwt_cached(token: str) -> Optional[dict]:
+    """decode_jwt with successful verifications remembered for a short while."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+    entry = _verified_tokens.get(key)
+    if entry is not None:
+        if entry[1] > now:
+            _verified_tokens.move_to_end(key)
+            return entry[0]
+        del _verified_tokens[key]
+
+    payload = decode_jwt(token)
+    if payload is None or AUTH_TOKEN_CACHE_TTL_SECONDS <= 0:
+        return payload
+    valid_until = now + AUTH_TOKEN_CACHE_TTL_SECONDS
+    if isinstance(payload.get("exp"), (int, float)):
+        valid_until = min(valid_until, payload["exp"])
+    _verified_tokens[key] = (payload, valid_until)
+    while len(_verified_tokens) > AUTH_TOKEN_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
+    return payload
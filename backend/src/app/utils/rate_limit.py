@@ -0,0 +1,106 @@
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+
+from .redis import get_redis, get_queue_depth
+
+
+RATE_LIMIT_USER_PER_SECOND = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "0"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "0"))
+RATE_LIMIT_WORKFLOW_PER_SECOND = float(os.getenv("RATE_LIMIT_WORKFLOW_PER_SECOND", "0"))
+RATE_LIMIT_WORKFLOW_BURST = float(os.getenv("RATE_LIMIT_WORKFLOW_BURST", "0"))
+# The resume callback is unauthenticated, so it is always limited per client.
+RATE_LIMIT_RESUME_PER_SECOND = float(os.getenv("RATE_LIMIT_RESUME_PER_SECOND", "5"))
+RATE_LIMIT_RESUME_BURST = float(os.getenv("RATE_LIMIT_RESUME_BURST", "20"))
+
+ADMISSION_MAX_QUEUE_DEPTH = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "0"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "5"))
+
+# Token bucket refilled lazily from Redis server time, so every backend instance
+# shares one clock. Returns {allowed, retry_after_ms}.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, retry_after}
+"""
+
+_token_bucket = None
+
+
+def _too_many_requests(detail: str, retry_after_seconds: int) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, retry_after_seconds))},
+    )
+
+
+async def _consume(key: str, rate: float, burst: float) -> int:
+    """
+    Take one token from the bucket at key; returns 0 or the retry delay in ms.
+
+    The bucket holds at least one token, otherwise a sub-1/s rate with no burst
+    configured could never admit a request.
+    """
+    global _token_bucket
+    if _token_bucket is None:
+        _token_bucket = get_redis().register_script(_TOKEN_BUCKET_SCRIPT)
+    allowed, retry_after_ms = await _token_bucket(keys=[key], args=[rate, max(burst or rate, 1), 1])
+    return 0 if int(allowed) else int(retry_after_ms)
+
+
+async def enforce_rate_limits(user_id: int, workflow_id: Optional[int] = None) -> None:
+    """Raise 429 when the user's or workflow's token bucket is empty."""
+    if RATE_LIMIT_USER_PER_SECOND > 0:
+        retry_after_ms = await _consume(
+            f"rate_limit:user:{user_id}", RATE_LIMIT_USER_PER_SECOND, RATE_LIMIT_USER_BURST
+        )
+        if retry_after_ms:
+            raise _too_many_requests("Rate limit exceeded for user", -(-retry_after_ms // 1000))
+
+    if workflow_id is not None and RATE_LIMIT_WORKFLOW_PER_SECOND > 0:
+        retry_after_ms = await _consume(
+            f"rate_limit:workflow:{workflow_id}", RATE_LIMIT_WORKFLOW_PER_SECOND, RATE_LIMIT_WORKFLOW_BURST
+        )
+        if retry_after_ms:
+            raise _too_many_requests("Rate limit exceeded for workflow", -(-retry_after_ms // 1000))
+
+
+async def enforce_resume_rate_limit(client: str) -> None:
+    """Raise 429 when a client calls the resume callback faster than allowed."""
+    if RATE_LIMIT_RESUME_PER_SECOND <= 0:
+        return
+    retry_after_ms = await _consume(
+        f"rate_limit:resume:{client}", RATE_LIMIT_RESUME_PER_SECOND, RATE_LIMIT_RESUME_BURST
+    )
+    if retry_after_ms:
+        raise _too_many_requests("Rate limit exceeded for resume callbacks", -(-retry_after_ms // 1000))
+
+
+async def enforce_admission() -> None:
+    """Shed new executions while the executor backlog is above ADMISSION_MAX_QUEUE_DEPTH."""
+    if ADMISSION_MAX_QUEUE_DEPTH <= 0:
+        return
+    if await get_queue_depth() >= ADMISSION_MAX_QUEUE_DEPTH:
+        raise _too_many_requests("Execution queue is full, retry later", ADMISSION_RETRY_AFTER_SECONDS)
@@ -1,11 +1,67 @@
 import asyncio
+import hashlib
+import hmac
 import os
 import json
 import uuid
-from typing import Dict, Any
+from datetime import datetime
+from typing import AsyncIterator, Dict, Any, Optional
 from redis.asyncio import Redis
 
 
+# Execution rows waiting to be inserted by the background execution writer.
+PENDING_EXECUTION_RECORDS_KEY = "execution_records:pending"
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# Executions are queued per tenant so the executor can round-robin between them;
+# keep these key names in sync with executor-engine's scheduler.
+EXECUTION_QUEUE_KEY = "execution_queue"
+EXECUTION_WAKEUP_KEY = "execution_queue:wakeup"
+# Priority classes, highest first; see ExecutionPriority.
+EXECUTION_PRIORITIES = ("interactive", "webhook", "batch")
+DEFAULT_EXECUTION_PRIORITY = "batch"
+# "user" or "workflow": what a fair-share tenant is.
+EXECUTION_FAIRNESS_KEY = os.getenv("EXECUTION_FAIRNESS_KEY", "user")
+
+# Consumed by the executor, which owns suspended execution state.
+EXECUTION_RESUME_REQUESTS_KEY = "execution_resume:requests"
+# Written by the executor's suspend_service; read here to check resume tokens.
+EXECUTION_SUSPENDED_KEY_PREFIX = "execution_suspended"
+
+# Watched by every executor; see request_execution_cancel.
+EXECUTION_CANCEL_CHANNEL = "execution_cancel"
+EXECUTION_CANCEL_TTL_SECONDS = 86400
+
+# Comment lines sent to idle SSE clients so proxies keep the stream open.
+EXECUTION_STREAM_KEEPALIVE_SECONDS = float(os.getenv("EXECUTION_STREAM_KEEPALIVE_SECONDS", "15"))
+# A stream closes once its execution reaches one of these (see ExecutionStatus).
+EXECUTION_STREAM_FINISHED_STATUSES = ("completed", "failed", "timed_out", "cancelled")
+
+_QUEUE_DEPTH_SCRIPT = """
+local depth = redis.call('LLEN', KEYS[1])
+for _, priority in ipairs(ARGV) do
+    local prefix = KEYS[1] .. ':' .. priority
+    for _, tenant in ipairs(redis.call('SMEMBERS', prefix .. ':tenants')) do
+        depth = depth + redis.call('LLEN', prefix .. ':tenant:' .. tenant)
+    end
+end
+return depth
+"""
+
+
+_shared_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """Process-wide client for hot paths that should not open a connection per call."""
+    global _shared_redis
+    if _shared_redis is None:
+        redis_url = os.getenv("REDIS_URL", "redis://localhost")
+        _shared_redis = Redis.from_url(redis_url)
+    return _shared_redis
+
+
 async def redisClient(key: str, value: str):
     redis_url = os.getenv("REDIS_URL", "redis://localhost")
     redis: Redis = Redis.from_url(redis_url)
@@ -15,29 +71,216 @@ async def redisClient(key: str, value: str):
         await redis.close()
 
 
-async def add_to_execution_queue(execution_data: Dict[str, Any]) -> str:
+def tenant_queue_key(priority: str, tenant: str) -> str:
+    return f"{EXECUTION_QUEUE_KEY}:{priority}:tenant:{tenant}"
+
+
+def tenants_key(priority: str) -> str:
+    return f"{EXECUTION_QUEUE_KEY}:{priority}:tenants"
+
+
+def _execution_tenant(execution_data: Dict[str, Any]) -> str:
+    if EXECUTION_FAIRNESS_KEY == "workflow" and execution_data.get("workflow_id") is not None:
+        return f"w{execution_data['workflow_id']}"
+    return f"u{execution_data.get('user_id')}"
 
+
+async def add_to_execution_queue(execution_data: Dict[str, Any], defer_record: bool = False) -> str:
+    """
+    Enqueue an execution for the executor engine.
+
+    With defer_record the queued `Execution` row is written to a pending list in the
+    same MULTI/EXEC as the job itself, so the caller can respond without waiting on
+    Postgres and the background writer inserts it later.
+    """
     redis_url = os.getenv("REDIS_URL", "redis://localhost")
     redis: Redis = Redis.from_url(redis_url)
     
 
-    execution_id = str(uuid.uuid4())
+    execution_id = execution_data.get("execution_id") or str(uuid.uuid4())
     execution_data["execution_id"] = execution_id
 
     if "retry_count" not in execution_data:
         execution_data["retry_count"] = 0
+    tenant = execution_data.setdefault("tenant", _execution_tenant(execution_data))
+    priority = execution_data.get("priority")
+    if priority not in EXECUTION_PRIORITIES:
+        priority = execution_data["priority"] = DEFAULT_EXECUTION_PRIORITY
     
 
     queue_key = f"execution_queue:{execution_id}"
-    await redis.set(queue_key, json.dumps(execution_data), ex=3600)  # Expire in 1 hour
-    
-
-    await redis.lpush("execution_queue", execution_id)
-    
-    await redis.close()
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.set(queue_key, json.dumps(execution_data), ex=3600)  # Expire in 1 hour
+            pipe.lpush(tenant_queue_key(priority, tenant), execution_id)
+            pipe.sadd(tenants_key(priority), tenant)
+            pipe.lpush(EXECUTION_WAKEUP_KEY, 1)
+            pipe.ltrim(EXECUTION_WAKEUP_KEY, 0, 63)
+            if defer_record:
+                record = {
+                    "execution_id": execution_id,
+                    "user_id": execution_data.get("user_id"),
+                    "workflow_id": execution_data.get("workflow_id"),
+                    "node_id": execution_data.get("node_id"),
+                    "status": "queued",
+                    "created_at": datetime.utcnow().isoformat(),
+                }
+                pipe.rpush(PENDING_EXECUTION_RECORDS_KEY, json.dumps(record))
+            await pipe.execute()
+    finally:
+        await redis.close()
     return execution_id
 
 
+async def get_queue_depth() -> int:
+    """Number of executions waiting to be picked up by the executor engine."""
+    redis = get_redis()
+    return int(await redis.eval(_QUEUE_DEPTH_SCRIPT, 1, EXECUTION_QUEUE_KEY, *EXECUTION_PRIORITIES))
+
+
+async def get_execution_resume_token(execution_id: str) -> Optional[str]:
+    """Resume token of a suspended execution, or None if it is not waiting."""
+    raw = await get_redis().get(f"{EXECUTION_SUSPENDED_KEY_PREFIX}:{execution_id}")
+    if not raw:
+        return None
+    return json.loads(raw).get("resume_token")
+
+
+async def request_execution_resume(execution_id: str, token: str, data: Optional[Dict[str, Any]]) -> bool:
+    """
+    Ask the executor to resume a suspended execution.
+
+    The token is checked here as well as by the executor, so callbacks for unknown
+    executions or with a wrong token never reach the request list. Returns whether
+    the request was queued.
+    """
+    expected = await get_execution_resume_token(execution_id)
+    if expected is None or not hmac.compare_digest(expected.encode("utf-8"), token.encode("utf-8")):
+        return False
+    payload = {"execution_id": execution_id, "token": token, "data": data}
+    await get_redis().rpush(EXECUTION_RESUME_REQUESTS_KEY, json.dumps(payload))
+    return True
+
+
+async def request_execution_cancel(execution_id: str) -> None:
+    """
+    Flag an execution as cancelled and tell the executors.
+
+    The flag makes a queued, delayed or resumed run stop when it is dequeued;
+    the message stops a run in progress or a suspended one right away.
+    """
+    redis = get_redis()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(f"execution_cancel:{execution_id}", "1", ex=EXECUTION_CANCEL_TTL_SECONDS)
+        pipe.publish(EXECUTION_CANCEL_CHANNEL, execution_id)
+        await pipe.execute()
+
+
+def _agent_stream_result(node_result: Any) -> Any:
+    # A node result is {"node_id", "type", "result": <handler output>}; the AI agent's
+    # output is {"messages", "memory", "result"} and "done" events carry the inner result.
+    output = node_result.get("result") if isinstance(node_result, dict) else None
+    return output.get("result") if isinstance(output, dict) else output
+
+
+async def _stream_outcome(redis: Redis, execution_id: str, node_id: str) -> Optional[Dict[str, Any]]:
+    """The closing event for a stream whose node or execution already finished, else None."""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hget(f"execution_checkpoint:{execution_id}", node_id)
+        pipe.get(f"execution_status:{execution_id}")
+        checkpoint_raw, status_raw = await pipe.execute()
+    if checkpoint_raw:
+        return {"type": "done", "result": _agent_stream_result(json.loads(checkpoint_raw))}
+    if not status_raw:
+        return None
+
+    status = json.loads(status_raw)
+    if status.get("status") == "completed":
+        result = status.get("result") or {}
+        if "results" in result:
+            node_result = result["results"].get(str(node_id))
+        else:
+            node_result = result.get("result") if str(result.get("node_id")) == str(node_id) else None
+        return {"type": "done", "result": _agent_stream_result(node_result)}
+    if status.get("status") in EXECUTION_STREAM_FINISHED_STATUSES:
+        return {"type": "error", "error": f"Execution {status['status']}"}
+    return None
+
+
+async def stream_execution_events(execution_id: str, node_id: str) -> AsyncIterator[str]:
+    """
+    Server-sent events relayed from the executor's execution_stream channel.
+
+    Pub/sub keeps no history: tokens published before the client subscribed are
+    missed, but the closing "done" event carries the full result. If the node or
+    the whole execution already finished (or finishes without streaming, e.g. it
+    failed before the node ran), the closing event is built from the checkpoint
+    or execution status instead, checked after subscribing and on each keepalive.
+    """
+    redis = get_redis()
+    pubsub = redis.pubsub()
+    await pubsub.subscribe(f"execution_stream:{execution_id}:{node_id}")
+    try:
+        outcome = await _stream_outcome(redis, execution_id, node_id)
+        while outcome is None:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=EXECUTION_STREAM_KEEPALIVE_SECONDS
+            )
+            if message is None:
+                outcome = await _stream_outcome(redis, execution_id, node_id)
+                if outcome is None:
+                    yield ": keepalive\n\n"
+                continue
+            data = message["data"].decode("utf-8")
+            yield f"data: {data}\n\n"
+            if json.loads(data).get("type") in ("done", "error"):
+                return
+        yield f"data: {json.dumps(outcome, default=str)}\n\n"
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+def _idempotency_key(scope: str, key: str) -> str:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return f"idempotency:{scope}:{digest}"
+
+
+async def claim_idempotency_key(scope: str, key: str, execution_id: str) -> Optional[str]:
+    """
+    Reserve an idempotency key for execution_id.
+
+    Returns None when the key was claimed, or the execution_id already holding it.
+    """
+    redis_url = os.getenv("REDIS_URL", "redis://localhost")
+    redis: Redis = Redis.from_url(redis_url)
+    redis_key = _idempotency_key(scope, key)
+    try:
+        while True:
+            if await redis.set(redis_key, execution_id, nx=True, ex=IDEMPOTENCY_TTL_SECONDS):
+                return None
+            existing = await redis.get(redis_key)
+            if existing is not None:
+                return existing.decode("utf-8")
+            # Expired or released between SET and GET; race for it again with NX so a
+            # concurrent request that won in the meantime is not overwritten.
+    finally:
+        await redis.close()
+
+
+async def release_idempotency_key(scope: str, key: str, execution_id: str) -> None:
+    """Drop a claim that never produced an execution so the client can retry."""
+    redis_url = os.getenv("REDIS_URL", "redis://localhost")
+    redis: Redis = Redis.from_url(redis_url)
+    redis_key = _idempotency_key(scope, key)
+    try:
+        existing = await redis.get(redis_key)
+        if existing is not None and existing.decode("utf-8") == execution_id:
+            await redis.delete(redis_key)
+    finally:
+        await redis.close()
+
+
 async def get_execution_status(execution_id: str) -> Dict[str, Any]:
 
     redis_url = os.getenv("REDIS_URL", "redis://localhost")
@@ -0,0 +1,20 @@
+from fastapi import HTTPException, Request
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """Read the request body once, rejecting oversized payloads without buffering them."""
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if declared > max_bytes:
+            raise HTTPException(status_code=413, detail="Request body too large")
+
+    chunks = bytearray()
+    async for chunk in request.stream():
+        chunks.extend(chunk)
+        if len(chunks) > max_bytes:
+            raise HTTPException(status_code=413, detail="Request body too large")
+    return bytes(chunks)
@@ -0,0 +1,30 @@
+import asyncio
+import os
+
+# auth_utils refuses to import without a signing secret.
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+import fakeredis
+import pytest
+from redis.asyncio import Redis
+
+from app.utils import redis as redis_utils
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """Point every Redis client the backend creates at one in-memory server."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        Redis, "from_url", classmethod(lambda cls, *args, **kwargs: fakeredis.FakeAsyncRedis(server=server))
+    )
+    monkeypatch.setattr(redis_utils, "_shared_redis", None)
+    return server
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop; the suite has no async plugin."""
+    def _run(coro):
+        return asyncio.run(coro)
+    return _run
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import user as user_api
+from app.core.db.db import async_get_db
+from app.utils import auth_utils
+from app.utils.auth_utils import _run_bcrypt, hash_password, verify_password
+
+
+def test_cancelled_hashes_hold_their_slot_until_they_finish(run):
+    release = threading.Event()
+
+    async def scenario():
+        hashing = asyncio.ensure_future(_run_bcrypt("hash", release.wait))
+        await asyncio.sleep(0.05)
+        hashing.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await hashing
+        # The bcrypt thread is still busy, so the slot stays taken.
+        held = auth_utils._bcrypt_pending
+        release.set()
+        for _ in range(100):
+            if auth_utils._bcrypt_pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        return held, auth_utils._bcrypt_pending
+
+    assert run(scenario()) == (1, 0)
+
+
+def test_metrics_are_recorded_without_holding_up_the_caller(monkeypatch, run):
+    recorded = []
+
+    async def slow_record(operation, queued_seconds, run_seconds):
+        await asyncio.sleep(10)
+        recorded.append(operation)
+
+    monkeypatch.setattr(auth_utils, "_record_bcrypt_timing", slow_record)
+
+    async def scenario():
+        return await asyncio.wait_for(_run_bcrypt("verify", lambda: True), 1)
+
+    assert run(scenario()) is True
+    assert recorded == []
+
+
+class _Session:
+    def __init__(self, user):
+        self.user = user
+        self.commits = 0
+
+    async def execute(self, query):
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+    async def commit(self):
+        self.commits += 1
+
+
+PASSWORD = "correct-horse"
+
+
+def _sign_in(session):
+    app = FastAPI()
+    app.include_router(user_api.router)
+    app.dependency_overrides[async_get_db] = lambda: session
+    return TestClient(app).post("/api/v1/user/signin", json={"email": "a@example.com", "password": PASSWORD})
+
+
+def test_signin_rehashes_passwords_made_with_another_cost(redis_server, monkeypatch):
+    monkeypatch.setattr(auth_utils, "BCRYPT_ROUNDS", 4)
+    stored = SimpleNamespace(id=1, email="a@example.com", password=hash_password(PASSWORD))
+    monkeypatch.setattr(auth_utils, "BCRYPT_ROUNDS", 5)
+    session = _Session(stored)
+
+    assert _sign_in(session).status_code == 200
+    assert stored.password.startswith("$2b$05$")
+    assert verify_password(PASSWORD, stored.password)
+    assert session.commits == 1
+
+
+def test_signin_keeps_hashes_made_with_the_current_cost(redis_server, monkeypatch):
+    monkeypatch.setattr(auth_utils, "BCRYPT_ROUNDS", 4)
+    password = hash_password(PASSWORD)
+    session = _Session(SimpleNamespace(id=1, email="a@example.com", password=password))
+
+    assert _sign_in(session).status_code == 200
+    assert session.user.password == password
+    assert session.commits == 0
@@ -0,0 +1,33 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.middleware.auth_middleware import AuthValidationMiddleware
+
+
+async def _ok(request):
+    return PlainTextResponse("ok")
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[Route("/{path:path}", _ok, methods=["GET", "POST"])])
+    return TestClient(AuthValidationMiddleware(app))
+
+
+def test_resume_callbacks_need_no_cookies(client):
+    assert client.post("/api/v1/execution/exec-1/resume").status_code == 200
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/v1/execution/exec-1/resume-token",
+        "/api/v1/execution/exec-1/other/resume",
+        "/api/v1/execution//resume",
+    ],
+)
+def test_only_the_resume_route_itself_is_exempt(client, path):
+    assert client.get(path).status_code == 401
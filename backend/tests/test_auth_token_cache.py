@@ -0,0 +1,65 @@
+import time
+
+import jwt
+import pytest
+
+from app.utils import auth_utils
+from app.utils.auth_utils import JWT_ALGO, JWT_SECRET, decode_jwt_cached
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(auth_utils, "_verified_tokens", type(auth_utils._verified_tokens)())
+    monkeypatch.setattr(auth_utils, "AUTH_TOKEN_CACHE_TTL_SECONDS", 60.0)
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Tokens that reached real verification, i.e. were not served from the cache."""
+    seen = []
+    decode = auth_utils.decode_jwt
+
+    def counting_decode(token):
+        seen.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(auth_utils, "decode_jwt", counting_decode)
+    return seen
+
+
+def _expired(*args, **kwargs):
+    raise jwt.ExpiredSignatureError("Signature has expired")
+
+
+def _token(exp):
+    return jwt.encode({"user_id": 1, "exp": exp}, JWT_SECRET, algorithm=JWT_ALGO)
+
+
+def test_verified_tokens_are_reused(decodes):
+    token = _token(int(time.time()) + 3600)
+    assert decode_jwt_cached(token)["user_id"] == 1
+    assert decode_jwt_cached(token)["user_id"] == 1
+    assert len(decodes) == 1
+
+
+def test_cache_entries_never_outlive_the_token_exp(decodes, monkeypatch):
+    exp = int(time.time()) + 5
+    token = _token(exp)
+    assert decode_jwt_cached(token)["user_id"] == 1
+    assert next(iter(auth_utils._verified_tokens.values()))[1] == exp
+
+    # Past exp but well inside the cache TTL: the token must be verified again.
+    real_time = time.time
+    monkeypatch.setattr(auth_utils.time, "time", lambda: real_time() + 10)
+    # PyJWT reads the clock through datetime, so have it see the same time.
+    monkeypatch.setattr(auth_utils.jwt, "decode", _expired)
+    assert decode_jwt_cached(token) is None
+    assert len(decodes) == 2
+    assert auth_utils._verified_tokens == {}
+
+
+def test_invalid_tokens_are_not_cached(decodes):
+    token = _token(int(time.time()) - 10)
+    assert decode_jwt_cached(token) is None
+    assert decode_jwt_cached(token) is None
+    assert len(decodes) == 2
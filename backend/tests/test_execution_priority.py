@@ -0,0 +1,24 @@
+from app.api.execution import WORKFLOW_RUN_PRIORITY
+from app.schemas.execution_schema import ExecutionPriority, WorkflowExecutionCreate
+
+
+def test_workflow_runs_default_to_the_server_class():
+    data = WorkflowExecutionCreate(workflow_id=1)
+    assert data.priority is None
+    assert (data.priority or WORKFLOW_RUN_PRIORITY).capped_at(WORKFLOW_RUN_PRIORITY) is ExecutionPriority.WEBHOOK
+
+
+def test_clients_cannot_raise_their_priority():
+    data = WorkflowExecutionCreate(workflow_id=1, priority="interactive")
+    assert data.priority.capped_at(WORKFLOW_RUN_PRIORITY) is ExecutionPriority.WEBHOOK
+
+
+def test_clients_can_lower_their_priority():
+    data = WorkflowExecutionCreate(workflow_id=1, priority="batch")
+    assert data.priority.capped_at(WORKFLOW_RUN_PRIORITY) is ExecutionPriority.BATCH
+
+
+def test_capped_at_keeps_classes_at_or_below_the_ceiling():
+    assert ExecutionPriority.INTERACTIVE.capped_at(ExecutionPriority.INTERACTIVE) is ExecutionPriority.INTERACTIVE
+    assert ExecutionPriority.WEBHOOK.capped_at(ExecutionPriority.INTERACTIVE) is ExecutionPriority.WEBHOOK
+    assert ExecutionPriority.INTERACTIVE.capped_at(ExecutionPriority.BATCH) is ExecutionPriority.BATCH
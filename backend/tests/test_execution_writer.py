@@ -0,0 +1,107 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import fakeredis
+from sqlalchemy.sql.dml import Insert
+
+from app.core.db import execution_writer
+from app.utils.redis import PENDING_EXECUTION_RECORDS_KEY
+
+
+class _RecordingSession:
+    def __init__(self, statements, on_insert=None):
+        self.statements = statements
+        self.on_insert = on_insert
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+
+    async def execute(self, stmt):
+        if isinstance(stmt, Insert):
+            self.statements.append(stmt)
+            if self.on_insert:
+                await self.on_insert()
+
+
+def _session_factory(statements, on_insert=None):
+    @asynccontextmanager
+    async def factory():
+        yield _RecordingSession(statements, on_insert)
+    return factory
+
+
+def _record(execution_id):
+    return json.dumps({
+        "execution_id": execution_id,
+        "user_id": 1,
+        "workflow_id": 2,
+        "status": "queued",
+        "created_at": "2026-01-01T00:00:00",
+    })
+
+
+def test_flush_gives_up_when_lock_is_held(redis_server, monkeypatch, run):
+    statements = []
+    monkeypatch.setattr(execution_writer, "local_session", _session_factory(statements))
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await redis.rpush(PENDING_EXECUTION_RECORDS_KEY, _record("a"))
+        await redis.set(execution_writer.WRITER_LOCK_KEY, "other-instance")
+        return await execution_writer.flush_pending_executions()
+
+    assert run(scenario()) == 0
+    assert statements == []
+
+
+def test_flush_waits_for_in_flight_writer(redis_server, monkeypatch, run):
+    statements = []
+    monkeypatch.setattr(execution_writer, "local_session", _session_factory(statements))
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await redis.rpush(PENDING_EXECUTION_RECORDS_KEY, _record("a"))
+        await redis.set(execution_writer.WRITER_LOCK_KEY, "other-instance")
+
+        async def release_later():
+            await asyncio.sleep(0.2)
+            await redis.delete(execution_writer.WRITER_LOCK_KEY)
+
+        release = asyncio.create_task(release_later())
+        drained = await execution_writer.flush_pending_executions(lock_wait_seconds=2.0)
+        await release
+        return drained, await redis.llen(PENDING_EXECUTION_RECORDS_KEY)
+
+    drained, remaining = run(scenario())
+    assert drained == 1
+    assert remaining == 0
+    assert len(statements) == 1
+
+
+def test_writer_whose_lock_lapsed_mid_insert_does_not_trim(redis_server, monkeypatch, run):
+    statements = []
+
+    async def lock_taken_over():
+        # The insert outlived the lock and a second writer took it over.
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await redis.set(execution_writer.WRITER_LOCK_KEY, "other-instance")
+
+    monkeypatch.setattr(execution_writer, "local_session", _session_factory(statements, lock_taken_over))
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await redis.rpush(PENDING_EXECUTION_RECORDS_KEY, _record("a"), _record("b"))
+        drained = await execution_writer.flush_pending_executions()
+        return drained, await redis.llen(PENDING_EXECUTION_RECORDS_KEY), await redis.get(execution_writer.WRITER_LOCK_KEY)
+
+    drained, remaining, lock_holder = run(scenario())
+    assert drained == 0
+    assert remaining == 2
+    assert lock_holder == b"other-instance"
+    assert len(statements) == 1
+
+
+def test_lock_outlives_the_insert_statement_timeout():
+    assert execution_writer.WRITER_LOCK_TTL_MS > execution_writer.EXECUTION_WRITER_STATEMENT_TIMEOUT_MS
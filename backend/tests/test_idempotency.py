@@ -0,0 +1,69 @@
+import fakeredis
+from redis.asyncio import Redis
+
+from app.utils.redis import _idempotency_key, claim_idempotency_key, release_idempotency_key
+
+
+def test_first_claim_wins(redis_server, run):
+    async def scenario():
+        first = await claim_idempotency_key("workflow:1:2", "key", "exec-a")
+        second = await claim_idempotency_key("workflow:1:2", "key", "exec-b")
+        return first, second
+
+    assert run(scenario()) == (None, "exec-a")
+
+
+def test_scopes_do_not_collide(redis_server, run):
+    async def scenario():
+        await claim_idempotency_key("workflow:1:2", "key", "exec-a")
+        return await claim_idempotency_key("workflow:1:3", "key", "exec-b")
+
+    assert run(scenario()) is None
+
+
+def test_release_only_drops_own_claim(redis_server, run):
+    async def scenario():
+        await claim_idempotency_key("webhook:1", "key", "exec-a")
+        await release_idempotency_key("webhook:1", "key", "exec-b")
+        still_held = await claim_idempotency_key("webhook:1", "key", "exec-c")
+        await release_idempotency_key("webhook:1", "key", "exec-a")
+        reclaimed = await claim_idempotency_key("webhook:1", "key", "exec-c")
+        return still_held, reclaimed
+
+    assert run(scenario()) == ("exec-a", None)
+
+
+def test_claim_lost_between_set_and_get_does_not_overwrite_winner(redis_server, monkeypatch, run):
+    """A key that vanishes after a failed SET NX is re-raced, not blindly overwritten."""
+
+    class RacingRedis(fakeredis.FakeAsyncRedis):
+        stage = "initial"
+
+        async def get(self, name):
+            if RacingRedis.stage == "initial":
+                # The original claim expires right after our SET NX failed...
+                RacingRedis.stage = "expired"
+                await super().delete(name)
+            return await super().get(name)
+
+        async def set(self, name, value, *args, **kwargs):
+            if RacingRedis.stage == "expired":
+                # ...and another request claims the key before we try again.
+                RacingRedis.stage = "done"
+                await super().set(name, "exec-winner", nx=True)
+            return await super().set(name, value, *args, **kwargs)
+
+    async def scenario():
+        await claim_idempotency_key("webhook:1", "key", "exec-a")
+        monkeypatch.setattr(
+            Redis, "from_url", classmethod(lambda cls, *a, **k: RacingRedis(server=redis_server))
+        )
+        existing = await claim_idempotency_key("webhook:1", "key", "exec-b")
+        holder = await fakeredis.FakeAsyncRedis(server=redis_server).get(
+            _idempotency_key("webhook:1", "key")
+        )
+        return existing, holder
+
+    existing, holder = run(scenario())
+    assert existing == "exec-winner"
+    assert holder == b"exec-winner"
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import rate_limit
+
+
+@pytest.fixture(autouse=True)
+def fresh_script(redis_server, monkeypatch):
+    # The registered script is bound to the shared client, which is per-test here.
+    monkeypatch.setattr(rate_limit, "_token_bucket", None)
+
+
+def test_burst_is_admitted_then_limited(run):
+    async def scenario():
+        return [await rate_limit._consume("rate_limit:user:1", 1.0, 3) for _ in range(4)]
+
+    results = run(scenario())
+    assert results[:3] == [0, 0, 0]
+    assert 0 < results[3] <= 1000
+
+
+def test_bucket_refills_over_time(run):
+    async def scenario():
+        first = await rate_limit._consume("rate_limit:user:1", 50.0, 1)
+        limited = await rate_limit._consume("rate_limit:user:1", 50.0, 1)
+        await asyncio.sleep(0.05)
+        refilled = await rate_limit._consume("rate_limit:user:1", 50.0, 1)
+        return first, limited, refilled
+
+    first, limited, refilled = run(scenario())
+    assert first == 0
+    assert limited > 0
+    assert refilled == 0
+
+
+def test_sub_one_rate_without_burst_still_admits(run):
+    async def scenario():
+        first = await rate_limit._consume("rate_limit:workflow:1", 0.5, 0)
+        second = await rate_limit._consume("rate_limit:workflow:1", 0.5, 0)
+        return first, second
+
+    first, second = run(scenario())
+    assert first == 0
+    assert 1000 < second <= 2000
+
+
+def test_enforce_rate_limits_raises_429_with_retry_after(monkeypatch, run):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_USER_PER_SECOND", 0.25)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_USER_BURST", 0.0)
+
+    async def scenario():
+        await rate_limit.enforce_rate_limits(7)
+        await rate_limit.enforce_rate_limits(7)
+
+    with pytest.raises(HTTPException) as exc_info:
+        run(scenario())
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "4"
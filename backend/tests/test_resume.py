@@ -0,0 +1,73 @@
+import json
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import execution
+from app.utils import rate_limit
+from app.utils.redis import EXECUTION_RESUME_REQUESTS_KEY, request_execution_resume
+
+
+@pytest.fixture(autouse=True)
+def fresh_script(redis_server, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_token_bucket", None)
+
+
+async def _suspend(redis_server, execution_id="exec-1", token="secret-token"):
+    redis = fakeredis.FakeAsyncRedis(server=redis_server)
+    await redis.set(f"execution_suspended:{execution_id}", json.dumps({"resume_token": token}))
+
+
+def _queued(redis_server):
+    return fakeredis.FakeRedis(server=redis_server).llen(EXECUTION_RESUME_REQUESTS_KEY)
+
+
+def test_resume_requests_are_only_queued_with_the_right_token(redis_server, run):
+    async def scenario():
+        await _suspend(redis_server)
+        unknown = await request_execution_resume("exec-2", "secret-token", None)
+        wrong = await request_execution_resume("exec-1", "guess", None)
+        right = await request_execution_resume("exec-1", "secret-token", {"ok": True})
+        return unknown, wrong, right
+
+    assert run(scenario()) == (False, False, True)
+    assert _queued(redis_server) == 1
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(execution.router)
+    return TestClient(app)
+
+
+def test_resume_endpoint_rejects_oversized_bodies(client, redis_server, monkeypatch, run):
+    monkeypatch.setattr(execution, "RESUME_MAX_BODY_BYTES", 64)
+    run(_suspend(redis_server))
+    response = client.post("/api/v1/execution/exec-1/resume", json={"token": "secret-token", "data": {"x": "y" * 100}})
+    assert response.status_code == 413
+    assert _queued(redis_server) == 0
+
+
+def test_resume_endpoint_is_rate_limited_per_client(client, redis_server, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_RESUME_PER_SECOND", 0.1)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_RESUME_BURST", 2)
+    statuses = [
+        client.post("/api/v1/execution/exec-1/resume", json={"token": "guess"}).status_code
+        for _ in range(3)
+    ]
+    assert statuses == [404, 404, 429]
+
+
+def test_resume_endpoint_queues_valid_callbacks(client, redis_server, run):
+    run(_suspend(redis_server))
+    response = client.post("/api/v1/execution/exec-1/resume", json={"token": "secret-token", "data": {"ok": True}})
+    assert response.status_code == 202
+    assert _queued(redis_server) == 1
+
+
+def test_resume_endpoint_validates_the_body(client, redis_server):
+    response = client.post("/api/v1/execution/exec-1/resume", content=b"not json")
+    assert response.status_code == 422
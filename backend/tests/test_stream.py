@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import fakeredis
+
+from app.utils import redis as redis_utils
+from app.utils.redis import stream_execution_events
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def _data(event):
+    assert event.startswith("data: ")
+    return json.loads(event[len("data: "):])
+
+
+def test_stream_closes_with_the_checkpoint_of_a_finished_node(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        node_result = {"node_id": 7, "type": "ai_agent", "result": {"messages": [], "result": "hello"}}
+        await redis.hset("execution_checkpoint:exec-1", "7", json.dumps(node_result))
+        return await asyncio.wait_for(_collect(stream_execution_events("exec-1", "7")), 1)
+
+    events = run(scenario())
+    assert [_data(e) for e in events] == [{"type": "done", "result": "hello"}]
+
+
+def test_stream_closes_when_the_execution_already_completed(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        results = {"7": {"node_id": 7, "type": "ai_agent", "result": {"result": "hello"}}}
+        await redis.set(
+            "execution_status:exec-1",
+            json.dumps({"status": "completed", "result": {"workflow_id": 1, "results": results}}),
+        )
+        return await asyncio.wait_for(_collect(stream_execution_events("exec-1", "7")), 1)
+
+    events = run(scenario())
+    assert [_data(e) for e in events] == [{"type": "done", "result": "hello"}]
+
+
+def test_stream_closes_on_keepalive_once_the_execution_fails(redis_server, run, monkeypatch):
+    monkeypatch.setattr(redis_utils, "EXECUTION_STREAM_KEEPALIVE_SECONDS", 0.05)
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await redis.set("execution_status:exec-1", json.dumps({"status": "processing"}))
+        events = stream_execution_events("exec-1", "7")
+        first = await asyncio.wait_for(events.__anext__(), 1)
+        # The node never ran, so nothing is ever published on its channel.
+        await redis.set("execution_status:exec-1", json.dumps({"status": "failed", "result": {"error": "boom"}}))
+        rest = await asyncio.wait_for(_collect(events), 1)
+        return [first] + rest
+
+    events = run(scenario())
+    assert events[0] == ": keepalive\n\n"
+    assert _data(events[-1]) == {"type": "error", "error": "Execution failed"}
+
+
+def test_stream_relays_published_events_until_done(redis_server, run, monkeypatch):
+    monkeypatch.setattr(redis_utils, "EXECUTION_STREAM_KEEPALIVE_SECONDS", 0.05)
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await redis.set("execution_status:exec-1", json.dumps({"status": "processing"}))
+        events = stream_execution_events("exec-1", "7")
+        assert await asyncio.wait_for(events.__anext__(), 1) == ": keepalive\n\n"
+        channel = "execution_stream:exec-1:7"
+        await redis.publish(channel, json.dumps({"type": "token", "token": "hel"}))
+        await redis.publish(channel, json.dumps({"type": "done", "result": "hello"}))
+        return await asyncio.wait_for(_collect(events), 1)
+
+    events = [e for e in run(scenario()) if e.startswith("data: ")]
+    assert [_data(e)["type"] for e in events] == ["token", "done"]
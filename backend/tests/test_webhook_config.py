@@ -0,0 +1,131 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.api import webhook as webhook_api
+from app.core.db.db import async_get_db
+from app.models.webhook_model import Webhook
+from app.schemas.webhook_schema import MAX_FORWARD_HEADERS
+
+
+class _Session:
+    """Hands back one queued row per execute(), in order."""
+
+    def __init__(self, *rows):
+        self.rows = list(rows)
+        self.added = []
+        self.commits = 0
+
+    async def execute(self, query):
+        row = self.rows.pop(0)
+        return SimpleNamespace(scalar_one_or_none=lambda: row)
+
+    def add(self, obj):
+        obj.id = 7
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def _client(session, user_id=1):
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def authed(request: Request, call_next):
+        if user_id is not None:
+            request.state.user_id = user_id
+        return await call_next(request)
+
+    app.include_router(webhook_api.manage_router)
+    app.dependency_overrides[async_get_db] = lambda: session
+    return TestClient(app)
+
+
+def _webhook(**overrides):
+    fields = dict(
+        id=7, name="orders", method="POST", path="/orders", header="", secret="",
+        workflow_id=3, forward_headers=None, idempotency_header=None,
+    )
+    fields.update(overrides)
+    return Webhook(**fields)
+
+
+def test_create_stores_lower_cased_header_settings():
+    session = _Session(SimpleNamespace(id=3), None)
+    response = _client(session).post(
+        "/api/v1/workflow/webhook/create",
+        json={
+            "workflow_id": 3,
+            "name": "orders",
+            "method": "post",
+            "path": "orders",
+            "forward_headers": ["X-Event", "Content-Type", "x-event"],
+            "idempotency_header": "X-GitHub-Delivery",
+        },
+    )
+
+    assert response.status_code == 200, response.text
+    (created,) = session.added
+    assert (created.method, created.path) == ("POST", "/orders")
+    assert created.forward_headers == ["x-event", "content-type"]
+    assert created.idempotency_header == "x-github-delivery"
+    assert "secret" not in response.json()["data"]
+
+
+def test_create_rejects_bad_header_names_and_oversized_lists():
+    client = _client(_Session())
+    base = {"workflow_id": 3, "name": "orders", "method": "POST", "path": "/orders"}
+
+    bad_name = client.post("/api/v1/workflow/webhook/create", json={**base, "idempotency_header": "X Delivery"})
+    too_many = client.post(
+        "/api/v1/workflow/webhook/create",
+        json={**base, "forward_headers": [f"x-h{i}" for i in range(MAX_FORWARD_HEADERS + 1)]},
+    )
+
+    assert bad_name.status_code == 422
+    assert too_many.status_code == 422
+
+
+def test_create_needs_auth_and_an_owned_workflow():
+    body = {"workflow_id": 3, "name": "orders", "method": "POST", "path": "/orders"}
+
+    assert _client(_Session(), user_id=None).post("/api/v1/workflow/webhook/create", json=body).status_code == 401
+    assert _client(_Session(None)).post("/api/v1/workflow/webhook/create", json=body).status_code == 404
+
+
+def test_create_refuses_a_taken_method_and_path():
+    session = _Session(SimpleNamespace(id=3), _webhook(id=9))
+    response = _client(session).post(
+        "/api/v1/workflow/webhook/create",
+        json={"workflow_id": 3, "name": "orders", "method": "POST", "path": "/orders"},
+    )
+
+    assert response.status_code == 409
+    assert session.added == []
+
+
+def test_update_changes_only_the_fields_sent():
+    existing = _webhook(forward_headers=["x-event"], idempotency_header="x-delivery")
+    session = _Session(existing)
+    response = _client(session).post(
+        "/api/v1/workflow/webhook/update",
+        json={"id": 7, "forward_headers": None, "name": "renamed"},
+    )
+
+    assert response.status_code == 200, response.text
+    assert existing.forward_headers is None
+    assert existing.idempotency_header == "x-delivery"
+    assert existing.name == "renamed"
+    assert session.commits == 1
+
+
+def test_update_of_someone_elses_webhook_is_not_found():
+    session = _Session(None)
+    response = _client(session).post(
+        "/api/v1/workflow/webhook/update", json={"id": 7, "idempotency_header": "x-delivery"}
+    )
+
+    assert response.status_code == 404
+    assert session.commits == 0
@@ -1,10 +1,42 @@
 import asyncio
-from services.redis_service import process_execution_queue
+import sys
+from services.redis_service import (
+    listen_for_cancellations_forever,
+    process_execution_queue,
+    promote_retries_forever,
+)
+from services.smtp_pool import close_smtp_pools
+from services.suspend_service import process_resumptions_forever
+from services.metrics import flush_metrics_forever, flush_metrics
+from services.node_registry import NODE_WARMUP_MODE, warm_up_node_types
+from services.process_pool import close_process_pool
 
 
 async def main():
-    task = asyncio.create_task(process_execution_queue())
-    await task
+    warm_up_task = None
+    if NODE_WARMUP_MODE == "eager":
+        await warm_up_node_types()
+    elif NODE_WARMUP_MODE == "background":
+        warm_up_task = asyncio.get_running_loop().create_task(warm_up_node_types())
+    try:
+        await asyncio.gather(
+            process_execution_queue(),
+            promote_retries_forever(),
+            process_resumptions_forever(),
+            flush_metrics_forever(),
+            listen_for_cancellations_forever(),
+        )
+    finally:
+        if warm_up_task is not None:
+            warm_up_task.cancel()
+        await flush_metrics()
+        await close_smtp_pools()
+        close_process_pool()
+        # Only loaded once a node of their type ran or warm-up imported them.
+        if "services.telegram_service" in sys.modules:
+            await sys.modules["services.telegram_service"].close_telegram_senders()
+        if "services.transform_service" in sys.modules:
+            sys.modules["services.transform_service"].sandbox_pool.close()
 
 
 def cli():
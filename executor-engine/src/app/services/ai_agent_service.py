@@ -1,12 +1,39 @@
-from typing import Annotated
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Annotated, Any, Optional
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-# import asyncio
+from langchain_core.messages import AIMessage, BaseMessage
+from .llm_cache import cache_key, llm_cache, schema_hash, LLM_CACHE_TTL_SECONDS
+from .redis_client import get_redis
+from .llm_gateway import llm_gateway
+from .node_registry import NodeContext
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+AI_AGENT_TIMEOUT_SECONDS = float(os.getenv("AI_AGENT_TIMEOUT_SECONDS", "120"))
+
+AI_AGENT_MODEL = "gemini-2.5-flash"
+# Ask the model for schema-shaped output directly instead of prompting and parsing.
+AI_AGENT_NATIVE_STRUCTURED_OUTPUT = bool(int(os.getenv("AI_AGENT_NATIVE_STRUCTURED_OUTPUT", "1")))
+AI_AGENT_SCHEMA_CACHE_SIZE = int(os.getenv("AI_AGENT_SCHEMA_CACHE_SIZE", "256"))
+# Field types the native path can describe from "type" alone; arrays and objects
+# need items/properties the user schema does not carry, so they prompt and parse.
+_NATIVE_SCALAR_TYPES = {"string", "number", "integer", "boolean"}
+
+# Built on first use (or by warm_up) rather than at import time.
+_llm: Optional[ChatGoogleGenerativeAI] = None
+_graph = None
+
+
+def get_llm() -> ChatGoogleGenerativeAI:
+    global _llm
+    if _llm is None:
+        _llm = ChatGoogleGenerativeAI(model=AI_AGENT_MODEL)
+    return _llm
 
 
 class AgentState(TypedDict):
@@ -15,33 +42,119 @@ class AgentState(TypedDict):
     result: dict
     formatted_response: bool
     schema: dict
+    stream_channel: Optional[str]
 
 
-def agent(state: AgentState):
-    if state.get("formatted_response") and state.get("schema"):
-        schemas = []
+def execution_stream_channel(execution_id: str, node_id: Any) -> str:
+    return f"execution_stream:{execution_id}:{node_id}"
+
+
+async def publish_stream_event(channel: str, event: dict) -> None:
+    await get_redis().publish(channel, json.dumps(event, default=str))
+
+
+async def _invoke_llm(llm_input, runnable=None):
+    async with llm_gateway.slot(llm_input):
+        # wait_for cancels the in-flight request on timeout instead of leaking it.
+        response = await asyncio.wait_for((runnable or get_llm()).ainvoke(llm_input), AI_AGENT_TIMEOUT_SECONDS)
+    llm_gateway.record_usage(llm_input, response["raw"] if isinstance(response, dict) else response)
+    return response
 
-        for field, props in state["schema"]["properties"].items():
-            description = f"Type: {props['type']}"
-            schemas.append(ResponseSchema(name=field, description=description))
 
-        parser = StructuredOutputParser.from_response_schemas(schemas)
-        format_instructions = parser.get_format_instructions()
+async def _stream_llm(llm_input, channel: str):
+    """Like _invoke_llm, publishing each token to channel as it arrives."""
+    response = None
 
-        prompt = f"""
+    async def _consume():
+        nonlocal response
+        async for chunk in get_llm().astream(llm_input):
+            response = chunk if response is None else response + chunk
+            if chunk.content:
+                await publish_stream_event(channel, {"type": "token", "content": chunk.content})
+
+    async with llm_gateway.slot(llm_input):
+        await asyncio.wait_for(_consume(), AI_AGENT_TIMEOUT_SECONDS)
+    if response is None:
+        return AIMessage(content="")
+    llm_gateway.record_usage(llm_input, response)
+    return response
+
+
+def native_json_schema(properties: dict) -> Optional[dict]:
+    """JSON schema for native structured output, or None if a field is not a plain scalar."""
+    if not properties or any(props.get("type") not in _NATIVE_SCALAR_TYPES for props in properties.values()):
+        return None
+    return {
+        "title": "Response",
+        "type": "object",
+        "properties": {field: {"type": props["type"]} for field, props in properties.items()},
+        "required": list(properties),
+    }
+
+
+class CompiledSchema:
+    """Parser, prompt prefix and native structured-output runnable for one user schema."""
+
+    def __init__(self, schema: dict):
+        properties = schema["properties"]
+        self.parser = StructuredOutputParser.from_response_schemas(
+            [ResponseSchema(name=field, description=f"Type: {props['type']}") for field, props in properties.items()]
+        )
+        self.prompt_prefix = f"""
         You are an assistant. Follow the user-provided schema.
-        Schema: {state["schema"]}
-        {format_instructions}
+        Schema: {schema}
+        {self.parser.get_format_instructions()}
+        """
+        self.structured_llm = None
+        json_schema = native_json_schema(properties)
+        if AI_AGENT_NATIVE_STRUCTURED_OUTPUT and json_schema is not None:
+            self.structured_llm = get_llm().with_structured_output(json_schema, include_raw=True)
 
+    def prompt(self, messages) -> str:
+        return f"""{self.prompt_prefix}
         User messages:
-        {state["messages"]}
+        {messages}
         """
-        response = llm.invoke(prompt)
-        parsed = parser.parse(response.content)
+
+
+_compiled_schemas: "OrderedDict[str, CompiledSchema]" = OrderedDict()
+
+
+def compile_schema(schema: dict) -> CompiledSchema:
+    """CompiledSchema for schema, cached by its canonical hash."""
+    key = schema_hash(schema)
+    compiled = _compiled_schemas.get(key)
+    if compiled is not None:
+        _compiled_schemas.move_to_end(key)
+        return compiled
+    compiled = _compiled_schemas[key] = CompiledSchema(schema)
+    while len(_compiled_schemas) > AI_AGENT_SCHEMA_CACHE_SIZE:
+        _compiled_schemas.popitem(last=False)
+    return compiled
+
+
+async def _call_llm(state: AgentState, llm_input):
+    if state.get("stream_channel"):
+        return await _stream_llm(llm_input, state["stream_channel"])
+    return await _invoke_llm(llm_input)
+
+
+async def agent(state: AgentState):
+    if state.get("formatted_response") and state.get("schema"):
+        compiled = compile_schema(state["schema"])
+        # Streaming needs raw tokens, so it keeps the prompt-and-parse path.
+        if compiled.structured_llm is not None and not state.get("stream_channel"):
+            output = await _invoke_llm(compiled.prompt(state["messages"]), compiled.structured_llm)
+            if output["parsed"] is None:
+                raise ValueError(f"Structured output did not match schema: {output['parsing_error']}")
+            return {"messages": [output["raw"]], "result": output["parsed"]}
+
+        response = await _call_llm(state, compiled.prompt(state["messages"]))
+        parsed = compiled.parser.parse(response.content)
 
         return {"messages": [response], "result": parsed}
     else:
-        response = llm.invoke(state["messages"])
+        response = await _call_llm(state, state["messages"])
         return {"messages": [response], "result": {"answer": response.content}}
 
 
@@ -51,28 +164,92 @@ def memory_node(state: AgentState):
     return {"memory": state["memory"]}
 
 
-graph_builder = StateGraph(AgentState)
-graph_builder.add_node("agent", agent)
-graph_builder.add_node("memory", memory_node)
-graph_builder.add_edge(START, "agent")
-graph_builder.add_edge("agent", "memory")
-graph_builder.add_edge("memory", END)
-graph = graph_builder.compile()
+def get_graph():
+    global _graph
+    if _graph is None:
+        graph_builder = StateGraph(AgentState)
+        graph_builder.add_node("agent", agent)
+        graph_builder.add_node("memory", memory_node)
+        graph_builder.add_edge(START, "agent")
+        graph_builder.add_edge("agent", "memory")
+        graph_builder.add_edge("memory", END)
+        _graph = graph_builder.compile()
+    return _graph
+
+
+def warm_up() -> None:
+    get_llm()
+    get_graph()
+
+
+def _message_text(message: Any) -> Any:
+    return message.content if isinstance(message, BaseMessage) else message
+
+
+def _agent_output(state: AgentState) -> dict:
+    """JSON-safe node result from the graph state, which holds LangChain message objects."""
+    return {
+        "messages": [_message_text(m) for m in state["messages"]],
+        "memory": [_message_text(m) for m in state["memory"]],
+        "result": state["result"],
+    }
 
 
 async def execute_agent(
-    user_schema: dict, messages: list[str], formatted_response: bool
+    user_schema: dict,
+    messages: list[str],
+    formatted_response: bool,
+    cache: bool = False,
+    cache_ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+    stream_channel: Optional[str] = None,
 ):
-    response = await graph.invoke(
-        {
-            "messages": messages,
-            "memory": [],
-            "result": {},
-            "formatted_response": formatted_response,
-            "schema": user_schema,
-        }
+    """
+    Run the agent graph once.
+
+    With stream_channel set, tokens are published there as they are generated,
+    followed by a "done" event carrying the final result (or an "error" event).
+    """
+    key = None
+    if cache:
+        # Entries hold the whole output; the suffix keeps older result-only entries out.
+        key = cache_key(f"{AI_AGENT_MODEL}/output", messages, user_schema, formatted_response)
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            if stream_channel:
+                await publish_stream_event(stream_channel, {"type": "done", "result": cached["result"], "cached": True})
+            return {**cached, "cached": True}
+
+    try:
+        response = await get_graph().ainvoke(
+            {
+                "messages": messages,
+                "memory": [],
+                "result": {},
+                "formatted_response": formatted_response,
+                "schema": user_schema,
+                "stream_channel": stream_channel,
+            }
+        )
+    except (Exception, asyncio.CancelledError) as e:
+        if stream_channel:
+            await publish_stream_event(stream_channel, {"type": "error", "error": str(e) or type(e).__name__})
+        raise
+    output = _agent_output(response)
+    if stream_channel:
+        await publish_stream_event(stream_channel, {"type": "done", "result": output["result"]})
+    if key is not None:
+        await llm_cache.set(key, output, cache_ttl_seconds)
+    return {**output, "cached": False}
+
+
+async def handle_ai_agent_node(context: NodeContext):
+    data = context.data
+    stream = bool(data.get("stream", False)) and context.execution_id is not None
+    return await execute_agent(
+        user_schema=data.get("schema", {}),
+        messages=data.get("messages", []),
+        formatted_response=data.get("formatted_response", False),
+        cache=bool(data.get("cache", False)),
+        cache_ttl_seconds=int(data.get("cache_ttl_seconds") or LLM_CACHE_TTL_SECONDS),
+        stream_channel=execution_stream_channel(context.execution_id, context.node_id) if stream else None,
     )
-    return response
-
-
-# asyncio.run(execute_agent())
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Dict, Set
+
+from .redis_client import get_redis
+
+# The backend sets the key (so queued or delayed runs are skipped when dequeued)
+# and publishes the id (so a worker running it stops now).
+EXECUTION_CANCEL_CHANNEL = "execution_cancel"
+
+# Executions running in this process, and which of them were cancelled on request.
+_running: Dict[str, asyncio.Task] = {}
+_cancel_requested: Set[str] = set()
+
+
+def _cancel_key(execution_id: str) -> str:
+    return f"execution_cancel:{execution_id}"
+
+
+async def is_cancel_requested(execution_id: str) -> bool:
+    return bool(await get_redis().exists(_cancel_key(execution_id)))
+
+
+def track_execution(execution_id: str, task: asyncio.Task) -> None:
+    _running[execution_id] = task
+
+
+def untrack_execution(execution_id: str) -> bool:
+    """Stop tracking; True if the execution was cancelled on request while running."""
+    _running.pop(execution_id, None)
+    if execution_id in _cancel_requested:
+        _cancel_requested.discard(execution_id)
+        return True
+    return False
+
+
+def cancel_running_execution(execution_id: str) -> bool:
+    task = _running.get(execution_id)
+    if task is None or task.done():
+        return False
+    _cancel_requested.add(execution_id)
+    task.cancel()
+    return True
@@ -0,0 +1,29 @@
+import json
+import os
+from typing import Any, Dict
+
+from .redis_client import get_redis
+
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", "86400"))
+
+
+def _checkpoint_key(execution_id: str) -> str:
+    return f"execution_checkpoint:{execution_id}"
+
+
+async def load_checkpoint(execution_id: str) -> Dict[str, Any]:
+    """Results of nodes that already succeeded in an earlier attempt, keyed by node id."""
+    raw = await get_redis().hgetall(_checkpoint_key(execution_id))
+    return {k.decode("utf-8"): json.loads(v) for k, v in raw.items()}
+
+
+async def save_node_checkpoint(execution_id: str, node_id: Any, result: Dict[str, Any]) -> None:
+    key = _checkpoint_key(execution_id)
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(key, str(node_id), json.dumps(result, default=str))
+        pipe.expire(key, CHECKPOINT_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def clear_checkpoint(execution_id: str) -> None:
+    await get_redis().delete(_checkpoint_key(execution_id))
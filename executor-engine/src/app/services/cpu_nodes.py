@@ -0,0 +1,51 @@
+# Node handlers for the cpu concurrency class; they run in the process pool.
+from typing import Any, Dict, List, Union
+
+from .node_registry import NodeContext
+
+_MISSING = object()
+
+
+def _split_path(path: Union[str, List[Any]]) -> List[Any]:
+    if isinstance(path, list):
+        return path
+    return [int(part) if part.lstrip("-").isdigit() else part for part in str(path).split(".") if part]
+
+
+def get_path(value: Any, path: Union[str, List[Any]], default: Any = None) -> Any:
+    """Follow a dotted path ("a.b.0.c") through dicts and lists."""
+    for part in _split_path(path):
+        if isinstance(value, dict):
+            value = value.get(str(part), _MISSING)
+        elif isinstance(value, list) and isinstance(part, int) and -len(value) <= part < len(value):
+            value = value[part]
+        else:
+            value = _MISSING
+        if value is _MISSING:
+            return default
+    return value
+
+
+def reshape(value: Any, mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a dict whose keys take the values found at each mapped path (or nested mapping)."""
+    out: Dict[str, Any] = {}
+    for key, path in mapping.items():
+        out[key] = reshape(value, path) if isinstance(path, dict) else get_path(value, path)
+    return out
+
+
+def handle_json_reshape_node(context: NodeContext) -> Dict[str, Any]:
+    """
+    node data: {"input": ..., "mapping": {"out": "path.in.input"}, "items_path": "optional.list"}
+
+    With items_path the mapping is applied to every element of that list.
+    """
+    data = context.data
+    value = data.get("input")
+    mapping = data.get("mapping") or {}
+    if data.get("items_path"):
+        items = get_path(value, data["items_path"], [])
+        if not isinstance(items, list):
+            raise ValueError(f"items_path {data['items_path']!r} does not point to a list")
+        return {"items": [reshape(item, mapping) for item in items]}
+    return {"result": reshape(value, mapping)}
@@ -1,11 +1,38 @@
-import smtplib
+from collections import deque
 from email.message import EmailMessage
-import os
-import imaplib
-import email
+from email.utils import make_msgid
 import asyncio
+import os
+import smtplib
+from typing import Any, Dict, List, Optional
+
+from .smtp_pool import SMTPConnectionPool, get_smtp_pool, run_in_smtp_thread, SMTP_POOL_MAX_CONNECTIONS
+from .imap_watcher import get_mailbox_watcher
+from .node_registry import NodeContext
+from .suspend_service import SuspendExecution
+
+EMAIL_FANOUT_CONCURRENCY = int(os.getenv("EMAIL_FANOUT_CONCURRENCY", "1"))
+# Consecutive failed connect/login attempts before a fan-out worker gives up.
+EMAIL_FANOUT_CONNECT_ATTEMPTS = int(os.getenv("EMAIL_FANOUT_CONNECT_ATTEMPTS", "3"))
+EMAIL_FANOUT_RECONNECT_DELAY_SECONDS = float(os.getenv("EMAIL_FANOUT_RECONNECT_DELAY_SECONDS", "1"))
+
 
-SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+class TransientEmailError(Exception):
+    """A send failed in a way worth retrying; raised so the node's RetryPolicy applies."""
+
+
+def is_transient_smtp_error(exc: BaseException) -> bool:
+    """Connection trouble and 4xx replies are temporary; 5xx replies and bad input are not."""
+    if isinstance(exc, smtplib.SMTPResponseException):
+        # SMTPConnectError carries -1 when the greeting never arrived.
+        return exc.smtp_code < 0 or 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return bool(exc.recipients) and all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPException):
+        return False
+    return isinstance(exc, OSError)
 
 
 async def send_email(
@@ -15,95 +42,198 @@ async def send_email(
     subject: str,
     msg: str,
     smtp_server: str,
+    message_id: Optional[str] = None,
 ):
     mail = EmailMessage()
     mail["Subject"] = subject
     mail["From"] = sender_email
     mail["To"] = receiver_email
+    if message_id:
+        mail["Message-ID"] = message_id
     mail.set_content(msg)
 
     try:
-        with smtplib.SMTP_SSL(smtp_server, SMTP_PORT) as server:
-            server.login(sender_email, sender_password)
-            server.send_message(mail)
+        await get_smtp_pool(smtp_server, sender_email, sender_password).send(mail)
         print("Email sent successfully")
+        return {"status": "sent", "to": receiver_email}
     except Exception as e:
+        if is_transient_smtp_error(e):
+            print(f"Temporary error sending mail, will retry: {str(e)}")
+            raise TransientEmailError(str(e)) from e
         print(f"Error sending mail: {str(e)}")
+        return {"status": "failed", "to": receiver_email, "error": str(e)}
 
 
-async def check_for_mails(
-    receiver_email: str,
-    receiver_email_password: str,
-    imap_server: str,
+def normalize_recipients(value: Any) -> List[str]:
+    """Accept a list or comma/semicolon separated string; drop blanks and duplicates."""
+    if isinstance(value, str):
+        value = value.replace(";", ",").split(",")
+    if not isinstance(value, (list, tuple)):
+        return []
+    seen: Dict[str, None] = {}
+    for item in value:
+        address = str(item).strip() if item is not None else ""
+        if address:
+            seen.setdefault(address, None)
+    return list(seen)
+
+
+async def _fan_out_worker(
+    pool: SMTPConnectionPool,
+    pending: deque,
+    build_message,
+    results: Dict[str, Dict[str, Any]],
+    attempts: Dict[str, int],
 ):
-    try:
-        imap = imaplib.IMAP4_SSL(imap_server)
-        imap.login(receiver_email, receiver_email_password)
-
-        imap.select("inbox")
-
-        status, email_ids = imap.search(None, "UNSEEN")
-        if status != "OK":
-            print("No new emails found.")
-            return []
-        email_id_list = email_ids[0].split()
-        messages = []
-
-        for email_id in email_id_list:
-            status, msg_data = imap.fetch(email_id, "(RFC822)")
-            if status != "OK":
+    connect_failures = 0
+    while pending:
+        connected = False
+        try:
+            async with pool.connection() as conn:
+                connected = True
+                connect_failures = 0
+                while pending:
+                    recipient = pending.popleft()
+                    attempts[recipient] = attempts.get(recipient, 0) + 1
+                    try:
+                        await run_in_smtp_thread(conn.smtp.send_message, build_message(recipient))
+                        results[recipient] = {"to": recipient, "status": "sent"}
+                    except smtplib.SMTPServerDisconnected:
+                        if attempts[recipient] < 2:
+                            pending.appendleft(recipient)
+                        else:
+                            results[recipient] = {"to": recipient, "status": "failed", "error": "Server disconnected"}
+                        raise
+                    except Exception as e:
+                        # Refused recipient, data error or an address the message
+                        # cannot be built for: the session is still usable.
+                        results[recipient] = {"to": recipient, "status": "failed", "error": str(e)}
+        except Exception as e:
+            if connected and isinstance(e, smtplib.SMTPServerDisconnected):
+                # Dropped mid-batch; the recipient in flight was requeued or failed above.
                 continue
-
-            for response_part in msg_data:
-                if isinstance(response_part, tuple):
-                    msg = email.message_from_bytes(response_part[1])
-                    messages.append(
-                        {
-                            "subject": msg["subject"],
-                            "from": msg["from"],
-                        }
-                    )
-
-        imap.logout()
-        return messages
-
-    except Exception as e:
-        print(f"Error checking mails: {str(e)}")
-        return []
+            connect_failures += 1
+            if connected or connect_failures >= EMAIL_FANOUT_CONNECT_ATTEMPTS:
+                # Could not connect or log in; nothing left in this batch can be sent.
+                while pending:
+                    recipient = pending.popleft()
+                    results[recipient] = {"to": recipient, "status": "failed", "error": str(e)}
+                return
+            await asyncio.sleep(EMAIL_FANOUT_RECONNECT_DELAY_SECONDS * 2 ** (connect_failures - 1))
+
+
+def _fan_out_concurrency(value: Any) -> int:
+    """The node's concurrency setting, or the default when it is missing or not a number."""
+    if value is None or value == "":
+        return EMAIL_FANOUT_CONCURRENCY
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        print(f"Ignoring invalid email concurrency {value!r}; using {EMAIL_FANOUT_CONCURRENCY}")
+        return EMAIL_FANOUT_CONCURRENCY
 
 
-async def send_email_and_wait_for_reply(
+async def send_bulk_email(
     sender_email: str,
     sender_password: str,
-    receiver_email: str,
+    receiver_emails: Any,
     subject: str,
     msg: str,
     smtp_server: str,
-    imap_server: str,
-    wait_timeout_seconds: int = 300,
-    poll_interval_seconds: int = 10,
+    concurrency: int = EMAIL_FANOUT_CONCURRENCY,
 ):
-    await send_email(
-        sender_email=sender_email,
-        sender_password=sender_password,
-        receiver_email=receiver_email,
-        subject=subject,
-        msg=msg,
-        smtp_server=smtp_server,
+    """
+    Send the same message to many recipients over pooled SMTP sessions.
+
+    Recipients share `concurrency` logged-in connections (one by default) instead
+    of connecting per address, and each recipient gets its own result entry.
+    """
+    recipients = normalize_recipients(receiver_emails)
+    if not recipients:
+        return {"status": "failed", "sent": 0, "failed": 0, "recipients": [], "error": "No recipients"}
+
+    def build_message(recipient: str) -> EmailMessage:
+        mail = EmailMessage()
+        mail["Subject"] = subject
+        mail["From"] = sender_email
+        mail["To"] = recipient
+        mail.set_content(msg)
+        return mail
+
+    pool = get_smtp_pool(smtp_server, sender_email, sender_password)
+    pending = deque(recipients)
+    results: Dict[str, Dict[str, Any]] = {}
+    attempts: Dict[str, int] = {}
+    workers = max(1, min(concurrency, SMTP_POOL_MAX_CONNECTIONS, len(recipients)))
+    await asyncio.gather(
+        *(_fan_out_worker(pool, pending, build_message, results, attempts) for _ in range(workers))
     )
 
-    start = asyncio.get_event_loop().time()
-    while True:
-        if asyncio.get_event_loop().time() - start > wait_timeout_seconds:
-            return {"status": "timeout", "messages": []}
-
-        messages = await check_for_mails(
-            receiver_email=sender_email,
-            receiver_email_password=sender_password,
-            imap_server=imap_server,
+    ordered = [results[r] for r in recipients if r in results]
+    sent = sum(1 for r in ordered if r["status"] == "sent")
+    failed = len(ordered) - sent
+    status = "sent" if failed == 0 else ("failed" if sent == 0 else "partial")
+    print(f"Bulk email: {sent} sent, {failed} failed")
+    return {"status": status, "sent": sent, "failed": failed, "recipients": ordered}
+
+
+async def handle_email_node(context: NodeContext):
+    data = context.data
+    cred_data = context.credentials["email"]
+    if data.get("receiver_emails"):
+        return await send_bulk_email(
+            sender_email=cred_data.get("sender_email", ""),
+            sender_password=cred_data.get("sender_password", ""),
+            receiver_emails=data.get("receiver_emails"),
+            subject=data.get("subject", ""),
+            msg=data.get("message", ""),
+            smtp_server=cred_data.get("smtp_server", ""),
+            concurrency=_fan_out_concurrency(data.get("concurrency")),
         )
+    return await send_email(
+        sender_email=cred_data.get("sender_email", ""),
+        sender_password=cred_data.get("sender_password", ""),
+        receiver_email=data.get("receiver_email", ""),
+        subject=data.get("subject", ""),
+        msg=data.get("message", ""),
+        smtp_server=cred_data.get("smtp_server", "")
+    )
 
-        if messages:
-            return {"status": "received", "messages": messages}
 
-        await asyncio.sleep(poll_interval_seconds)
+async def handle_email_wait_node(context: NodeContext):
+    """Send the message, then suspend the execution until the reply or the timeout."""
+    data = context.data
+    cred_data = context.credentials["email"]
+    # Take the UID baseline before sending; the suspended wait resumes from it, so
+    # a reply that lands before the watcher is re-armed (or after a restart) counts.
+    watcher = get_mailbox_watcher(
+        cred_data.get("imap_server", ""), cred_data.get("sender_email", ""), cred_data.get("sender_password", "")
+    )
+    since_uid = await watcher.current_uid()
+    message_id = make_msgid()
+    sent = await send_email(
+        sender_email=cred_data.get("sender_email", ""),
+        sender_password=cred_data.get("sender_password", ""),
+        receiver_email=data.get("receiver_email", ""),
+        subject=data.get("subject", ""),
+        msg=data.get("message", ""),
+        smtp_server=cred_data.get("smtp_server", ""),
+        message_id=message_id,
+    )
+    if sent.get("status") != "sent":
+        return sent
+    raise SuspendExecution(
+        wait={
+            "type": "imap_reply",
+            "imap_server": cred_data.get("imap_server", ""),
+            "username": cred_data.get("sender_email", ""),
+            # The password is looked up from the execution's credentials when the
+            # wait is armed; it is never copied into the wait index.
+            "credential": "email",
+            "since_uid": since_uid,
+            "from_address": data.get("receiver_email", ""),
+            "in_reply_to": message_id,
+        },
+        timeout_seconds=float(data.get("wait_timeout_seconds", 300)),
+        timeout_result={"status": "timeout", "messages": []},
+    )
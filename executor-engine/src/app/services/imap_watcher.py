@@ -0,0 +1,330 @@
+import asyncio
+import email
+import os
+import re
+import ssl
+import time
+from email import policy
+from email.utils import getaddresses
+from typing import Any, Dict, List, Optional, Tuple
+
+IMAP_PORT = int(os.getenv("IMAP_PORT", 993))
+IMAP_TIMEOUT_SECONDS = float(os.getenv("IMAP_TIMEOUT_SECONDS", "30"))
+# Servers drop IDLE after 30 minutes; re-issue it well before that.
+IMAP_IDLE_SECONDS = float(os.getenv("IMAP_IDLE_SECONDS", "600"))
+# Used only for servers that do not advertise IDLE.
+IMAP_POLL_SECONDS = float(os.getenv("IMAP_POLL_SECONDS", "10"))
+# Keep a mailbox connection open this long after its last waiter leaves.
+IMAP_WATCHER_LINGER_SECONDS = float(os.getenv("IMAP_WATCHER_LINGER_SECONDS", "60"))
+
+_HEADER_FIELDS = "FROM SUBJECT MESSAGE-ID IN-REPLY-TO REFERENCES"
+_LITERAL_RE = re.compile(rb"\{(\d+)\}\r\n$")
+_MESSAGE_ID_RE = re.compile(r"<[^<>\s]+>")
+_UID_RE = re.compile(rb"\bUID (\d+)")
+_UIDNEXT_RE = re.compile(rb"\[UIDNEXT (\d+)\]")
+
+
+class IMAPError(Exception):
+    pass
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class AsyncIMAPClient:
+    """Just enough IMAP4rev1 over asyncio streams to watch one mailbox."""
+
+    def __init__(self, host: str, port: int = IMAP_PORT):
+        self.host = host
+        self.port = port
+        self.capabilities: set[bytes] = set()
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._tag = 0
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl.create_default_context()),
+            IMAP_TIMEOUT_SECONDS,
+        )
+        greeting, _ = await asyncio.wait_for(self._read_response(), IMAP_TIMEOUT_SECONDS)
+        if not greeting.startswith(b"* OK"):
+            raise IMAPError(f"Unexpected greeting: {greeting!r}")
+
+    async def _read_response(self) -> Tuple[bytes, List[bytes]]:
+        """One server response line with any {N} literals it carries split out."""
+        text = b""
+        literals: List[bytes] = []
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                raise ConnectionError("IMAP connection closed")
+            match = _LITERAL_RE.search(line)
+            if match:
+                text += line[: match.start()]
+                literals.append(await self._reader.readexactly(int(match.group(1))))
+                continue
+            return text + line.rstrip(b"\r\n"), literals
+
+    def _next_tag(self) -> bytes:
+        self._tag += 1
+        return f"A{self._tag:04d}".encode()
+
+    async def _collect(self, tag: bytes) -> List[Tuple[bytes, List[bytes]]]:
+        untagged = []
+        while True:
+            text, literals = await self._read_response()
+            if text.startswith(tag + b" "):
+                if text[len(tag) + 1:].split(b" ", 1)[0].upper() != b"OK":
+                    raise IMAPError(text.decode("utf-8", errors="replace"))
+                return untagged
+            untagged.append((text, literals))
+
+    async def command(self, line: str) -> List[Tuple[bytes, List[bytes]]]:
+        tag = self._next_tag()
+        self._writer.write(tag + b" " + line.encode("utf-8") + b"\r\n")
+        await self._writer.drain()
+        return await asyncio.wait_for(self._collect(tag), IMAP_TIMEOUT_SECONDS)
+
+    async def login(self, username: str, password: str) -> None:
+        await self.command(f"LOGIN {_quote(username)} {_quote(password)}")
+        for text, _ in await self.command("CAPABILITY"):
+            if text.upper().startswith(b"* CAPABILITY"):
+                self.capabilities = set(text.upper().split()[2:])
+
+    async def select(self, mailbox: str = "INBOX") -> int:
+        """Select mailbox and return the highest UID currently in it."""
+        for text, _ in await self.command(f"SELECT {mailbox}"):
+            match = _UIDNEXT_RE.search(text)
+            if match:
+                return int(match.group(1)) - 1
+        uids = await self.uid_search("ALL")
+        return max(uids, default=0)
+
+    async def uid_search(self, criteria: str) -> List[int]:
+        uids: List[int] = []
+        for text, _ in await self.command(f"UID SEARCH {criteria}"):
+            if text.upper().startswith(b"* SEARCH"):
+                uids.extend(int(u) for u in text.split()[2:])
+        return uids
+
+    async def fetch_headers_since(self, last_uid: int) -> List[Tuple[int, bytes]]:
+        """Headers (not bodies, not marked seen) of messages with UID > last_uid."""
+        out = []
+        for text, literals in await self.command(
+            f"UID FETCH {last_uid + 1}:* (UID BODY.PEEK[HEADER.FIELDS ({_HEADER_FIELDS})])"
+        ):
+            match = _UID_RE.search(text)
+            if match and literals and int(match.group(1)) > last_uid:
+                out.append((int(match.group(1)), literals[0]))
+        return out
+
+    async def idle(self, timeout: float) -> bool:
+        """Block in IDLE until the mailbox changes or timeout; True if it changed."""
+        tag = self._next_tag()
+        self._writer.write(tag + b" IDLE\r\n")
+        await self._writer.drain()
+        text, _ = await asyncio.wait_for(self._read_response(), IMAP_TIMEOUT_SECONDS)
+        if not text.startswith(b"+"):
+            raise IMAPError(f"IDLE rejected: {text!r}")
+
+        changed = False
+        deadline = time.monotonic() + timeout
+        while not changed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                text, _ = await asyncio.wait_for(self._read_response(), remaining)
+            except asyncio.TimeoutError:
+                break
+            changed = text.upper().endswith((b" EXISTS", b" RECENT"))
+
+        self._writer.write(b"DONE\r\n")
+        await self._writer.drain()
+        await asyncio.wait_for(self._collect(tag), IMAP_TIMEOUT_SECONDS)
+        return changed
+
+    async def logout(self) -> None:
+        try:
+            await self.command("LOGOUT")
+        except Exception:
+            pass
+        finally:
+            if self._writer:
+                self._writer.close()
+
+
+class _Waiter:
+    def __init__(self, from_address: Optional[str], in_reply_to: Optional[str], since_uid: Optional[int]):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.from_address = from_address.lower() if from_address else None
+        self.in_reply_to = in_reply_to
+        # Only messages with a higher UID count; None until the watcher's baseline is known.
+        self.since_uid = since_uid
+
+    def matches(self, message: Dict[str, Any]) -> bool:
+        if self.since_uid is not None and message["uid"] <= self.since_uid:
+            return False
+        # A reply in the thread we started is the reply, whoever it came from;
+        # when we know the thread, mail outside it never counts.
+        if self.in_reply_to:
+            return self.in_reply_to in message["thread_ids"]
+        if self.from_address:
+            return self.from_address in message["from_addresses"]
+        return True
+
+
+class MailboxWatcher:
+    """
+    One IMAP connection per mailbox, pushed new mail through IDLE.
+
+    Waiters register a future plus what counts as their reply; only headers of
+    messages with UIDs above the last one seen are fetched, and matching waiters
+    are resolved directly. A waiter registered with an older since_uid (one
+    re-armed after a restart, say) makes the next fetch start from there, so a
+    reply that arrived while nobody was watching is still delivered.
+    """
+
+    def __init__(self, host: str, username: str, password: str):
+        self.host = host
+        self.username = username
+        self.password = password
+        self._waiters: List[_Waiter] = []
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_uid: Optional[int] = None
+
+    def register(
+        self,
+        from_address: Optional[str] = None,
+        in_reply_to: Optional[str] = None,
+        since_uid: Optional[int] = None,
+    ) -> _Waiter:
+        if since_uid is None:
+            since_uid = self._last_uid
+        waiter = _Waiter(from_address, in_reply_to, since_uid)
+        self._waiters.append(waiter)
+        if self._task is None or self._task.done():
+            self._ready.clear()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return waiter
+
+    def unregister(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        if not waiter.future.done():
+            waiter.future.cancel()
+
+    async def wait_ready(self, timeout: float = IMAP_TIMEOUT_SECONDS) -> None:
+        """Wait until the UID baseline is taken, so mail sent afterwards is not missed."""
+        await asyncio.wait_for(self._ready.wait(), timeout)
+
+    async def current_uid(self) -> int:
+        """
+        Highest UID the watcher has seen, connecting first if needed.
+
+        Record it before sending a message and pass it back as since_uid when
+        waiting for the reply; anything that arrives in between is still matched.
+        """
+        probe = self.register()
+        try:
+            await self.wait_ready()
+            if self._last_uid is None:
+                # The first connect failed; the probe carries the reason.
+                probe.future.result()
+                raise IMAPError(f"Could not watch {self.username}@{self.host}")
+            return self._last_uid
+        finally:
+            self.unregister(probe)
+
+    def _dispatch(self, uid: int, raw_headers: bytes) -> None:
+        msg = email.message_from_bytes(raw_headers, policy=policy.default)
+        thread_ids = " ".join(str(msg.get(h, "")) for h in ("In-Reply-To", "References"))
+        from_header = str(msg.get("From", ""))
+        message = {
+            "uid": uid,
+            "subject": str(msg.get("Subject", "")),
+            "from": from_header,
+            "from_addresses": {address.lower() for _, address in getaddresses([from_header]) if address},
+            "thread_ids": set(_MESSAGE_ID_RE.findall(thread_ids)),
+        }
+        for waiter in list(self._waiters):
+            if not waiter.future.done() and waiter.matches(message):
+                waiter.future.set_result({"subject": message["subject"], "from": message["from"]})
+                self._waiters.remove(waiter)
+
+    async def _watch(self, client: AsyncIMAPClient) -> None:
+        idle_since: Optional[float] = None
+        while True:
+            if self._waiters:
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > IMAP_WATCHER_LINGER_SECONDS:
+                return
+
+            offered = list(self._waiters)
+            start = min(
+                [self._last_uid] + [w.since_uid for w in offered if w.since_uid is not None],
+            )
+            for uid, raw_headers in await client.fetch_headers_since(start):
+                self._last_uid = max(self._last_uid, uid)
+                self._dispatch(uid, raw_headers)
+            # Everything up to _last_uid has now been offered to these waiters.
+            for waiter in offered:
+                if waiter.since_uid is None or waiter.since_uid < self._last_uid:
+                    waiter.since_uid = self._last_uid
+
+            if b"IDLE" in client.capabilities:
+                await client.idle(min(IMAP_IDLE_SECONDS, IMAP_WATCHER_LINGER_SECONDS))
+            else:
+                await asyncio.sleep(IMAP_POLL_SECONDS)
+                await client.command("NOOP")
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        self._last_uid = None
+        while self._waiters or self._last_uid is None:
+            client = AsyncIMAPClient(self.host)
+            try:
+                await client.connect()
+                await client.login(self.username, self.password)
+                current = await client.select("INBOX")
+                # After a reconnect keep the old baseline so nothing in between is lost.
+                if self._last_uid is None:
+                    self._last_uid = current
+                    for waiter in self._waiters:
+                        if waiter.since_uid is None:
+                            waiter.since_uid = current
+                self._ready.set()
+                backoff = 1.0
+                await self._watch(client)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"IMAP watcher for {self.username}@{self.host} failed: {e}")
+                if self._last_uid is None:
+                    for waiter in self._waiters:
+                        if not waiter.future.done():
+                            waiter.future.set_exception(e)
+                    self._waiters.clear()
+                    self._ready.set()
+                    return
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                await client.logout()
+
+
+_watchers: Dict[Tuple[str, str], MailboxWatcher] = {}
+
+
+def get_mailbox_watcher(host: str, username: str, password: str) -> MailboxWatcher:
+    key = (host, username)
+    watcher = _watchers.get(key)
+    if watcher is None or watcher.password != password:
+        watcher = _watchers[key] = MailboxWatcher(host, username, password)
+    return watcher
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from .redis_client import get_redis
+from . import metrics
+
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_LOCAL_SIZE = int(os.getenv("LLM_CACHE_LOCAL_SIZE", "1024"))
+
+
+def _normalize(value: Any) -> Any:
+    # Whitespace differences from template resolution should not split the cache.
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def schema_hash(schema: Any) -> str:
+    return hashlib.sha256(json.dumps(schema or {}, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def cache_key(model: str, messages: Any, schema: Any, formatted_response: bool) -> str:
+    prompt = json.dumps(_normalize(messages), sort_keys=True, default=str)
+    digest = hashlib.sha256(
+        f"{model}\0{int(bool(formatted_response))}\0{schema_hash(schema)}\0{prompt}".encode("utf-8")
+    ).hexdigest()
+    return f"llm_cache:{digest}"
+
+
+class LLMResponseCache:
+    """
+    In-process LRU in front of Redis for agent results keyed by cache_key().
+
+    Local entries carry the same expiry as the Redis key they mirror, so a
+    short cache_ttl_seconds is honoured on every executor.
+    """
+
+    def __init__(self, local_size: int = LLM_CACHE_LOCAL_SIZE):
+        self.local_size = local_size
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def _remember(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self._local[key] = (time.monotonic() + ttl_seconds, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._local.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if time.monotonic() < expires_at:
+                self._local.move_to_end(key)
+                metrics.incr("llm_cache.hit_local")
+                return value
+            del self._local[key]
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            raw, ttl_ms = await pipe.execute()
+        if raw is None:
+            metrics.incr("llm_cache.miss")
+            return None
+        value = json.loads(raw)
+        if ttl_ms > 0:
+            self._remember(key, value, ttl_ms / 1000)
+        metrics.incr("llm_cache.hit_redis")
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: int = LLM_CACHE_TTL_SECONDS) -> None:
+        self._remember(key, value, ttl_seconds)
+        await get_redis().set(key, json.dumps(value, default=str), ex=ttl_seconds)
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from . import metrics
+
+# Calls in flight across every ai_agent node in this executor.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Provider quotas per executor; 0 disables the limit.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Reserved per call for the completion until the real usage is known.
+LLM_ESTIMATED_OUTPUT_TOKENS = int(os.getenv("LLM_ESTIMATED_OUTPUT_TOKENS", "512"))
+# After a 429 every caller backs off this long instead of piling on more.
+LLM_RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN_SECONDS", "10"))
+
+
+def estimate_tokens(llm_input: Any) -> int:
+    # ~4 characters per token is close enough for admission control.
+    return len(str(llm_input)) // 4 + LLM_ESTIMATED_OUTPUT_TOKENS
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(error)
+
+
+class _PerMinuteBucket:
+    """Token bucket refilled per minute; charges may push it negative (debt)."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def charge(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+
+class LLMGateway:
+    """
+    Admission for LLM calls: a concurrency cap plus request and token budgets.
+
+    Callers wait here rather than sending requests the provider would reject;
+    a 429 that still gets through pauses everyone for a cooldown.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+    ):
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._requests: Optional[_PerMinuteBucket] = (
+            _PerMinuteBucket(requests_per_minute) if requests_per_minute > 0 else None
+        )
+        self._tokens: Optional[_PerMinuteBucket] = (
+            _PerMinuteBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        )
+        self._paused_until = 0.0
+
+    @asynccontextmanager
+    async def slot(self, llm_input: Any) -> AsyncIterator["LLMGateway"]:
+        estimated = estimate_tokens(llm_input)
+        queued_at = time.monotonic()
+        async with self._slots:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            if self._requests is not None:
+                await self._requests.acquire(1)
+            if self._tokens is not None:
+                await self._tokens.acquire(estimated)
+            metrics.observe("llm_gateway.queue_wait_seconds", time.monotonic() - queued_at)
+            metrics.incr("llm_gateway.calls")
+            try:
+                yield self
+            except Exception as e:
+                if _is_rate_limited(e):
+                    metrics.incr("llm_gateway.rate_limited")
+                    self._paused_until = time.monotonic() + LLM_RATE_LIMIT_COOLDOWN_SECONDS
+                raise
+
+    def record_usage(self, llm_input: Any, response: Any) -> None:
+        """Settle the token budget with the usage the provider reported."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        used = usage.get("total_tokens")
+        if not used:
+            return
+        metrics.incr("llm_gateway.tokens", used)
+        if self._tokens is not None:
+            self._tokens.charge(used - estimate_tokens(llm_input))
+
+
+llm_gateway = LLMGateway()
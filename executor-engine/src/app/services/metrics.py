@@ -0,0 +1,42 @@
+import asyncio
+import os
+from collections import defaultdict
+from typing import Dict
+
+from .redis_client import get_redis
+
+METRICS_KEY = "executor:metrics"
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "10"))
+
+# Deltas since the last flush; every executor adds into one Redis hash.
+_pending: Dict[str, float] = defaultdict(float)
+
+
+def incr(name: str, value: float = 1.0) -> None:
+    _pending[name] += value
+
+
+def observe(name: str, value: float) -> None:
+    """Record one sample; exported as <name>.count and <name>.sum."""
+    _pending[f"{name}.count"] += 1
+    _pending[f"{name}.sum"] += value
+
+
+async def flush_metrics() -> None:
+    if not _pending:
+        return
+    deltas = dict(_pending)
+    _pending.clear()
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for name, value in deltas.items():
+            pipe.hincrbyfloat(METRICS_KEY, name, value)
+        await pipe.execute()
+
+
+async def flush_metrics_forever() -> None:
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            await flush_metrics()
+        except Exception as e:
+            print(f"Error flushing metrics: {e}")
@@ -0,0 +1,200 @@
+import asyncio
+import importlib
+import importlib.util
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+from .process_pool import run_cpu_task
+from .retry_policy import RetryPolicy, configure_retry_policy
+
+# eager: import and warm every node type before consuming the queue.
+# background: start consuming at once and warm up alongside.
+# lazy: load each node type on its first execution.
+NODE_WARMUP_MODE = os.getenv("NODE_WARMUP_MODE", "background")
+# Applies to node types and nodes that do not set their own timeout.
+NODE_TIMEOUT_SECONDS = float(os.getenv("NODE_TIMEOUT_SECONDS", "300"))
+
+# Concurrency classes: IO handlers are coroutines run on the event loop, CPU
+# handlers are module-level functions run in the process pool.
+IO = "io"
+CPU = "cpu"
+
+
+@dataclass
+class NodeContext:
+    """What a handler gets: the node's resolved data and only the credentials it declared."""
+
+    node_id: Any
+    node_type: str
+    data: Dict[str, Any]
+    # Credential type -> that credential's data.
+    credentials: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    execution_id: Optional[str] = None
+    # Earlier node results (by node id) and the trigger payload of the run.
+    results: Dict[str, Any] = field(default_factory=dict)
+    trigger: Any = None
+
+
+@dataclass(frozen=True)
+class NodeTypePlugin:
+    node_type: str
+    # Module implementing the node type, relative to this package.
+    module: str
+    # Name of the handler in that module, called with a NodeContext.
+    handler: str
+    credentials: Tuple[str, ...] = ()
+    concurrency: str = IO
+    # Default for nodes of this type (else NODE_TIMEOUT_SECONDS); node data may set timeout_seconds.
+    # 0 leaves bounding to the handler, for handlers that time their own calls.
+    timeout_seconds: Optional[float] = None
+
+
+NODE_TYPES: Dict[str, NodeTypePlugin] = {}
+# Module -> seconds spent importing it and running its warm_up().
+_load_seconds: Dict[str, float] = {}
+
+
+def register_node_type(
+    node_type: str,
+    module: str,
+    handler: str,
+    credentials: Tuple[str, ...] = (),
+    concurrency: str = IO,
+    timeout_seconds: Optional[float] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+) -> None:
+    """Add a node type; its module is not imported until the type is used or warmed up."""
+    if concurrency not in (IO, CPU):
+        raise ValueError(f"Unknown concurrency class {concurrency!r} for node type {node_type}")
+    NODE_TYPES[node_type] = NodeTypePlugin(node_type, module, handler, tuple(credentials), concurrency, timeout_seconds)
+    if retry_policy is not None:
+        configure_retry_policy(node_type, retry_policy)
+
+
+register_node_type(
+    "ai_agent",
+    ".ai_agent_service",
+    "handle_ai_agent_node",
+    retry_policy=RetryPolicy(max_retries=4, base_delay_seconds=5.0, max_delay_seconds=120.0),
+)
+register_node_type(
+    "email",
+    ".email_service",
+    "handle_email_node",
+    credentials=("email",),
+    retry_policy=RetryPolicy(max_retries=5, base_delay_seconds=30.0, max_delay_seconds=900.0),
+)
+register_node_type(
+    "email_wait",
+    ".email_service",
+    "handle_email_wait_node",
+    credentials=("email",),
+    retry_policy=RetryPolicy(max_retries=5, base_delay_seconds=30.0, max_delay_seconds=900.0),
+)
+register_node_type(
+    "telegram",
+    ".telegram_service",
+    "handle_telegram_node",
+    credentials=("telegram",),
+    # Sends wait their turn behind per-chat pacing; only the Bot API call is timed.
+    timeout_seconds=0,
+    retry_policy=RetryPolicy(max_retries=5, base_delay_seconds=1.0, max_delay_seconds=60.0),
+)
+register_node_type("wait", ".suspend_service", "handle_wait_node")
+register_node_type(
+    "transform",
+    ".transform_service",
+    "handle_transform_node",
+    retry_policy=RetryPolicy(max_retries=0),
+)
+register_node_type(
+    "json_reshape",
+    ".cpu_nodes",
+    "handle_json_reshape_node",
+    concurrency=CPU,
+    retry_policy=RetryPolicy(max_retries=0),
+)
+
+
+def _resolve(module: str) -> str:
+    return importlib.util.resolve_name(module, __package__)
+
+
+def _finish_load(node_type: str, module: ModuleType, started: float) -> ModuleType:
+    warm_up = getattr(module, "warm_up", None)
+    if warm_up is not None:
+        warm_up()
+    _load_seconds[module.__name__] = time.perf_counter() - started
+    print(f"Loaded node type {node_type} ({module.__name__}) in {_load_seconds[module.__name__] * 1000:.0f}ms")
+    return module
+
+
+def load_node_module(node_type: str) -> ModuleType:
+    """Module for node_type, imported and warmed up on first use."""
+    name = _resolve(NODE_TYPES[node_type].module)
+    if name in _load_seconds:
+        return sys.modules[name]
+    started = time.perf_counter()
+    return _finish_load(node_type, importlib.import_module(name), started)
+
+
+async def warm_up_node_types() -> None:
+    """Load every registered node type, importing in a thread to keep the loop free."""
+    started = time.perf_counter()
+    for plugin in NODE_TYPES.values():
+        name = _resolve(plugin.module)
+        if name in _load_seconds:
+            continue
+        try:
+            plugin_started = time.perf_counter()
+            module = await asyncio.to_thread(importlib.import_module, name)
+            # warm_up() runs on the loop's thread so clients it builds belong to the running loop.
+            _finish_load(plugin.node_type, module, plugin_started)
+        except Exception as e:
+            print(f"Warm-up of node type {plugin.node_type} failed: {e}")
+    print(f"Node types warmed up in {(time.perf_counter() - started) * 1000:.0f}ms")
+    print(import_profile_report())
+
+
+async def run_node_handler(
+    node_id: Any,
+    node_type: str,
+    node_data: Dict[str, Any],
+    credentials: Dict[str, Any],
+    execution_id: Optional[str] = None,
+    workflow_context: Optional[Dict[str, Any]] = None,
+) -> Any:
+    plugin = NODE_TYPES.get(node_type)
+    if plugin is None:
+        return {"status": "processed", "type": node_type}
+
+    handler = getattr(load_node_module(node_type), plugin.handler)
+    context = NodeContext(
+        node_id=node_id,
+        node_type=node_type,
+        data=node_data,
+        credentials={name: credentials.get(name, {}).get("data", {}) for name in plugin.credentials},
+        execution_id=execution_id,
+        results=(workflow_context or {}).get("results", {}),
+        trigger=(workflow_context or {}).get("trigger"),
+    )
+    timeout = node_data.get("timeout_seconds") or plugin.timeout_seconds
+    if plugin.concurrency == CPU:
+        return await run_cpu_task(handler, context, float(timeout) if timeout else None)
+    if timeout == 0:
+        return await handler(context)
+    return await asyncio.wait_for(handler(context), float(timeout or NODE_TIMEOUT_SECONDS))
+
+
+def import_profile() -> List[Tuple[str, float]]:
+    return sorted(_load_seconds.items(), key=lambda item: item[1], reverse=True)
+
+
+def import_profile_report() -> str:
+    lines = ["Node type load times:"]
+    lines += [f"  {seconds * 1000:8.1f}ms  {name}" for name, seconds in import_profile()]
+    return "\n".join(lines)
@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import os
+import pickle
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(os.cpu_count() or 2)))
+CPU_TASK_TIMEOUT_SECONDS = float(os.getenv("CPU_TASK_TIMEOUT_SECONDS", "30"))
+# Arguments pickled larger than this go through shared memory instead of the pool's pipe.
+CPU_SHARED_MEMORY_THRESHOLD_BYTES = int(os.getenv("CPU_SHARED_MEMORY_THRESHOLD_BYTES", str(1024 * 1024)))
+# fork would copy the running event loop and its threads into every worker.
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "forkserver")
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Pool -> queue its workers report their pid on, so a stuck pool can be killed.
+_pool_pids: Dict[ProcessPoolExecutor, Any] = {}
+
+
+def _report_pid(pids) -> None:
+    pids.put(os.getpid())
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        context = multiprocessing.get_context(CPU_POOL_START_METHOD)
+        pids = context.SimpleQueue()
+        _pool = ProcessPoolExecutor(
+            max_workers=CPU_POOL_WORKERS,
+            mp_context=context,
+            initializer=_report_pid,
+            initargs=(pids,),
+        )
+        _pool_pids[_pool] = pids
+    return _pool
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drop pool, killing its workers; a running task cannot be cancelled any other way.
+
+    Does nothing if pool was already replaced, so a task that fails late does
+    not take down the fresh pool other tasks are now running on.
+    """
+    global _pool
+    if _pool is not pool:
+        return
+    _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    pids = _pool_pids.pop(pool)
+    while not pids.empty():
+        try:
+            os.kill(pids.get(), signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    pids.close()
+
+
+def _call_with_pickled_arg(fn: Callable[[Any], Any], payload: bytes) -> Any:
+    return fn(pickle.loads(payload))
+
+
+def _call_with_shared_arg(fn: Callable[[Any], Any], name: str, size: int) -> Any:
+    # The parent owns the segment; tracking it here would have this worker's
+    # resource tracker unlink it (or warn about a leak) on exit.
+    shm = shared_memory.SharedMemory(name=name, track=False)
+    try:
+        arg = pickle.loads(shm.buf[:size])
+    finally:
+        shm.close()
+    return fn(arg)
+
+
+async def run_cpu_task(fn: Callable[[Any], Any], arg: Any, timeout: Optional[float] = None) -> Any:
+    """
+    Run fn(arg) in the process pool and await its result.
+
+    fn must be a module-level function. A task that overruns its timeout takes
+    the pool down with it, so the stuck worker does not hold a slot; tasks
+    that were running alongside it are resubmitted once to the fresh pool.
+    """
+    loop = asyncio.get_running_loop()
+    payload = pickle.dumps(arg, protocol=pickle.HIGHEST_PROTOCOL)
+    shm = None
+    try:
+        if len(payload) > CPU_SHARED_MEMORY_THRESHOLD_BYTES:
+            shm = shared_memory.SharedMemory(create=True, size=len(payload))
+            shm.buf[: len(payload)] = payload
+        for attempt in range(2):
+            pool = _get_pool()
+            if shm is not None:
+                future = loop.run_in_executor(pool, _call_with_shared_arg, fn, shm.name, len(payload))
+            else:
+                future = loop.run_in_executor(pool, _call_with_pickled_arg, fn, payload)
+            try:
+                return await asyncio.wait_for(future, timeout or CPU_TASK_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                print(f"CPU task {fn.__name__} timed out; restarting the process pool")
+                _kill_pool(pool)
+                raise
+            except BrokenProcessPool:
+                _kill_pool(pool)
+                if attempt:
+                    raise
+                print(f"CPU task {fn.__name__} lost its worker; resubmitting it to a fresh pool")
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def close_process_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+        _pool_pids.pop(pool).close()
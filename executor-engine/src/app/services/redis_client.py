@@ -0,0 +1,14 @@
+import os
+from typing import Optional
+from redis.asyncio import Redis
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """Process-wide Redis client for the executor's hot paths."""
+    global _redis
+    if _redis is None:
+        redis_url = os.getenv("REDIS_URL", "redis://localhost")
+        _redis = Redis.from_url(redis_url)
+    return _redis
@@ -4,6 +4,39 @@ import json
 from typing import Dict, Any, Optional
 import httpx
 from redis.asyncio import Redis
+from .scheduler import (
+    PriorityScheduler,
+    RETRY_PROMOTE_BATCH_SIZE,
+    enqueue_execution,
+    schedule_execution,
+    promote_due_executions,
+)
+from .retry_policy import NodeExecutionError, get_retry_policy
+from .redis_client import get_redis
+from .checkpoint_service import load_checkpoint, save_node_checkpoint, clear_checkpoint
+from .suspend_service import SuspendExecution, suspend_execution, cancel_suspension
+from .cancellation import (
+    EXECUTION_CANCEL_CHANNEL,
+    cancel_running_execution,
+    is_cancel_requested,
+    track_execution,
+    untrack_execution,
+)
+from .node_registry import run_node_handler
+
+RETRY_PROMOTE_INTERVAL_SECONDS = float(os.getenv("RETRY_PROMOTE_INTERVAL_SECONDS", "0.5"))
+EXECUTOR_CONCURRENCY = int(os.getenv("EXECUTOR_CONCURRENCY", "8"))
+# Wall-clock budget of one run of an execution; execution data may set timeout_seconds.
+EXECUTION_TIMEOUT_SECONDS = float(os.getenv("EXECUTION_TIMEOUT_SECONDS", "1800"))
+
+_scheduler: Optional[PriorityScheduler] = None
+
+
+def _get_scheduler() -> PriorityScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PriorityScheduler(get_redis())
+    return _scheduler
 
 async def redisClient(key: str):
     redis_url = os.getenv("REDIS_URL", "redis://localhost")
@@ -13,13 +46,12 @@ async def redisClient(key: str):
     await redis.close()
 
 async def get_execution_from_queue() -> Optional[Dict[str, Any]]:
-    redis_url = os.getenv("REDIS_URL", "redis://localhost")
-    redis: Redis = Redis.from_url(redis_url)
+    scheduler = _get_scheduler()
+    redis = scheduler.redis
     try:
-        execution_id = await redis.brpop("execution_queue", timeout=1)
+        execution_id = await scheduler.next_execution_id(timeout=1)
         if not execution_id:
             return None
-        execution_id = execution_id[1].decode('utf-8')
         queue_key = f"execution_queue:{execution_id}"
         execution_data = await redis.get(queue_key)
         if execution_data:
@@ -29,9 +61,8 @@ async def get_execution_from_queue() -> Optional[Dict[str, Any]]:
         return None
     except Exception as e:
         print(f"Error getting execution from queue: {e}")
+        await asyncio.sleep(1)
         return None
-    finally:
-        await redis.close()
 
 async def update_execution_status(execution_id: str, status: str, result: Dict[str, Any] = None):
     redis_url = os.getenv("REDIS_URL", "redis://localhost")
@@ -51,41 +82,122 @@ async def update_execution_status(execution_id: str, status: str, result: Dict[s
         await redis.close()
 
 async def process_execution_queue():
+    # Each worker runs one execution at a time; I/O-bound nodes from different
+    # executions overlap on the event loop.
+    await asyncio.gather(*(_execution_worker() for _ in range(EXECUTOR_CONCURRENCY)))
+
+async def _execution_worker():
     while True:
         try:
             execution_data = await get_execution_from_queue()
             if execution_data:
-                execution_id = execution_data.get("execution_id")
-                execution_type = execution_data.get("execution_type")
-                print(f"Processing execution {execution_id} of type {execution_type}")
-                await update_execution_status(execution_id, "processing")
-                await post_status_update_backend(execution_id, "processing")
-                try:
-                    if execution_type == "workflow":
-                        result = await process_workflow_execution(execution_data)
-                    elif execution_type == "node":
-                        result = await process_node_execution(execution_data)
-                    else:
-                        result = {"error": "Unknown execution type"}
-                    await update_execution_status(execution_id, "completed", result)
-                    await post_status_update_backend(execution_id, "completed", result=result)
-                    print(f"Execution {execution_id} completed successfully")
-                except Exception as e:
-                    retry_count = int(execution_data.get("retry_count", 0))
-                    if retry_count < 3:
-                        print(f"Execution {execution_id} failed (attempt {retry_count+1}). Retrying...")
-                        await requeue_execution_with_retry(execution_data, retry_count + 1)
-                    else:
-                        await update_execution_status(execution_id, "failed", {"error": str(e)})
-                        await post_status_update_backend(execution_id, "failed", error={"error": str(e)})
-                        print(f"Execution {execution_id} permanently failed after retries: {e}")
-            else:
-                await asyncio.sleep(1)
+                await _run_execution(execution_data)
         except Exception as e:
             print(f"Error in execution queue processing: {e}")
             await asyncio.sleep(5)
 
+async def _finish_execution(execution_id: str, status: str, error: str) -> None:
+    await update_execution_status(execution_id, status, {"error": error})
+    await post_status_update_backend(execution_id, status, error={"error": error})
+    await clear_checkpoint(execution_id)
+    print(f"Execution {execution_id} {status}: {error}")
+
+async def _start_execution(execution_data: Dict[str, Any]) -> Dict[str, Any]:
+    execution_id = execution_data.get("execution_id")
+    print(f"Processing execution {execution_id} of type {execution_data.get('execution_type')}")
+    await update_execution_status(execution_id, "processing")
+    await post_status_update_backend(execution_id, "processing")
+    return await _process_execution(execution_data)
+
+async def _process_execution(execution_data: Dict[str, Any]) -> Dict[str, Any]:
+    execution_type = execution_data.get("execution_type")
+    if execution_type == "workflow":
+        return await process_workflow_execution(execution_data)
+    if execution_type == "node":
+        return await process_node_execution(execution_data)
+    return {"error": "Unknown execution type"}
+
+async def _run_execution(execution_data: Dict[str, Any]) -> None:
+    execution_id = execution_data.get("execution_id")
+    timeout = float(execution_data.get("timeout_seconds") or EXECUTION_TIMEOUT_SECONDS)
+    work = asyncio.ensure_future(_start_execution(execution_data))
+    # Tracked before the cancel check, so a cancel published while checking
+    # (or while the status updates run) still reaches the task.
+    track_execution(execution_id, work)
+    try:
+        try:
+            if execution_id and await is_cancel_requested(execution_id):
+                # Cancelled while queued or waiting for a retry.
+                cancel_running_execution(execution_id)
+            result = await asyncio.wait_for(work, timeout)
+        finally:
+            cancelled = untrack_execution(execution_id)
+        await update_execution_status(execution_id, "completed", result)
+        await post_status_update_backend(execution_id, "completed", result=result)
+        await clear_checkpoint(execution_id)
+        print(f"Execution {execution_id} completed successfully")
+    except asyncio.CancelledError:
+        if not cancelled:
+            work.cancel()
+            raise
+        await _finish_execution(execution_id, "cancelled", "Execution was cancelled")
+    except TimeoutError:
+        # Node and call timeouts surface as NodeExecutionError; this is the whole run.
+        await _finish_execution(execution_id, "timed_out", f"Execution exceeded {timeout:g}s")
+    except SuspendExecution as suspension:
+        # Park the execution and free this worker; an event requeues it.
+        waiting = await suspend_execution(execution_data, suspension)
+        await update_execution_status(execution_id, "waiting", waiting)
+        await post_status_update_backend(execution_id, "waiting", result=waiting)
+        print(f"Execution {execution_id} waiting for {waiting['waiting_for']}")
+    except Exception as e:
+        retry_count = int(execution_data.get("retry_count", 0))
+        policy = get_retry_policy(getattr(e, "node_type", None))
+        if retry_count < policy.max_retries:
+            delay = policy.delay_for(retry_count + 1)
+            print(f"Execution {execution_id} failed (attempt {retry_count+1}). Retrying in {delay:.1f}s...")
+            await requeue_execution_with_retry(execution_data, retry_count + 1, delay)
+        elif isinstance(getattr(e, "cause", None), TimeoutError):
+            await _finish_execution(execution_id, "timed_out", f"Node {e.node_id} ({e.node_type}) timed out")
+        else:
+            await _finish_execution(execution_id, "failed", str(e))
+
+async def listen_for_cancellations_forever() -> None:
+    """Stop executions this process is running, or has parked, when the backend cancels them."""
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(EXECUTION_CANCEL_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                execution_id = message["data"].decode("utf-8")
+                if cancel_running_execution(execution_id):
+                    print(f"Cancelling running execution {execution_id}")
+                elif await cancel_suspension(execution_id):
+                    await _finish_execution(execution_id, "cancelled", "Execution was cancelled")
+        except Exception as e:
+            print(f"Error listening for cancellations: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+async def promote_retries_forever():
+    redis = _get_scheduler().redis
+    while True:
+        try:
+            promoted = await promote_due_executions(redis)
+            if promoted:
+                print(f"Promoted {promoted} delayed retries")
+            # A full batch means more may be due already.
+            if promoted >= RETRY_PROMOTE_BATCH_SIZE:
+                continue
+        except Exception as e:
+            print(f"Error promoting delayed retries: {e}")
+        await asyncio.sleep(RETRY_PROMOTE_INTERVAL_SECONDS)
+
 async def process_workflow_execution(execution_data: Dict[str, Any]) -> Dict[str, Any]:
+    execution_id = execution_data.get("execution_id")
     workflow_id = execution_data.get("workflow_id")
     nodes = execution_data.get("nodes", [])
     connections = execution_data.get("connections", [])
@@ -116,13 +228,23 @@ async def process_workflow_execution(execution_data: Dict[str, Any]) -> Dict[str
     if len(execution_order) != len(node_map):
         raise RuntimeError("Workflow graph has cycles or disconnected nodes")
 
+    # Nodes that succeeded on an earlier attempt are not run again.
+    checkpoint = await load_checkpoint(execution_id) if execution_id else {}
+    if checkpoint:
+        print(f"Resuming workflow {workflow_id} with {len(checkpoint)} checkpointed nodes")
+
     for node_id in execution_order:
         node = node_map.get(node_id)
         if not node:
             continue
+        if str(node_id) in checkpoint:
+            context["results"][str(node_id)] = checkpoint[str(node_id)]
+            continue
         prepared_node = resolve_node_inputs_with_context(node, context)
-        node_result = await process_single_node(prepared_node, credentials)
+        node_result = await process_single_node(prepared_node, credentials, execution_id, context)
         context["results"][str(node_id)] = node_result
+        if execution_id:
+            await save_node_checkpoint(execution_id, node_id, node_result)
 
     return {
         "workflow_id": workflow_id,
@@ -135,50 +257,37 @@ async def process_node_execution(execution_data: Dict[str, Any]) -> Dict[str, An
     node_id = execution_data.get("node_id")
     credentials = execution_data.get("credentials", {})
     print(f"Processing node {node_id}")
+    execution_id = execution_data.get("execution_id")
+    checkpoint = await load_checkpoint(execution_id) if execution_id else {}
+    if str(node.get("id")) in checkpoint:
+        # Resumed after a suspension: the awaited result is already recorded.
+        return {"node_id": node_id, "result": checkpoint[str(node.get("id"))]}
     context: Dict[str, Any] = {"results": {}, "trigger": execution_data.get("trigger")}
     prepared_node = resolve_node_inputs_with_context(node, context)
-    result = await process_single_node(prepared_node, credentials)
+    result = await process_single_node(prepared_node, credentials, execution_id, context)
     return {
         "node_id": node_id,
         "result": result
     }
 
-async def process_single_node(node: Dict[str, Any], credentials: Dict[str, Any]) -> Dict[str, Any]:
+async def process_single_node(
+    node: Dict[str, Any],
+    credentials: Dict[str, Any],
+    execution_id: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
     node_id = node.get("id")
     node_data = node.get("data", {})
     node_type = node_data.get("type", "unknown")
-    
-    if node_type == "ai_agent":
-        from .ai_agent_service import execute_agent
-        result = await execute_agent(
-            user_schema=node_data.get("schema", {}),
-            messages=node_data.get("messages", []),
-            formatted_response=node_data.get("formatted_response", False)
-        )
-    elif node_type == "email":
-        from .email_service import send_email
-        email_creds = credentials.get("email", {})
-        cred_data = email_creds.get("data", {})
-        result = await send_email(
-            sender_email=cred_data.get("sender_email", ""),
-            sender_password=cred_data.get("sender_password", ""),
-            receiver_email=node_data.get("receiver_email", ""),
-            subject=node_data.get("subject", ""),
-            msg=node_data.get("message", ""),
-            smtp_server=cred_data.get("smtp_server", "")
-        )
-    elif node_type == "telegram":
-        from .telegram_service import send_telegram_message
-        telegram_creds = credentials.get("telegram", {})
-        cred_data = telegram_creds.get("data", {})
-        result = await send_telegram_message(
-            bot_token=cred_data.get("bot_token", ""),
-            chat_id=node_data.get("chat_id", ""),
-            message_text=node_data.get("message", "")
-        )
-    else:
-        result = {"status": "processed", "type": node_type}
-    
+    try:
+        result = await run_node_handler(node_id, node_type, node_data, credentials, execution_id, context)
+    except SuspendExecution as suspension:
+        suspension.node_id = node_id
+        suspension.node_type = node_type
+        raise
+    except Exception as e:
+        raise NodeExecutionError(node_id, node_type, e) from e
+
     return {
         "node_id": node_id,
         "type": node_type,
@@ -238,15 +347,21 @@ async def post_status_update_backend(
     except Exception as e:
         print(f"Failed to post status update to backend: {e}")
 
-async def requeue_execution_with_retry(execution_data: Dict[str, Any], retry_count: int) -> None:
+async def requeue_execution_with_retry(
+    execution_data: Dict[str, Any], retry_count: int, delay_seconds: float = 0.0
+) -> None:
     redis_url = os.getenv("REDIS_URL", "redis://localhost")
     redis: Redis = Redis.from_url(redis_url)
     try:
         execution_data["retry_count"] = retry_count
         execution_id = execution_data.get("execution_id")
         queue_key = f"execution_queue:{execution_id}"
-        await redis.set(queue_key, json.dumps(execution_data), ex=3600)
-        await redis.lpush("execution_queue", execution_id)
+        # Keep the payload alive for at least an hour past its due time.
+        await redis.set(queue_key, json.dumps(execution_data), ex=3600 + int(delay_seconds))
+        if delay_seconds > 0:
+            await schedule_execution(redis, execution_data, delay_seconds)
+        else:
+            await enqueue_execution(redis, execution_data)
     except Exception as e:
         print(f"Error requeuing execution {execution_data.get('execution_id')}: {e}")
     finally:
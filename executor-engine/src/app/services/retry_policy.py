@@ -0,0 +1,54 @@
+import json
+import os
+import random
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = 3
+    base_delay_seconds: float = 2.0
+    max_delay_seconds: float = 300.0
+    multiplier: float = 2.0
+    # Fraction of each delay that is randomised so retries of a burst spread out.
+    jitter: float = 0.5
+
+    def delay_for(self, attempt: int) -> float:
+        """Backoff before retry number `attempt` (1-based)."""
+        delay = min(self.max_delay_seconds, self.base_delay_seconds * self.multiplier ** max(attempt - 1, 0))
+        return delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# Keyed by node type, filled in as node types register; failures outside a
+# node use DEFAULT_RETRY_POLICY.
+RETRY_POLICIES: Dict[str, RetryPolicy] = {}
+
+# RETRY_POLICIES='{"email": {"max_retries": 2}, "default": {"base_delay_seconds": 1}}'
+_OVERRIDES: Dict[str, Dict[str, Any]] = json.loads(os.getenv("RETRY_POLICIES") or "{}")
+if "default" in _OVERRIDES:
+    DEFAULT_RETRY_POLICY = replace(DEFAULT_RETRY_POLICY, **_OVERRIDES["default"])
+
+
+def configure_retry_policy(node_type: str, policy: RetryPolicy) -> None:
+    """Set node_type's policy; fields from the RETRY_POLICIES env var still win."""
+    RETRY_POLICIES[node_type] = replace(policy, **_OVERRIDES.get(node_type, {}))
+
+
+def get_retry_policy(node_type: Optional[str]) -> RetryPolicy:
+    policy = RETRY_POLICIES.get(node_type or "")
+    if policy is None:
+        policy = replace(DEFAULT_RETRY_POLICY, **_OVERRIDES.get(node_type or "", {}))
+    return policy
+
+
+class NodeExecutionError(Exception):
+    """A node handler failed; carries which node so retries can pick a policy."""
+
+    def __init__(self, node_id: Any, node_type: str, cause: BaseException):
+        super().__init__(str(cause))
+        self.node_id = node_id
+        self.node_type = node_type
+        self.cause = cause
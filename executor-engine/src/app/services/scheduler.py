@@ -0,0 +1,245 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from redis.asyncio import Redis
+
+# Key layout shared with the backend's utils/redis.py.
+EXECUTION_QUEUE_KEY = "execution_queue"
+EXECUTION_WAKEUP_KEY = "execution_queue:wakeup"
+# Sorted set of delayed retries scored by due time (unix seconds).
+EXECUTION_RETRY_KEY = "execution_queue:retry_schedule"
+RETRY_PROMOTE_BATCH_SIZE = int(os.getenv("RETRY_PROMOTE_BATCH_SIZE", "200"))
+
+# Highest priority first: editor runs, webhook-triggered runs, bulk/scheduled runs.
+EXECUTION_PRIORITIES = ("interactive", "webhook", "batch")
+DEFAULT_PRIORITY = "batch"
+
+# "strict" always drains a higher class first; "weighted" shares by PRIORITY_WEIGHTS.
+PRIORITY_MODE = os.getenv("PRIORITY_MODE", "strict")
+
+TENANT_REFRESH_SECONDS = float(os.getenv("TENANT_REFRESH_SECONDS", "1.0"))
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    # "u12:4,w7:2" -> {"u12": 4.0, "w7": 2.0}
+    weights: Dict[str, float] = {}
+    for item in raw.split(","):
+        tenant, _, weight = item.strip().partition(":")
+        if tenant and weight:
+            weights[tenant] = float(weight)
+    return weights
+
+
+TENANT_WEIGHTS = _parse_weights(os.getenv("TENANT_WEIGHTS", ""))
+PRIORITY_WEIGHTS = {
+    "interactive": 8.0,
+    "webhook": 3.0,
+    "batch": 1.0,
+    **_parse_weights(os.getenv("PRIORITY_WEIGHTS", "")),
+}
+
+# Forget a tenant only if its queue is still empty, so a concurrent enqueue
+# from the backend is never orphaned.
+_DROP_IF_EMPTY_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+
+def priority_queue_prefix(priority: str) -> str:
+    return f"{EXECUTION_QUEUE_KEY}:{priority}"
+
+
+def tenant_queue_key(priority: str, tenant: str) -> str:
+    return f"{priority_queue_prefix(priority)}:tenant:{tenant}"
+
+
+def tenants_key(priority: str) -> str:
+    return f"{priority_queue_prefix(priority)}:tenants"
+
+
+def execution_priority(execution_data: Dict[str, Any]) -> str:
+    priority = execution_data.get("priority")
+    return priority if priority in EXECUTION_PRIORITIES else DEFAULT_PRIORITY
+
+
+async def enqueue_execution(redis: Redis, execution_data: Dict[str, Any]) -> None:
+    """Push an execution (back) onto its tenant queue and wake an idle consumer."""
+    execution_id = execution_data.get("execution_id")
+    priority = execution_priority(execution_data)
+    tenant = execution_data.get("tenant") or f"u{execution_data.get('user_id')}"
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.lpush(tenant_queue_key(priority, tenant), execution_id)
+        pipe.sadd(tenants_key(priority), tenant)
+        pipe.lpush(EXECUTION_WAKEUP_KEY, 1)
+        pipe.ltrim(EXECUTION_WAKEUP_KEY, 0, 63)
+        await pipe.execute()
+
+
+# Moves due members ("priority|tenant|execution_id") onto their tenant queues
+# atomically, so a retry is never both scheduled and queued.
+_PROMOTE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    local priority, tenant, execution_id = string.match(member, '^([^|]*)|([^|]*)|(.*)$')
+    local prefix = KEYS[2] .. ':' .. priority
+    redis.call('LPUSH', prefix .. ':tenant:' .. tenant, execution_id)
+    redis.call('SADD', prefix .. ':tenants', tenant)
+end
+if #due > 0 then
+    redis.call('LPUSH', KEYS[3], 1)
+    redis.call('LTRIM', KEYS[3], 0, 63)
+end
+return #due
+"""
+
+
+async def schedule_execution(redis: Redis, execution_data: Dict[str, Any], delay_seconds: float) -> None:
+    """Queue an execution to be re-enqueued after delay_seconds by the retry promoter."""
+    priority = execution_priority(execution_data)
+    tenant = execution_data.get("tenant") or f"u{execution_data.get('user_id')}"
+    member = f"{priority}|{tenant}|{execution_data.get('execution_id')}"
+    await redis.zadd(EXECUTION_RETRY_KEY, {member: time.time() + delay_seconds})
+
+
+async def promote_due_executions(redis: Redis, batch_size: int = RETRY_PROMOTE_BATCH_SIZE) -> int:
+    """Move retries whose due time has passed back onto the queues; returns how many."""
+    return int(
+        await redis.eval(
+            _PROMOTE_DUE_SCRIPT,
+            3,
+            EXECUTION_RETRY_KEY,
+            EXECUTION_QUEUE_KEY,
+            EXECUTION_WAKEUP_KEY,
+            time.time(),
+            batch_size,
+        )
+    )
+
+
+class DeficitRoundRobinScheduler:
+    """
+    Deficit round robin over per-tenant Redis lists.
+
+    Each visit to a tenant adds its weight to the tenant's deficit and serves one
+    execution per whole unit of deficit, so a tenant with a 10k backlog gets its
+    share per round instead of blocking everyone queued behind it.
+    """
+
+    def __init__(self, redis: Redis, priority: str, weights: Optional[Dict[str, float]] = None):
+        self.redis = redis
+        self.priority = priority
+        self._tenants_key = tenants_key(priority)
+        self.weights = weights if weights is not None else TENANT_WEIGHTS
+        self._active: deque[str] = deque()
+        self._deficits: Dict[str, float] = {}
+        self._visiting = False
+        self._last_refresh = 0.0
+
+    def _weight(self, tenant: str) -> float:
+        return max(self.weights.get(tenant, 1.0), 0.01)
+
+    async def _refresh(self) -> None:
+        members = await self.redis.smembers(self._tenants_key)
+        for raw in members:
+            tenant = raw.decode("utf-8")
+            if tenant not in self._deficits:
+                self._deficits[tenant] = 0.0
+                self._active.append(tenant)
+        self._last_refresh = time.monotonic()
+
+    async def _drop(self, tenant: str) -> None:
+        self._active.popleft()
+        self._deficits.pop(tenant, None)
+        self._visiting = False
+        await self.redis.eval(
+            _DROP_IF_EMPTY_SCRIPT, 2, tenant_queue_key(self.priority, tenant), self._tenants_key, tenant
+        )
+
+    async def _next_from_tenants(self) -> Optional[str]:
+        # Enough passes for the lightest tenant to accumulate a whole unit of deficit.
+        min_weight = min((self._weight(t) for t in self._active), default=1.0)
+        for _ in range(len(self._active) * (1 + math.ceil(1 / min_weight))):
+            if not self._active:
+                return None
+            tenant = self._active[0]
+            if not self._visiting:
+                self._deficits[tenant] = self._deficits.get(tenant, 0.0) + self._weight(tenant)
+                self._visiting = True
+            if self._deficits[tenant] >= 1:
+                execution_id = await self.redis.rpop(tenant_queue_key(self.priority, tenant))
+                if execution_id is None:
+                    await self._drop(tenant)
+                    continue
+                self._deficits[tenant] -= 1
+                return execution_id.decode("utf-8")
+            self._active.rotate(-1)
+            self._visiting = False
+        return None
+
+    async def poll(self, force_refresh: bool = False) -> Optional[str]:
+        """Return the next execution id for this priority class without blocking."""
+        if force_refresh or not self._active or time.monotonic() - self._last_refresh > TENANT_REFRESH_SECONDS:
+            await self._refresh()
+        return await self._next_from_tenants()
+
+
+class PriorityScheduler:
+    """
+    Dequeues across priority classes, each fair-shared by its own DRR scheduler.
+
+    In strict mode a lower class only runs when every higher class is empty; in
+    weighted mode classes are interleaved by smooth weighted round robin so
+    background work keeps moving under sustained interactive load.
+    """
+
+    def __init__(self, redis: Redis, mode: str = PRIORITY_MODE, weights: Optional[Dict[str, float]] = None):
+        self.redis = redis
+        self.mode = mode
+        self.weights = weights if weights is not None else PRIORITY_WEIGHTS
+        self.classes = {p: DeficitRoundRobinScheduler(redis, p) for p in EXECUTION_PRIORITIES}
+        self._current = {p: 0.0 for p in EXECUTION_PRIORITIES}
+        # Several workers share one scheduler; DRR state must change atomically.
+        self._lock = asyncio.Lock()
+
+    def _class_order(self) -> list[str]:
+        if self.mode != "weighted":
+            return list(EXECUTION_PRIORITIES)
+        for p in EXECUTION_PRIORITIES:
+            self._current[p] += self.weights.get(p, 1.0)
+        return sorted(EXECUTION_PRIORITIES, key=lambda p: self._current[p], reverse=True)
+
+    async def _poll(self, force_refresh: bool = False) -> Optional[str]:
+        async with self._lock:
+            return await self._poll_locked(force_refresh)
+
+    async def _poll_locked(self, force_refresh: bool) -> Optional[str]:
+        for priority in self._class_order():
+            execution_id = await self.classes[priority].poll(force_refresh)
+            if execution_id:
+                if self.mode == "weighted":
+                    self._current[priority] -= sum(self.weights.get(p, 1.0) for p in EXECUTION_PRIORITIES)
+                return execution_id
+            # An idle class must not bank credit to burst with later.
+            self._current[priority] = 0.0
+        return None
+
+    async def next_execution_id(self, timeout: float = 1.0) -> Optional[str]:
+        """Return the next execution id to run, waiting up to timeout when idle."""
+        execution_id = await self._poll()
+        if execution_id:
+            return execution_id
+
+        # Jobs pushed by older backends still land on the shared list.
+        legacy = await self.redis.rpop(EXECUTION_QUEUE_KEY)
+        if legacy:
+            return legacy.decode("utf-8")
+
+        await self.redis.brpop(EXECUTION_WAKEUP_KEY, timeout=timeout)
+        return await self._poll(force_refresh=True)
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import smtplib
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+SMTP_POOL_MAX_CONNECTIONS = int(os.getenv("SMTP_POOL_MAX_CONNECTIONS", "4"))
+SMTP_POOL_IDLE_SECONDS = float(os.getenv("SMTP_POOL_IDLE_SECONDS", "60"))
+SMTP_THREADS = int(os.getenv("SMTP_THREADS", "16"))
+
+# smtplib is blocking; every network call runs here instead of on the event loop.
+_smtp_executor = ThreadPoolExecutor(max_workers=SMTP_THREADS, thread_name_prefix="smtp")
+
+
+async def run_in_smtp_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_smtp_executor, fn, *args)
+
+
+class _PooledConnection:
+    def __init__(self, smtp: smtplib.SMTP_SSL):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+
+
+def _quit(conn: _PooledConnection) -> None:
+    try:
+        conn.smtp.quit()
+    except Exception:
+        try:
+            conn.smtp.close()
+        except Exception:
+            pass
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP_SSL connections for one server/login, reused across sends."""
+
+    def __init__(self, server: str, username: str, password: str, port: int = SMTP_PORT):
+        self.server = server
+        self.username = username
+        self.password = password
+        self.port = port
+        self._idle: deque[_PooledConnection] = deque()
+        self._slots = asyncio.Semaphore(SMTP_POOL_MAX_CONNECTIONS)
+
+    def _connect(self) -> _PooledConnection:
+        smtp = smtplib.SMTP_SSL(self.server, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        return _PooledConnection(smtp)
+
+    @asynccontextmanager
+    async def connection(self, fresh: bool = False) -> AsyncIterator[_PooledConnection]:
+        """Borrow a logged-in connection; it returns to the pool unless the body raised."""
+        async with self._slots:
+            conn = None
+            while self._idle and not fresh:
+                candidate = self._idle.pop()
+                if time.monotonic() - candidate.last_used < SMTP_POOL_IDLE_SECONDS:
+                    conn = candidate
+                    break
+                await run_in_smtp_thread(_quit, candidate)
+            if conn is None:
+                conn = await run_in_smtp_thread(self._connect)
+            try:
+                yield conn
+            except BaseException:
+                await run_in_smtp_thread(_quit, conn)
+                raise
+            conn.last_used = time.monotonic()
+            self._idle.append(conn)
+
+    async def send(self, message: EmailMessage) -> None:
+        try:
+            async with self.connection() as conn:
+                await run_in_smtp_thread(conn.smtp.send_message, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server may have dropped an idle connection; retry once on a new one.
+            async with self.connection(fresh=True) as conn:
+                await run_in_smtp_thread(conn.smtp.send_message, message)
+
+    async def evict_idle(self) -> None:
+        now = time.monotonic()
+        keep: deque[_PooledConnection] = deque()
+        while self._idle:
+            conn = self._idle.popleft()
+            if now - conn.last_used >= SMTP_POOL_IDLE_SECONDS:
+                await run_in_smtp_thread(_quit, conn)
+            else:
+                keep.append(conn)
+        self._idle.extend(keep)
+
+    async def close(self) -> None:
+        while self._idle:
+            await run_in_smtp_thread(_quit, self._idle.pop())
+
+
+_pools: Dict[Tuple[str, int, str], SMTPConnectionPool] = {}
+_evictor: Optional[asyncio.Task] = None
+
+
+async def _evict_idle_forever() -> None:
+    while True:
+        await asyncio.sleep(SMTP_POOL_IDLE_SECONDS / 2)
+        for pool in list(_pools.values()):
+            try:
+                await pool.evict_idle()
+            except Exception as e:
+                print(f"Error evicting idle SMTP connections: {e}")
+
+
+def get_smtp_pool(server: str, username: str, password: str, port: int = SMTP_PORT) -> SMTPConnectionPool:
+    """Pool for this server and login, replaced when the credential's password changes."""
+    global _evictor
+    key = (server, port, username)
+    pool = _pools.get(key)
+    if pool is None or pool.password != password:
+        if pool is not None:
+            asyncio.get_running_loop().create_task(pool.close())
+        pool = _pools[key] = SMTPConnectionPool(server, username, password, port)
+    if _evictor is None or _evictor.done():
+        _evictor = asyncio.get_running_loop().create_task(_evict_idle_forever())
+    return pool
+
+
+async def close_smtp_pools() -> None:
+    global _evictor
+    if _evictor is not None:
+        _evictor.cancel()
+        _evictor = None
+    for pool in list(_pools.values()):
+        await pool.close()
+    _pools.clear()
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import os
+import secrets
+import socket
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .redis_client import get_redis
+from .scheduler import enqueue_execution
+from .checkpoint_service import save_node_checkpoint
+from .imap_watcher import get_mailbox_watcher
+from .node_registry import NodeContext
+
+# Deadlines of suspended executions (unix seconds), resumed with their timeout result.
+EXECUTION_RESUME_TIMERS_KEY = "execution_resume:timers"
+# Resume requests from the backend's callback endpoint.
+EXECUTION_RESUME_REQUESTS_KEY = "execution_resume:requests"
+# execution_id -> IMAP reply wait spec, so any executor can re-arm watchers after a restart.
+IMAP_WAITS_KEY = "execution_resume:imap_waits"
+# Each IMAP wait is watched by the one executor holding its lease, refreshed every
+# third of this; a wait whose executor died is taken over once the lease lapses.
+IMAP_WAIT_LEASE_SECONDS = int(os.getenv("IMAP_WAIT_LEASE_SECONDS", "30"))
+# This process, as a lease owner.
+EXECUTOR_ID = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+_REFRESH_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# execution_id -> (watcher, waiter, reply task) of the IMAP waits this process holds.
+_armed_waits: Dict[str, Tuple[Any, Any, asyncio.Task]] = {}
+
+
+def _suspended_key(execution_id: str) -> str:
+    return f"execution_suspended:{execution_id}"
+
+
+def _lease_key(execution_id: str) -> str:
+    return f"execution_resume:imap_lease:{execution_id}"
+
+
+class SuspendExecution(Exception):
+    """
+    Raised by a node handler to park the execution until an external event.
+
+    The worker persists the continuation and moves on; the node's result is
+    whatever the event delivers, or timeout_result once timeout_seconds pass.
+    """
+
+    def __init__(self, wait: Dict[str, Any], timeout_seconds: float, timeout_result: Dict[str, Any]):
+        super().__init__(f"Execution suspended waiting for {wait.get('type')}")
+        self.wait = wait
+        self.timeout_seconds = timeout_seconds
+        self.timeout_result = timeout_result
+        self.node_id: Any = None
+        self.node_type: Optional[str] = None
+
+
+async def handle_wait_node(context: NodeContext):
+    raise SuspendExecution(
+        wait={"type": "timer"},
+        timeout_seconds=float(context.data.get("seconds", 60)),
+        timeout_result={"status": "resumed", "reason": "timer"},
+    )
+
+
+async def suspend_execution(execution_data: Dict[str, Any], suspension: SuspendExecution) -> Dict[str, Any]:
+    """Persist the continuation of a suspended execution; returns its public waiting info."""
+    redis = get_redis()
+    execution_id = execution_data["execution_id"]
+    deadline = time.time() + suspension.timeout_seconds
+    resume_token = secrets.token_urlsafe(24)
+    state = {
+        "execution_data": execution_data,
+        "node_id": suspension.node_id,
+        "node_type": suspension.node_type,
+        "wait": suspension.wait,
+        "timeout_result": suspension.timeout_result,
+        "deadline": deadline,
+        "resume_token": resume_token,
+    }
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(_suspended_key(execution_id), json.dumps(state), ex=int(suspension.timeout_seconds) + 3600)
+        pipe.zadd(EXECUTION_RESUME_TIMERS_KEY, {execution_id: deadline})
+        if suspension.wait.get("type") == "imap_reply":
+            pipe.hset(IMAP_WAITS_KEY, execution_id, json.dumps(suspension.wait))
+            pipe.set(_lease_key(execution_id), EXECUTOR_ID, ex=IMAP_WAIT_LEASE_SECONDS)
+        await pipe.execute()
+
+    if suspension.wait.get("type") == "imap_reply":
+        arm_imap_wait(execution_id, suspension.wait, execution_data.get("credentials", {}))
+
+    # The resume token stays out of this: it ends up in status payloads, which are
+    # not owner-checked. The backend hands it to the owner on request.
+    return {
+        "waiting_for": suspension.wait.get("type"),
+        "node_id": suspension.node_id,
+        "resume_deadline": deadline,
+    }
+
+
+async def resume_execution(
+    execution_id: str, node_result: Optional[Dict[str, Any]] = None, resume_token: Optional[str] = None
+) -> bool:
+    """
+    Requeue a suspended execution with node_result as the waiting node's output.
+
+    Whichever event gets here first (reply, callback or timer) wins; the others
+    find the suspension gone and return False. Without node_result the node's
+    timeout_result is used.
+    """
+    redis = get_redis()
+    key = _suspended_key(execution_id)
+    raw = await redis.get(key)
+    if not raw:
+        return False
+    state = json.loads(raw)
+    if resume_token is not None and not secrets.compare_digest(resume_token, state["resume_token"]):
+        return False
+    if await redis.delete(key) != 1:
+        return False
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zrem(EXECUTION_RESUME_TIMERS_KEY, execution_id)
+        pipe.hdel(IMAP_WAITS_KEY, execution_id)
+        pipe.delete(_lease_key(execution_id))
+        await pipe.execute()
+    _disarm_imap_wait(execution_id)
+
+    await save_node_checkpoint(
+        execution_id,
+        state["node_id"],
+        {
+            "node_id": state["node_id"],
+            "type": state["node_type"],
+            "result": node_result if node_result is not None else state["timeout_result"],
+        },
+    )
+    execution_data = state["execution_data"]
+    await redis.set(f"execution_queue:{execution_id}", json.dumps(execution_data), ex=3600)
+    await enqueue_execution(redis, execution_data)
+    print(f"Resumed execution {execution_id} at node {state['node_id']}")
+    return True
+
+
+async def cancel_suspension(execution_id: str) -> bool:
+    """Drop a suspended execution's continuation; False if it is not suspended."""
+    redis = get_redis()
+    if await redis.delete(_suspended_key(execution_id)) != 1:
+        return False
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zrem(EXECUTION_RESUME_TIMERS_KEY, execution_id)
+        pipe.hdel(IMAP_WAITS_KEY, execution_id)
+        pipe.delete(_lease_key(execution_id))
+        await pipe.execute()
+    _disarm_imap_wait(execution_id)
+    return True
+
+
+def arm_imap_wait(execution_id: str, wait: Dict[str, Any], credentials: Dict[str, Any]) -> None:
+    """
+    Resume execution_id when the awaited reply lands in the sender's mailbox.
+
+    credentials are the execution's own (platform -> credential record); the wait
+    spec only names which one holds the mailbox password.
+    """
+    password = credentials.get(wait.get("credential", "email"), {}).get("data", {}).get("sender_password", "")
+    watcher = get_mailbox_watcher(wait["imap_server"], wait["username"], password)
+    waiter = watcher.register(
+        from_address=wait.get("from_address"),
+        in_reply_to=wait.get("in_reply_to"),
+        since_uid=wait.get("since_uid"),
+    )
+
+    async def _on_reply():
+        try:
+            message = await waiter.future
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            # The lease is no longer refreshed, so the wait is re-armed once it lapses.
+            print(f"IMAP wait for execution {execution_id} failed: {e}")
+            _armed_waits.pop(execution_id, None)
+            watcher.unregister(waiter)
+            return
+        # Forgotten before resuming, so resuming does not cancel this task.
+        _armed_waits.pop(execution_id, None)
+        await resume_execution(execution_id, {"status": "received", "messages": [message]})
+
+    _armed_waits[execution_id] = (watcher, waiter, asyncio.get_running_loop().create_task(_on_reply()))
+
+
+def _disarm_imap_wait(execution_id: str) -> None:
+    armed = _armed_waits.pop(execution_id, None)
+    if armed is not None:
+        watcher, waiter, task = armed
+        watcher.unregister(waiter)
+        task.cancel()
+
+
+async def maintain_imap_waits() -> None:
+    """
+    Refresh the leases of the IMAP waits this process watches and arm unleased ones.
+
+    Runs periodically on every executor, so waits suspended before this process
+    started, or armed by an executor that has since died, are picked up by
+    exactly one executor once their lease lapses.
+    """
+    redis = get_redis()
+    waits = {execution_id.decode("utf-8"): raw for execution_id, raw in (await redis.hgetall(IMAP_WAITS_KEY)).items()}
+
+    for execution_id in list(_armed_waits):
+        if execution_id not in waits or not await redis.eval(
+            _REFRESH_LEASE_SCRIPT, 1, _lease_key(execution_id), EXECUTOR_ID, IMAP_WAIT_LEASE_SECONDS
+        ):
+            # Resumed or cancelled elsewhere, or the lease lapsed and someone else holds it.
+            _disarm_imap_wait(execution_id)
+
+    for execution_id, raw in waits.items():
+        if execution_id in _armed_waits:
+            continue
+        try:
+            state_raw = await redis.get(_suspended_key(execution_id))
+            if not state_raw:
+                # The suspension expired or was resumed without cleaning up.
+                await redis.hdel(IMAP_WAITS_KEY, execution_id)
+                continue
+            if not await redis.set(_lease_key(execution_id), EXECUTOR_ID, nx=True, ex=IMAP_WAIT_LEASE_SECONDS):
+                continue
+            state = json.loads(state_raw)
+            arm_imap_wait(execution_id, json.loads(raw), state["execution_data"].get("credentials", {}))
+        except Exception as e:
+            print(f"Could not arm IMAP wait for {execution_id}: {e}")
+
+
+async def promote_due_resumptions(batch_size: int = 200) -> int:
+    """Resume executions whose wait deadline passed, with their timeout result."""
+    redis = get_redis()
+    due = await redis.zrangebyscore(EXECUTION_RESUME_TIMERS_KEY, "-inf", time.time(), start=0, num=batch_size)
+    for execution_id in due:
+        if not await resume_execution(execution_id.decode("utf-8")):
+            # Already resumed elsewhere or expired; drop the stale timer.
+            await redis.zrem(EXECUTION_RESUME_TIMERS_KEY, execution_id)
+    return len(due)
+
+
+async def process_resumptions_forever() -> None:
+    redis = get_redis()
+    next_lease_check = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_lease_check:
+                next_lease_check = time.monotonic() + IMAP_WAIT_LEASE_SECONDS / 3
+                await maintain_imap_waits()
+            await promote_due_resumptions()
+            request = await redis.blpop(EXECUTION_RESUME_REQUESTS_KEY, timeout=1)
+            if request:
+                payload = json.loads(request[1])
+                await resume_execution(
+                    payload["execution_id"],
+                    {"status": "resumed", "data": payload.get("data")},
+                    resume_token=payload.get("token", ""),
+                )
+        except Exception as e:
+            print(f"Error processing execution resumptions: {e}")
+            await asyncio.sleep(1)
@@ -1,6 +1,174 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict
+
 from telegram import Bot
+from telegram.error import RetryAfter
+
+from .node_registry import NodeContext
+
+TELEGRAM_BOT_CACHE_SIZE = int(os.getenv("TELEGRAM_BOT_CACHE_SIZE", "32"))
+# Telegram's documented limits per bot: ~30 msg/s overall, 1 msg/s per chat,
+# 20 msg/min per group.
+TELEGRAM_GLOBAL_MESSAGES_PER_SECOND = float(os.getenv("TELEGRAM_GLOBAL_MESSAGES_PER_SECOND", "30"))
+TELEGRAM_CHAT_INTERVAL_SECONDS = float(os.getenv("TELEGRAM_CHAT_INTERVAL_SECONDS", "1.0"))
+TELEGRAM_GROUP_INTERVAL_SECONDS = float(os.getenv("TELEGRAM_GROUP_INTERVAL_SECONDS", "3.0"))
+TELEGRAM_MAX_RETRY_AFTER = int(os.getenv("TELEGRAM_MAX_RETRY_AFTER", "3"))
+# How often per-chat pacing state for chats nobody is sending to is dropped.
+TELEGRAM_CHAT_PRUNE_SECONDS = float(os.getenv("TELEGRAM_CHAT_PRUNE_SECONDS", "60"))
+# Bounds each Bot API call. Time spent queued behind a chat's pacing is not
+# counted, so a busy chat does not time out sends (and have them retried).
+TELEGRAM_SEND_TIMEOUT_SECONDS = float(os.getenv("TELEGRAM_SEND_TIMEOUT_SECONDS", "30"))
+
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TelegramSender:
+    """
+    One initialized Bot per token, pacing sends to stay under Telegram's limits.
+
+    Messages to the same chat queue behind a per-chat lock (FIFO) and are spaced
+    by the chat interval; all chats share the bot-wide token bucket.
+    """
+
+    def __init__(self, bot_token: str):
+        self.bot = Bot(token=bot_token)
+        self._initialized = False
+        self._init_lock = asyncio.Lock()
+        self._global = _TokenBucket(TELEGRAM_GLOBAL_MESSAGES_PER_SECOND)
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._chat_next_send: Dict[str, float] = {}
+        # Sends queued or running per chat; a chat's lock is dropped when it reaches 0.
+        self._chat_users: Dict[str, int] = {}
+        self._last_prune = time.monotonic()
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def _ensure_initialized(self) -> None:
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if not self._initialized:
+                await self.bot.initialize()
+                self._initialized = True
+
+    def _chat_interval(self, chat_id: str) -> float:
+        # Group and channel ids are negative; "@name" addresses a public channel.
+        is_group = chat_id.startswith(("-", "@"))
+        return TELEGRAM_GROUP_INTERVAL_SECONDS if is_group else TELEGRAM_CHAT_INTERVAL_SECONDS
+
+    def _release_chat(self, chat_key: str) -> None:
+        users = self._chat_users.get(chat_key, 1) - 1
+        if users > 0:
+            self._chat_users[chat_key] = users
+            return
+        self._chat_users.pop(chat_key, None)
+        self._chat_locks.pop(chat_key, None)
+
+        now = time.monotonic()
+        if now - self._last_prune < TELEGRAM_CHAT_PRUNE_SECONDS:
+            return
+        self._last_prune = now
+        # Spacing only matters until the next send is due; forget idle chats after that.
+        for key, next_send in list(self._chat_next_send.items()):
+            if next_send <= now and key not in self._chat_users:
+                del self._chat_next_send[key]
+
+    async def send(self, chat_id, message_text):
+        chat_key = str(chat_id)
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            await self._ensure_initialized()
+            self._chat_users[chat_key] = self._chat_users.get(chat_key, 0) + 1
+            lock = self._chat_locks.setdefault(chat_key, asyncio.Lock())
+            try:
+                async with lock:
+                    for attempt in range(TELEGRAM_MAX_RETRY_AFTER + 1):
+                        delay = self._chat_next_send.get(chat_key, 0.0) - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                        await self._global.acquire()
+                        try:
+                            message = await asyncio.wait_for(
+                                self.bot.send_message(chat_id=chat_id, text=message_text),
+                                TELEGRAM_SEND_TIMEOUT_SECONDS,
+                            )
+                        except RetryAfter as e:
+                            if attempt == TELEGRAM_MAX_RETRY_AFTER:
+                                raise
+                            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                            self._chat_next_send[chat_key] = time.monotonic() + float(retry_after)
+                            continue
+                        self._chat_next_send[chat_key] = time.monotonic() + self._chat_interval(chat_key)
+                        return {"status": "sent", "chat_id": chat_id, "message_id": message.message_id}
+            finally:
+                self._release_chat(chat_key)
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def close(self) -> None:
+        await self._idle.wait()
+        if self._initialized:
+            await self.bot.shutdown()
+            self._initialized = False
+
+
+_senders: "OrderedDict[str, TelegramSender]" = OrderedDict()
+
+
+def get_telegram_sender(bot_token: str) -> TelegramSender:
+    """LRU-cached sender per bot token; evicted senders shut down once idle."""
+    sender = _senders.get(bot_token)
+    if sender is not None:
+        _senders.move_to_end(bot_token)
+        return sender
+    sender = _senders[bot_token] = TelegramSender(bot_token)
+    while len(_senders) > TELEGRAM_BOT_CACHE_SIZE:
+        _, evicted = _senders.popitem(last=False)
+        asyncio.get_running_loop().create_task(evicted.close())
+    return sender
 
 
 async def send_telegram_message(bot_token, chat_id, message_text):
-    bot = Bot(token=bot_token)
-    await bot.send_message(chat_id=chat_id, text=message_text)
+    return await get_telegram_sender(bot_token).send(chat_id, message_text)
+
+
+async def handle_telegram_node(context: NodeContext):
+    cred_data = context.credentials["telegram"]
+    return await send_telegram_message(
+        bot_token=cred_data.get("bot_token", ""),
+        chat_id=context.data.get("chat_id", ""),
+        message_text=context.data.get("message", "")
+    )
+
+
+async def close_telegram_senders() -> None:
+    while _senders:
+        _, sender = _senders.popitem(last=False)
+        try:
+            await sender.close()
+        except Exception as e:
+            print(f"Error shutting down Telegram bot: {e}")
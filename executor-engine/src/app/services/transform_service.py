@@ -0,0 +1,241 @@
+import ast
+import asyncio
+import builtins
+import multiprocessing
+import os
+import resource
+import socket
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Optional, Tuple
+
+from .node_registry import NodeContext
+
+TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", "2"))
+TRANSFORM_TIMEOUT_SECONDS = float(os.getenv("TRANSFORM_TIMEOUT_SECONDS", "5"))
+TRANSFORM_MEMORY_LIMIT_MB = int(os.getenv("TRANSFORM_MEMORY_LIMIT_MB", "256"))
+# Workers are replaced after this many transforms to bound leaked state.
+TRANSFORM_WORKER_MAX_TASKS = int(os.getenv("TRANSFORM_WORKER_MAX_TASKS", "1000"))
+# Refuse to run transforms when the worker cannot get its own network namespace.
+TRANSFORM_REQUIRE_NETWORK_ISOLATION = bool(int(os.getenv("TRANSFORM_REQUIRE_NETWORK_ISOLATION", "1")))
+
+_SAFE_BUILTINS = {
+    name: getattr(builtins, name)
+    for name in (
+        "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float", "int",
+        "isinstance", "len", "list", "map", "max", "min", "pow", "range", "reversed", "round",
+        "set", "sorted", "str", "sum", "tuple", "zip", "True", "False", "None",
+        "Exception", "ValueError", "KeyError", "IndexError", "TypeError",
+    )
+}
+
+# Transforms may only call the public methods of plain data. Anything else on an
+# object (generator and frame attributes such as gi_frame or f_globals, function
+# globals, ...) can walk back into the worker's modules. str.format is left out
+# because its "{0.attr}" fields are attribute access the parser cannot see.
+_DATA_ATTRIBUTES = frozenset(
+    name
+    for data_type in (str, bytes, int, float, bool, list, tuple, dict, set, frozenset)
+    for name in dir(data_type)
+    if not name.startswith("_")
+) - {"format", "format_map"}
+
+
+class TransformError(Exception):
+    pass
+
+
+# Worker process side.
+
+def _no_network(*args, **kwargs):
+    raise PermissionError("Network access is disabled in transform workers")
+
+
+def _unshare_network() -> Optional[str]:
+    """Move into an empty network namespace; the reason it failed, if it did."""
+    if not hasattr(os, "unshare") or not hasattr(os, "CLONE_NEWNET"):
+        return "network namespaces are not supported on this platform"
+    try:
+        os.unshare(os.CLONE_NEWNET)
+        return None
+    except OSError:
+        pass
+    # Without CAP_SYS_ADMIN a new user namespace grants it for the new network namespace.
+    try:
+        os.unshare(os.CLONE_NEWUSER | os.CLONE_NEWNET)
+        return None
+    except OSError as e:
+        return f"could not unshare the network namespace: {e}"
+
+
+def _isolate() -> Optional[str]:
+    """Lock the worker down before it runs user code; why it is unsafe to, if it is."""
+    # Credentials and other secrets reach the executor through its environment.
+    os.environ.clear()
+    failure = _unshare_network()
+    # Kept as a second layer even inside a namespace with no interfaces.
+    socket.socket = _no_network
+    socket.create_connection = _no_network
+    socket.getaddrinfo = _no_network
+
+    memory = TRANSFORM_MEMORY_LIMIT_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    return failure if TRANSFORM_REQUIRE_NETWORK_ISOLATION else None
+
+
+def _compile(source: str, mode: str):
+    tree = ast.parse(source, mode=mode)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            raise TransformError("Imports are not allowed in transforms")
+        if isinstance(node, ast.Attribute) and node.attr not in _DATA_ATTRIBUTES:
+            raise TransformError(f"Access to {node.attr} is not allowed in transforms")
+        # case Cls(attr=x) reads attr off the subject just like subject.attr does.
+        if isinstance(node, ast.MatchClass):
+            for attr in node.kwd_attrs:
+                if attr not in _DATA_ATTRIBUTES:
+                    raise TransformError(f"Access to {attr} is not allowed in transforms")
+        if isinstance(node, ast.Name) and node.id.startswith("__"):
+            raise TransformError(f"Access to {node.id} is not allowed in transforms")
+    return compile(tree, "<transform>", mode)
+
+
+def _run_transform(source: str, mode: str, names: Dict[str, Any]) -> Any:
+    # Compiled per call rather than cached: a cache would keep earlier transforms'
+    # source and constants (other tenants' literals) alive in the worker.
+    code = _compile(source, mode)
+    scope = {"__builtins__": _SAFE_BUILTINS, **names}
+    if mode == "eval":
+        return eval(code, scope)
+    exec(code, scope)
+    return scope.get("result")
+
+
+def _worker_main(conn: Connection) -> None:
+    isolation_failure = _isolate()
+    while True:
+        try:
+            source, mode, names, cpu_seconds = conn.recv()
+        except EOFError:
+            return
+        if isolation_failure:
+            conn.send(("error", f"Transform sandbox unavailable: {isolation_failure}"))
+            continue
+        # RLIMIT_CPU counts the whole process lifetime, so move the limit per task.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        resource.setrlimit(resource.RLIMIT_CPU, (used + max(1, int(cpu_seconds + 0.999)), resource.RLIM_INFINITY))
+        try:
+            reply = ("ok", _run_transform(source, mode, names))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        conn.send(reply)
+        # Leave nothing of this task in the frame for the next one to find.
+        del source, names, reply
+
+
+# Executor side.
+
+class _SandboxWorker:
+    def __init__(self):
+        context = multiprocessing.get_context("forkserver")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.broken = False
+
+    def run(self, task: Tuple[Any, ...], timeout: float) -> Any:
+        """Blocking round trip to the worker; called from a thread."""
+        self.tasks += 1
+        # Cleared once a result comes back; anything else leaves the worker unusable.
+        self.broken = True
+        try:
+            self.conn.send(task)
+            finished = self.conn.poll(timeout)
+            if finished:
+                status, value = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise TransformError("Transform worker died; the transform likely exceeded its resource limits") from e
+        if not finished:
+            raise TimeoutError(f"Transform exceeded {timeout:g}s")
+        self.broken = False
+        if status == "error":
+            raise TransformError(value)
+        return value
+
+    def usable(self) -> bool:
+        return not self.broken and self.process.is_alive() and self.tasks < TRANSFORM_WORKER_MAX_TASKS
+
+    def kill(self) -> None:
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+
+
+class SandboxPool:
+    """Pre-forked transform workers, each running one transform at a time."""
+
+    def __init__(self, size: int = TRANSFORM_WORKERS):
+        self.size = size
+        self._idle: Optional[asyncio.Queue] = None
+
+    def start(self) -> None:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait(_SandboxWorker())
+
+    async def run(self, source: str, mode: str, names: Dict[str, Any], timeout: float) -> Any:
+        self.start()
+        worker = await self._idle.get()
+        try:
+            return await asyncio.to_thread(worker.run, (source, mode, names, timeout), timeout)
+        finally:
+            if worker.usable():
+                self._idle.put_nowait(worker)
+            else:
+                # Timed out, cancelled, crashed or worn out: replace it. Shielded so
+                # the slot comes back even if this run is cancelled meanwhile.
+                await asyncio.shield(asyncio.ensure_future(self._replace(worker)))
+
+    async def _replace(self, worker: _SandboxWorker) -> None:
+        # Starting a process blocks, so it happens off the loop; the old worker is
+        # only killed once that returns.
+        try:
+            replacement = await asyncio.to_thread(_SandboxWorker)
+        finally:
+            worker.kill()
+        self._idle.put_nowait(replacement)
+
+    def close(self) -> None:
+        while self._idle is not None and not self._idle.empty():
+            self._idle.get_nowait().kill()
+        self._idle = None
+
+
+sandbox_pool = SandboxPool()
+
+
+def warm_up() -> None:
+    sandbox_pool.start()
+
+
+async def handle_transform_node(context: NodeContext):
+    """
+    node data: {"expression": "..."} evaluated, or {"code": "..."} executed with its
+    `result` variable returned. Both see `results`, `trigger` and `input`.
+    """
+    data = context.data
+    if data.get("expression"):
+        source, mode = data["expression"], "eval"
+    elif data.get("code"):
+        source, mode = data["code"], "exec"
+    else:
+        raise ValueError("Transform node needs an expression or code")
+    names = {"results": context.results, "trigger": context.trigger, "input": data.get("input")}
+    timeout = float(data.get("timeout_seconds") or TRANSFORM_TIMEOUT_SECONDS)
+    return {"result": await sandbox_pool.run(source, mode, names, timeout)}
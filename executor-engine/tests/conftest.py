@@ -0,0 +1,26 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop; the suite has no async plugin."""
+    def _run(coro):
+        return asyncio.run(coro)
+    return _run
+
+
+@pytest.fixture
+def shared_redis(redis_server, monkeypatch):
+    """Point the executor's process-wide Redis client at an in-memory server."""
+    from services import redis_client
+
+    monkeypatch.setattr(redis_client, "_redis", fakeredis.FakeAsyncRedis(server=redis_server))
+    return redis_client._redis
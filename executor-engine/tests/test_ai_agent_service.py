@@ -0,0 +1,70 @@
+import json
+
+import fakeredis
+import pytest
+from redis.asyncio import Redis
+
+pytest.importorskip("langchain")
+pytest.importorskip("langchain_google_genai")
+
+from services import ai_agent_service, redis_service
+from services.ai_agent_service import execute_agent, native_json_schema
+
+
+def test_scalar_schemas_use_native_structured_output():
+    schema = native_json_schema({"name": {"type": "string"}, "age": {"type": "integer"}})
+    assert schema == {
+        "title": "Response",
+        "type": "object",
+        "properties": {"name": {"type": "string"}, "age": {"type": "integer"}},
+        "required": ["name", "age"],
+    }
+
+
+@pytest.mark.parametrize("field", [{"type": "array"}, {"type": "object"}, {"type": "date"}, {}])
+def test_container_and_unknown_fields_fall_back_to_prompt_and_parse(field):
+    assert native_json_schema({"name": {"type": "string"}, "extra": field}) is None
+
+
+class _FakeGraph:
+    async def ainvoke(self, state):
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        reply = AIMessage(content="hi there")
+        return {**state, "messages": [HumanMessage(content="hi"), reply], "memory": [reply], "result": {"answer": "hi there"}}
+
+
+@pytest.fixture
+def fake_graph(shared_redis, monkeypatch):
+    monkeypatch.setattr(ai_agent_service, "get_graph", lambda: _FakeGraph())
+    monkeypatch.setattr(ai_agent_service.llm_cache, "_local", type(ai_agent_service.llm_cache._local)())
+
+
+def test_live_results_can_be_stored_as_the_execution_status(fake_graph, redis_server, monkeypatch, run):
+    monkeypatch.setattr(
+        Redis, "from_url", classmethod(lambda cls, *args, **kwargs: fakeredis.FakeAsyncRedis(server=redis_server))
+    )
+
+    async def scenario():
+        output = await execute_agent({}, ["hi"], formatted_response=False)
+        await redis_service.update_execution_status("exec-1", "completed", {"results": {"1": output}})
+        return await fakeredis.FakeAsyncRedis(server=redis_server).get("execution_status:exec-1")
+
+    status = json.loads(run(scenario()))
+    assert status["status"] == "completed"
+    assert status["result"]["results"]["1"] == {
+        "messages": ["hi", "hi there"],
+        "memory": ["hi there"],
+        "result": {"answer": "hi there"},
+        "cached": False,
+    }
+
+
+def test_cached_results_have_the_same_shape_as_live_ones(fake_graph, run):
+    async def scenario():
+        live = await execute_agent({}, ["hi"], formatted_response=False, cache=True)
+        cached = await execute_agent({}, ["hi"], formatted_response=False, cache=True)
+        return live, cached
+
+    live, cached = run(scenario())
+    assert cached == {**live, "cached": True}
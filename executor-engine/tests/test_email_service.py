@@ -0,0 +1,146 @@
+import smtplib
+
+import pytest
+
+from services import email_service
+
+
+class _FailingPool:
+    def __init__(self, exc):
+        self.exc = exc
+
+    async def send(self, message):
+        raise self.exc
+
+
+def _send(run, monkeypatch, exc):
+    monkeypatch.setattr(email_service, "get_smtp_pool", lambda *args: _FailingPool(exc))
+    return run(
+        email_service.send_email("from@example.com", "pw", "to@example.com", "s", "m", "smtp.example.com")
+    )
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [
+        smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+        smtplib.SMTPConnectError(-1, "greeting never arrived"),
+        smtplib.SMTPDataError(451, "Try again later"),
+        smtplib.SMTPRecipientsRefused({"to@example.com": (450, b"Mailbox busy")}),
+        TimeoutError("timed out"),
+        ConnectionRefusedError(111, "Connection refused"),
+    ],
+)
+def test_transient_failures_raise_so_the_retry_policy_applies(run, monkeypatch, exc):
+    with pytest.raises(email_service.TransientEmailError):
+        _send(run, monkeypatch, exc)
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [
+        smtplib.SMTPAuthenticationError(535, b"Bad credentials"),
+        smtplib.SMTPDataError(554, "Rejected"),
+        smtplib.SMTPRecipientsRefused({"to@example.com": (550, b"No such user")}),
+        ValueError("bad header"),
+    ],
+)
+def test_permanent_failures_are_reported_without_retrying(run, monkeypatch, exc):
+    result = _send(run, monkeypatch, exc)
+    assert result["status"] == "failed"
+    assert result["to"] == "to@example.com"
+
+
+class _FakeSMTP:
+    def __init__(self, fail_for=()):
+        self.sent = []
+        self.fail_for = set(fail_for)
+
+    def send_message(self, message):
+        if message["To"] in self.fail_for:
+            raise smtplib.SMTPRecipientsRefused({message["To"]: (550, b"No such user")})
+        self.sent.append(message["To"])
+
+
+class _FakeConnection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+
+
+class _FakePool:
+    def __init__(self, smtp=None, connect_errors=()):
+        self.smtp = smtp or _FakeSMTP()
+        self.connect_errors = list(connect_errors)
+        self.connects = 0
+
+    def connection(self):
+        pool = self
+
+        class _Borrow:
+            async def __aenter__(self):
+                pool.connects += 1
+                if pool.connect_errors:
+                    raise pool.connect_errors.pop(0)
+                return _FakeConnection(pool.smtp)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Borrow()
+
+
+def _bulk(run, monkeypatch, pool, recipients, concurrency=1):
+    monkeypatch.setattr(email_service, "get_smtp_pool", lambda *args: pool)
+    monkeypatch.setattr(email_service, "EMAIL_FANOUT_RECONNECT_DELAY_SECONDS", 0.0)
+    return run(
+        email_service.send_bulk_email(
+            "from@example.com", "pw", recipients, "s", "m", "smtp.example.com", concurrency=concurrency
+        )
+    )
+
+
+def test_bulk_send_reports_each_recipient(run, monkeypatch):
+    pool = _FakePool(_FakeSMTP(fail_for={"b@example.com"}))
+    result = _bulk(run, monkeypatch, pool, "a@example.com; b@example.com, c@example.com")
+    assert result["status"] == "partial"
+    assert [r["status"] for r in result["recipients"]] == ["sent", "failed", "sent"]
+    assert pool.connects == 1
+
+
+def test_bulk_send_recovers_from_a_failed_connect(run, monkeypatch):
+    pool = _FakePool(connect_errors=[smtplib.SMTPServerDisconnected("login dropped")])
+    result = _bulk(run, monkeypatch, pool, ["a@example.com", "b@example.com"])
+    assert result["status"] == "sent"
+    assert pool.connects == 2
+
+
+def test_bulk_send_gives_up_after_repeated_connect_failures(run, monkeypatch):
+    errors = [smtplib.SMTPServerDisconnected("login dropped")] * 10
+    pool = _FakePool(connect_errors=errors)
+    result = _bulk(run, monkeypatch, pool, ["a@example.com", "b@example.com"], concurrency=2)
+    assert result["status"] == "failed"
+    assert result["failed"] == 2
+    assert pool.connects <= 2 * email_service.EMAIL_FANOUT_CONNECT_ATTEMPTS
+
+
+@pytest.mark.parametrize("value", [None, "", "many", [2]])
+def test_invalid_concurrency_falls_back_to_the_default(value):
+    assert email_service._fan_out_concurrency(value) == email_service.EMAIL_FANOUT_CONCURRENCY
+
+
+def test_concurrency_is_at_least_one():
+    assert email_service._fan_out_concurrency("0") == 1
+    assert email_service._fan_out_concurrency("3") == 3
+
+
+def test_bulk_send_carries_on_past_a_recipient_it_cannot_build_a_message_for(run, monkeypatch):
+    pool = _FakePool()
+    recipients = ["a@example.com", "b@example.com\nBcc: x@example.com", "c@example.com", "d@example.com"]
+    result = _bulk(run, monkeypatch, pool, recipients)
+    assert [(r["to"], r["status"]) for r in result["recipients"]] == [
+        ("a@example.com", "sent"),
+        ("b@example.com\nBcc: x@example.com", "failed"),
+        ("c@example.com", "sent"),
+        ("d@example.com", "sent"),
+    ]
+    assert pool.smtp.sent == ["a@example.com", "c@example.com", "d@example.com"]
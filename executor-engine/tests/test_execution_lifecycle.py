@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from services import redis_service
+from services.cancellation import cancel_running_execution
+
+
+@pytest.fixture
+def statuses(shared_redis, monkeypatch):
+    """Status updates posted to the backend, in order; the execution itself sleeps."""
+    posted = []
+
+    async def post(execution_id, status, result=None, error=None):
+        posted.append(status)
+
+    async def update(execution_id, status, result=None):
+        pass
+
+    async def process(execution_data):
+        await asyncio.sleep(execution_data.get("work_seconds", 0))
+        return {"done": True}
+
+    monkeypatch.setattr(redis_service, "post_status_update_backend", post)
+    monkeypatch.setattr(redis_service, "update_execution_status", update)
+    monkeypatch.setattr(redis_service, "_process_execution", process)
+    return posted
+
+
+def test_completed_runs_post_processing_then_completed(statuses, run):
+    run(redis_service._run_execution({"execution_id": "exec-1", "execution_type": "workflow"}))
+    assert statuses == ["processing", "completed"]
+
+
+def test_runs_cancelled_while_queued_are_not_processed(statuses, shared_redis, run):
+    async def scenario():
+        await shared_redis.set("execution_cancel:exec-1", 1)
+        await redis_service._run_execution({"execution_id": "exec-1", "work_seconds": 5})
+
+    run(asyncio.wait_for(scenario(), 2))
+    assert statuses[-1] == "cancelled"
+    assert "completed" not in statuses
+
+
+def test_cancels_arriving_while_the_run_starts_are_not_lost(statuses, monkeypatch, run):
+    post = redis_service.post_status_update_backend
+
+    async def post_and_cancel(execution_id, status, result=None, error=None):
+        await post(execution_id, status, result, error)
+        if status == "processing":
+            # The cancellation listener handling a cancel published right now.
+            assert cancel_running_execution(execution_id)
+
+    monkeypatch.setattr(redis_service, "post_status_update_backend", post_and_cancel)
+    run(asyncio.wait_for(redis_service._run_execution({"execution_id": "exec-1", "work_seconds": 5}), 2))
+    assert statuses == ["processing", "cancelled"]
+
+
+def test_runs_over_their_budget_time_out(statuses, run):
+    execution = {"execution_id": "exec-1", "timeout_seconds": 0.1, "work_seconds": 5}
+    run(asyncio.wait_for(redis_service._run_execution(execution), 2))
+    assert statuses == ["processing", "timed_out"]
@@ -0,0 +1,47 @@
+import pytest
+
+from services.imap_watcher import MailboxWatcher, _Waiter
+
+
+def _headers(sender, in_reply_to=None, references=None):
+    lines = [f"From: {sender}", "Subject: Re: hello"]
+    if in_reply_to:
+        lines.append(f"In-Reply-To: {in_reply_to}")
+    if references:
+        lines.append(f"References: {references}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+
+def _woken(run, raw, from_address=None, in_reply_to=None):
+    async def scenario():
+        watcher = MailboxWatcher("imap.example.com", "me@example.com", "pw")
+        waiter = _Waiter(from_address, in_reply_to, since_uid=0)
+        watcher._waiters.append(waiter)
+        watcher._dispatch(1, raw)
+        return waiter.future.done()
+
+    return run(scenario())
+
+
+@pytest.mark.parametrize(
+    "sender, woken",
+    [
+        ("bob@x.com", True),
+        ("Bob <BOB@X.COM>", True),
+        ("evilbob@x.com", False),
+        ("Mallory <mallory@x.com>, bob@x.com.evil.org", False),
+    ],
+)
+def test_senders_are_compared_as_whole_addresses(run, sender, woken):
+    assert _woken(run, _headers(sender), from_address="bob@x.com") is woken
+
+
+def test_a_known_thread_must_match_even_from_the_expected_sender(run):
+    raw = _headers("bob@x.com", in_reply_to="<other@x.com>")
+    assert not _woken(run, raw, from_address="bob@x.com", in_reply_to="<ours@me.com>")
+
+
+def test_replies_in_the_thread_are_matched_by_message_id(run):
+    raw = _headers("alias@x.com", references="<first@x.com> <ours@me.com>")
+    assert _woken(run, raw, from_address="bob@x.com", in_reply_to="<ours@me.com>")
+
@@ -0,0 +1,55 @@
+import time
+
+from services import llm_cache as llm_cache_module
+from services.llm_cache import LLMResponseCache, cache_key
+
+
+def test_cache_key_ignores_whitespace_but_not_content():
+    a = cache_key("m", [{"content": "hello   world\n"}], {"x": "string"}, True)
+    b = cache_key("m", [{"content": "hello world"}], {"x": "string"}, True)
+    c = cache_key("m", [{"content": "hello there"}], {"x": "string"}, True)
+    assert a == b
+    assert a != c
+
+
+def test_local_entries_expire_with_their_ttl(shared_redis, monkeypatch, run):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache_module.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        cache = LLMResponseCache(local_size=8)
+        await cache.set("llm_cache:k", {"answer": 1}, ttl_seconds=5)
+        fresh = await cache.get("llm_cache:k")
+        now[0] += 6
+        # Redis would have expired the key too; drop it so only the local copy could answer.
+        await shared_redis.delete("llm_cache:k")
+        stale = await cache.get("llm_cache:k")
+        return fresh, stale, "llm_cache:k" in cache._local
+
+    assert run(scenario()) == ({"answer": 1}, None, False)
+
+
+def test_redis_hits_are_cached_locally_for_the_remaining_ttl(shared_redis, monkeypatch, run):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache_module.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        await shared_redis.set("llm_cache:k", '{"answer": 2}', ex=10)
+        cache = LLMResponseCache(local_size=8)
+        first = await cache.get("llm_cache:k")
+        expires_at, _ = cache._local["llm_cache:k"]
+        return first, expires_at - now[0]
+
+    first, remaining = run(scenario())
+    assert first == {"answer": 2}
+    assert 9 < remaining <= 10
+
+
+def test_local_cache_is_bounded(shared_redis, run):
+    async def scenario():
+        cache = LLMResponseCache(local_size=2)
+        for i in range(3):
+            await cache.set(f"llm_cache:{i}", i, ttl_seconds=60)
+        return list(cache._local)
+
+    assert run(scenario()) == ["llm_cache:1", "llm_cache:2"]
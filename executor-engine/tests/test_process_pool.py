@@ -0,0 +1,69 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from services import process_pool
+from services.process_pool import close_process_pool, run_cpu_task
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(process_pool, "CPU_POOL_WORKERS", 2)
+    yield
+    close_process_pool()
+
+
+def test_a_late_failure_does_not_kill_the_replacement_pool():
+    stale = process_pool._get_pool()
+    process_pool._kill_pool(stale)
+    fresh = process_pool._get_pool()
+
+    process_pool._kill_pool(stale)
+
+    assert process_pool._pool is fresh
+
+
+def test_tasks_running_beside_a_timed_out_one_still_succeed(run):
+    async def scenario():
+        stuck = asyncio.ensure_future(run_cpu_task(time.sleep, 5, timeout=0.3))
+        sibling = asyncio.ensure_future(run_cpu_task(time.sleep, 0.6, timeout=5))
+        with pytest.raises(asyncio.TimeoutError):
+            await stuck
+        # Runs on the replacement pool, as does the sibling's resubmission.
+        later = asyncio.ensure_future(run_cpu_task(time.sleep, 0.2, timeout=5))
+        return await sibling, await later
+
+    assert run(scenario()) == (None, None)
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_killing_a_pool_stops_its_workers(run):
+    async def scenario():
+        # /proc/self resolves to the pid of the worker that reads it.
+        pid = int(await run_cpu_task(os.readlink, "/proc/self", timeout=5))
+        stuck = [asyncio.ensure_future(run_cpu_task(time.sleep, 30, timeout=0.5)) for _ in range(2)]
+        for task in stuck:
+            with pytest.raises(asyncio.TimeoutError):
+                await task
+        for _ in range(100):
+            if not _alive(pid):
+                break
+            await asyncio.sleep(0.02)
+        return pid
+
+    assert not _alive(run(scenario()))
+
+
+def test_large_arguments_go_through_shared_memory(monkeypatch, run):
+    monkeypatch.setattr(process_pool, "CPU_SHARED_MEMORY_THRESHOLD_BYTES", 16)
+
+    assert run(run_cpu_task(len, list(range(10_000)), timeout=30)) == 10_000
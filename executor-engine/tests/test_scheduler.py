@@ -0,0 +1,144 @@
+from collections import Counter
+
+import fakeredis
+
+from services.scheduler import (
+    EXECUTION_QUEUE_KEY,
+    DeficitRoundRobinScheduler,
+    PriorityScheduler,
+    enqueue_execution,
+    promote_due_executions,
+    schedule_execution,
+    tenants_key,
+)
+
+
+async def _enqueue(redis, priority, tenant, count, start=0):
+    for i in range(start, start + count):
+        await enqueue_execution(
+            redis, {"execution_id": f"{tenant}-{i}", "priority": priority, "tenant": tenant}
+        )
+
+
+async def _drain(scheduler, count):
+    return [await scheduler.poll() for _ in range(count)]
+
+
+def test_drr_interleaves_tenants_instead_of_draining_the_backlog(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "batch", "u1", 10)
+        await _enqueue(redis, "batch", "u2", 2)
+        return await _drain(DeficitRoundRobinScheduler(redis, "batch", weights={}), 4)
+
+    served = run(scenario())
+    assert Counter(e.split("-")[0] for e in served) == {"u1": 2, "u2": 2}
+
+
+def test_drr_serves_each_tenant_in_fifo_order(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "batch", "u1", 3)
+        return await _drain(DeficitRoundRobinScheduler(redis, "batch", weights={}), 3)
+
+    assert run(scenario()) == ["u1-0", "u1-1", "u1-2"]
+
+
+def test_drr_shares_by_weight(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "batch", "u1", 20)
+        await _enqueue(redis, "batch", "u2", 20)
+        scheduler = DeficitRoundRobinScheduler(redis, "batch", weights={"u1": 3.0})
+        return await _drain(scheduler, 12)
+
+    served = run(scenario())
+    assert Counter(e.split("-")[0] for e in served) == {"u1": 9, "u2": 3}
+
+
+def test_drr_handles_fractional_weights(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "batch", "u1", 2)
+        scheduler = DeficitRoundRobinScheduler(redis, "batch", weights={"u1": 0.25})
+        return await _drain(scheduler, 2)
+
+    assert run(scenario()) == ["u1-0", "u1-1"]
+
+
+def test_drr_forgets_drained_tenants(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "batch", "u1", 1)
+        scheduler = DeficitRoundRobinScheduler(redis, "batch", weights={})
+        served = await _drain(scheduler, 2)
+        return served, await redis.smembers(tenants_key("batch"))
+
+    served, tenants = run(scenario())
+    assert served == ["u1-0", None]
+    assert tenants == set()
+
+
+def test_strict_priority_drains_higher_classes_first(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "batch", "u1", 2)
+        await _enqueue(redis, "interactive", "u1", 2)
+        await _enqueue(redis, "webhook", "u1", 1)
+        scheduler = PriorityScheduler(redis, mode="strict")
+        return [await scheduler.next_execution_id(timeout=0.01) for _ in range(6)]
+
+    assert run(scenario()) == [
+        "u1-0", "u1-1",  # interactive
+        "u1-0",  # webhook
+        "u1-0", "u1-1",  # batch
+        None,
+    ]
+
+
+def test_strict_priority_serves_classes_from_their_own_queues(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "batch", "b", 1)
+        await _enqueue(redis, "interactive", "i", 1)
+        scheduler = PriorityScheduler(redis, mode="strict")
+        return [await scheduler.next_execution_id(timeout=0.01) for _ in range(2)]
+
+    assert run(scenario()) == ["i-0", "b-0"]
+
+
+def test_weighted_priority_keeps_lower_classes_moving(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await _enqueue(redis, "interactive", "i", 20)
+        await _enqueue(redis, "batch", "b", 20)
+        scheduler = PriorityScheduler(
+            redis, mode="weighted", weights={"interactive": 3.0, "webhook": 1.0, "batch": 1.0}
+        )
+        return [await scheduler.next_execution_id(timeout=0.01) for _ in range(8)]
+
+    served = run(scenario())
+    counts = Counter(e.split("-")[0] for e in served)
+    assert counts["b"] >= 2
+    assert counts["i"] > counts["b"]
+
+
+def test_legacy_queue_is_still_served(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await redis.lpush(EXECUTION_QUEUE_KEY, "legacy-1")
+        return await PriorityScheduler(redis).next_execution_id(timeout=0.01)
+
+    assert run(scenario()) == "legacy-1"
+
+
+def test_due_retries_are_promoted_onto_their_queue(redis_server, run):
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(server=redis_server)
+        await schedule_execution(redis, {"execution_id": "due", "priority": "webhook", "tenant": "u1"}, 0)
+        await schedule_execution(redis, {"execution_id": "later", "priority": "webhook", "tenant": "u1"}, 60)
+        promoted = await promote_due_executions(redis)
+        served = await PriorityScheduler(redis).next_execution_id(timeout=0.01)
+        return promoted, served
+
+    assert run(scenario()) == (1, "due")
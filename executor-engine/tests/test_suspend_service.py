@@ -0,0 +1,212 @@
+import asyncio
+import json
+
+import pytest
+
+from services import imap_watcher, suspend_service
+from services.suspend_service import IMAP_WAITS_KEY, SuspendExecution
+
+
+EXECUTION = {
+    "execution_id": "exec-1",
+    "credentials": {"email": {"id": 3, "platform": "email", "data": {"sender_password": "hunter2"}}},
+}
+
+WAIT = {
+    "type": "imap_reply",
+    "imap_server": "imap.example.com",
+    "username": "me@example.com",
+    "credential": "email",
+    "since_uid": 41,
+    "from_address": "you@example.com",
+    "in_reply_to": "<msg@example.com>",
+}
+
+
+def _capture_arms(monkeypatch):
+    armed = []
+    monkeypatch.setattr(
+        suspend_service, "arm_imap_wait", lambda execution_id, wait, credentials: armed.append((execution_id, wait, credentials))
+    )
+    return armed
+
+
+def test_waiting_info_and_wait_index_hold_no_secrets(shared_redis, monkeypatch, run):
+    armed = _capture_arms(monkeypatch)
+
+    async def scenario():
+        suspension = SuspendExecution(wait=WAIT, timeout_seconds=60, timeout_result={"status": "timeout"})
+        suspension.node_id = 7
+        waiting = await suspend_service.suspend_execution(dict(EXECUTION), suspension)
+        index = await shared_redis.hget(IMAP_WAITS_KEY, "exec-1")
+        return waiting, index
+
+    waiting, index = run(scenario())
+    assert "resume_token" not in waiting
+    assert waiting["waiting_for"] == "imap_reply"
+    assert b"hunter2" not in index
+    assert armed[0][2] == EXECUTION["credentials"]
+
+
+@pytest.fixture(autouse=True)
+def no_armed_waits(monkeypatch):
+    monkeypatch.setattr(suspend_service, "_armed_waits", {})
+
+
+async def _suspend_elsewhere(redis, lease_owner=None):
+    """A wait suspended by another executor, which holds its lease unless lease_owner is None."""
+    suspension = SuspendExecution(wait=WAIT, timeout_seconds=60, timeout_result={})
+    await suspend_service.suspend_execution(dict(EXECUTION), suspension)
+    if lease_owner is None:
+        await redis.delete("execution_resume:imap_lease:exec-1")
+    else:
+        await redis.set("execution_resume:imap_lease:exec-1", lease_owner)
+
+
+def test_unleased_waits_are_rearmed_from_the_stored_baseline(shared_redis, monkeypatch, run):
+    _capture_arms(monkeypatch)
+
+    async def scenario():
+        await _suspend_elsewhere(shared_redis)
+        await shared_redis.hset(IMAP_WAITS_KEY, "gone", json.dumps(WAIT))
+        armed = _capture_arms(monkeypatch)
+        await suspend_service.maintain_imap_waits()
+        lease = await shared_redis.get("execution_resume:imap_lease:exec-1")
+        return armed, await shared_redis.hkeys(IMAP_WAITS_KEY), lease
+
+    armed, remaining, lease = run(scenario())
+    assert [(execution_id, wait["since_uid"]) for execution_id, wait, _ in armed] == [("exec-1", 41)]
+    assert armed[0][2]["email"]["data"]["sender_password"] == "hunter2"
+    assert remaining == [b"exec-1"]
+    assert lease.decode() == suspend_service.EXECUTOR_ID
+
+
+def test_waits_leased_by_a_live_executor_are_left_to_it(shared_redis, monkeypatch, run):
+    _capture_arms(monkeypatch)
+
+    async def scenario():
+        await _suspend_elsewhere(shared_redis, lease_owner="other-executor")
+        armed = _capture_arms(monkeypatch)
+        await suspend_service.maintain_imap_waits()
+        before_expiry = len(armed)
+        # The other executor died and stopped refreshing its lease.
+        await shared_redis.delete("execution_resume:imap_lease:exec-1")
+        await suspend_service.maintain_imap_waits()
+        return before_expiry, len(armed)
+
+    assert run(scenario()) == (0, 1)
+
+
+class _FakeWatcher:
+    def __init__(self):
+        self.unregistered = []
+
+    def unregister(self, waiter):
+        self.unregistered.append(waiter)
+
+
+async def _hold(execution_id):
+    watcher = _FakeWatcher()
+    task = asyncio.get_running_loop().create_task(asyncio.sleep(60))
+    suspend_service._armed_waits[execution_id] = (watcher, "waiter", task)
+    return watcher, task
+
+
+def test_held_leases_are_refreshed(shared_redis, monkeypatch, run):
+    _capture_arms(monkeypatch)
+
+    async def scenario():
+        await _suspend_elsewhere(shared_redis, lease_owner=suspend_service.EXECUTOR_ID)
+        await shared_redis.expire("execution_resume:imap_lease:exec-1", 5)
+        _, task = await _hold("exec-1")
+        await suspend_service.maintain_imap_waits()
+        ttl = await shared_redis.ttl("execution_resume:imap_lease:exec-1")
+        task.cancel()
+        return ttl, "exec-1" in suspend_service._armed_waits
+
+    ttl, still_armed = run(scenario())
+    assert ttl > 5
+    assert still_armed
+
+
+def test_waits_are_dropped_once_the_lease_is_lost_or_the_wait_ends(shared_redis, monkeypatch, run):
+    _capture_arms(monkeypatch)
+
+    async def scenario():
+        await _suspend_elsewhere(shared_redis, lease_owner="other-executor")
+        lost_watcher, lost_task = await _hold("exec-1")
+        ended_watcher, ended_task = await _hold("exec-2")
+        await suspend_service.maintain_imap_waits()
+        await asyncio.sleep(0)
+        return lost_watcher, lost_task, ended_watcher, ended_task
+
+    lost_watcher, lost_task, ended_watcher, ended_task = run(scenario())
+    assert suspend_service._armed_waits == {}
+    assert lost_watcher.unregistered == ["waiter"] and lost_task.cancelled()
+    assert ended_watcher.unregistered == ["waiter"] and ended_task.cancelled()
+
+
+def test_resume_needs_the_right_token(shared_redis, monkeypatch, run):
+    _capture_arms(monkeypatch)
+
+    async def scenario():
+        suspension = SuspendExecution(wait={"type": "timer"}, timeout_seconds=60, timeout_result={})
+        suspension.node_id = 7
+        await suspend_service.suspend_execution(dict(EXECUTION), suspension)
+        state = json.loads(await shared_redis.get("execution_suspended:exec-1"))
+        wrong = await suspend_service.resume_execution("exec-1", {"ok": True}, resume_token="nope")
+        right = await suspend_service.resume_execution("exec-1", {"ok": True}, resume_token=state["resume_token"])
+        again = await suspend_service.resume_execution("exec-1", {"ok": True}, resume_token=state["resume_token"])
+        return wrong, right, again
+
+    assert run(scenario()) == (False, True, False)
+
+
+class _FakeIMAPClient:
+    capabilities: set = set()
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.fetched_from = []
+
+    async def fetch_headers_since(self, last_uid):
+        self.fetched_from.append(last_uid)
+        return [(uid, raw) for uid, raw in self.messages if uid > last_uid]
+
+    async def command(self, line):
+        return []
+
+
+def _headers(sender, in_reply_to=""):
+    return f"From: {sender}\r\nSubject: Re: hi\r\nIn-Reply-To: {in_reply_to}\r\n\r\n".encode()
+
+
+def test_watcher_catches_up_on_replies_that_arrived_before_the_wait(monkeypatch, run):
+    monkeypatch.setattr(imap_watcher, "IMAP_POLL_SECONDS", 0.0)
+    client = _FakeIMAPClient([
+        (40, _headers("you@example.com", "<old@example.com>")),
+        (42, _headers("you@example.com", "<msg@example.com>")),
+        (43, _headers("someone@example.com")),
+    ])
+
+    async def scenario():
+        watcher = imap_watcher.MailboxWatcher("imap.example.com", "me@example.com", "pw")
+        # The watcher (re)started after the reply landed, so its own baseline is past it.
+        watcher._last_uid = 43
+        # Drive _watch directly instead of letting register() start a real connection.
+        watcher._task = asyncio.get_running_loop().create_future()
+        late = watcher.register(from_address="someone@example.com")
+        waiter = watcher.register(from_address="you@example.com", in_reply_to="<msg@example.com>", since_uid=41)
+        watch = asyncio.create_task(watcher._watch(client))
+        try:
+            reply = await asyncio.wait_for(waiter.future, 1)
+            await asyncio.sleep(0.05)
+            return reply, late.future.done()
+        finally:
+            watch.cancel()
+
+    reply, late_done = run(scenario())
+    assert reply["from"] == "you@example.com"
+    # A waiter registered after uid 43 was seen must not match it on the catch-up pass.
+    assert not late_done
+    assert client.fetched_from[0] == 41
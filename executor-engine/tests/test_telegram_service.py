@@ -0,0 +1,115 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import telegram_service
+from services.node_registry import NODE_TYPES
+from services.telegram_service import TelegramSender
+
+
+class _FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.sent))
+
+
+def _sender():
+    sender = TelegramSender("123:abc")
+    sender.bot = _FakeBot()
+    return sender
+
+
+@pytest.mark.parametrize(
+    "chat_id, group",
+    [("12345", False), ("-100123", True), ("@announcements", True)],
+)
+def test_groups_and_channels_get_the_group_interval(chat_id, group):
+    expected = telegram_service.TELEGRAM_GROUP_INTERVAL_SECONDS if group else telegram_service.TELEGRAM_CHAT_INTERVAL_SECONDS
+    assert TelegramSender._chat_interval(None, chat_id) == expected
+
+
+def test_idle_chats_are_pruned(monkeypatch, run):
+    monkeypatch.setattr(telegram_service, "TELEGRAM_CHAT_INTERVAL_SECONDS", 0.0)
+    monkeypatch.setattr(telegram_service, "TELEGRAM_CHAT_PRUNE_SECONDS", 0.0)
+
+    async def scenario():
+        sender = _sender()
+        for chat in range(50):
+            await sender.send(str(chat), "hi")
+        return sender
+
+    sender = run(scenario())
+    assert len(sender.bot.sent) == 50
+    assert sender._chat_locks == {}
+    assert sender._chat_users == {}
+    assert len(sender._chat_next_send) <= 1
+
+
+def test_pacing_survives_until_the_next_send_is_due(monkeypatch, run):
+    monkeypatch.setattr(telegram_service, "TELEGRAM_CHAT_PRUNE_SECONDS", 0.0)
+    monkeypatch.setattr(telegram_service, "TELEGRAM_GROUP_INTERVAL_SECONDS", 0.2)
+
+    async def scenario():
+        sender = _sender()
+        loop = asyncio.get_running_loop()
+        await sender.send("-1", "one")
+        await sender.send("2", "other chat triggers a prune")
+        started = loop.time()
+        await sender.send("-1", "two")
+        return loop.time() - started
+
+    assert run(scenario()) >= 0.15
+
+
+def test_same_chat_sends_stay_in_order(monkeypatch, run):
+    monkeypatch.setattr(telegram_service, "TELEGRAM_CHAT_INTERVAL_SECONDS", 0.0)
+
+    async def scenario():
+        sender = _sender()
+        await asyncio.gather(*(sender.send("7", str(i)) for i in range(5)))
+        return sender
+
+    sender = run(scenario())
+    assert [text for _, text in sender.bot.sent] == ["0", "1", "2", "3", "4"]
+    assert sender._chat_locks == {}
+
+
+def test_time_queued_behind_pacing_does_not_count_against_the_send_timeout(monkeypatch, run):
+    monkeypatch.setattr(telegram_service, "TELEGRAM_CHAT_INTERVAL_SECONDS", 0.1)
+    monkeypatch.setattr(telegram_service, "TELEGRAM_SEND_TIMEOUT_SECONDS", 0.15)
+
+    async def scenario():
+        sender = _sender()
+        await asyncio.gather(*(sender.send("7", str(i)) for i in range(4)))
+        return sender
+
+    sender = run(scenario())
+    assert len(sender.bot.sent) == 4
+
+
+def test_a_hung_bot_api_call_times_out(monkeypatch, run):
+    monkeypatch.setattr(telegram_service, "TELEGRAM_SEND_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        sender = _sender()
+        sender.bot.send_message = lambda chat_id, text: asyncio.sleep(10)
+        with pytest.raises(asyncio.TimeoutError):
+            await sender.send("7", "hi")
+        return sender
+
+    sender = run(scenario())
+    assert sender._chat_locks == {}
+
+
+def test_telegram_nodes_are_not_bounded_as_a_whole():
+    assert NODE_TYPES["telegram"].timeout_seconds == 0
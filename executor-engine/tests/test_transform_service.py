@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+import os
+
+import pytest
+
+from services import transform_service
+from services.transform_service import SandboxPool, TransformError, _compile
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        # Generator frames walk back to the worker's globals.
+        "(x for x in []).gi_frame.f_back.f_globals",
+        "(x for x in []).gi_code",
+        "[].__class__.__base__.__subclasses__()",
+        "(lambda: 0).__globals__",
+        "__builtins__",
+        # str.format resolves attributes the parser cannot see.
+        "'{0.__class__}'.format(1)",
+        "'{x.gi_frame}'.format_map({'x': (y for y in [])})",
+    ],
+)
+def test_frame_walks_and_private_attributes_are_rejected(source):
+    with pytest.raises(TransformError):
+        _compile(source, "eval")
+
+
+# Reads the worker's frames through a traceback caught by a match pattern.
+_MATCH_ESCAPE = """
+try:
+    1 / 0
+except Exception as e:
+    match e:
+        case Exception(__traceback__=tb):
+            pass
+match "{0.tb_frame.f_back.f_locals}":
+    case str(format=fmt):
+        result = fmt(tb)
+"""
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        _MATCH_ESCAPE,
+        "match 1:\n    case int(__class__=cls):\n        result = cls",
+        "match '{0}':\n    case str(format=fmt):\n        result = fmt(1)",
+        "match (x for x in []):\n    case object(gi_frame=frame):\n        result = frame",
+    ],
+)
+def test_match_patterns_cannot_read_attributes_off_the_allow_list(source):
+    with pytest.raises(TransformError):
+        _compile(source, "exec")
+
+
+def test_match_patterns_on_plain_data_are_allowed():
+    _compile("match input:\n    case {'a': int(real=x)}:\n        result = x", "exec")
+
+
+def test_methods_on_plain_data_are_allowed():
+    _compile("{'a': [1, 2]}.get('a').count(1) + ' x '.strip().upper().count('X')", "eval")
+
+
+@pytest.fixture
+def pool(run):
+    pool = SandboxPool(size=1)
+    yield pool
+    pool.close()
+
+
+def _isolated_environ(conn):
+    transform_service._isolate()
+    conn.send(dict(os.environ))
+
+
+def _worker_without_namespaces(conn):
+    transform_service._unshare_network = lambda: "no namespaces here"
+    transform_service._worker_main(conn)
+
+
+def _in_forked_child(target):
+    context = multiprocessing.get_context("fork")
+    conn, child_conn = context.Pipe()
+    process = context.Process(target=target, args=(child_conn,), daemon=True)
+    process.start()
+    child_conn.close()
+    return conn, process
+
+
+def test_workers_drop_the_executor_environment(monkeypatch):
+    monkeypatch.setenv("TRANSFORM_TEST_SECRET", "hunter2")
+    conn, process = _in_forked_child(_isolated_environ)
+    try:
+        assert conn.poll(5)
+        assert conn.recv() == {}
+    finally:
+        process.kill()
+        process.join(1)
+
+
+def test_workers_refuse_transforms_without_network_isolation():
+    conn, process = _in_forked_child(_worker_without_namespaces)
+    try:
+        conn.send(("1 + 1", "eval", {}, 5))
+        assert conn.poll(5)
+        status, message = conn.recv()
+    finally:
+        process.kill()
+        process.join(1)
+    assert status == "error"
+    assert "no namespaces here" in message
+
+
+def test_later_transforms_cannot_see_earlier_ones():
+    conn, process = _in_forked_child(transform_service._worker_main)
+    try:
+        conn.send(("result = 'sk-tenant-a-secret'", "exec", {}, 5))
+        assert conn.recv() == ("ok", "sk-tenant-a-secret")
+        conn.send((_MATCH_ESCAPE, "exec", {}, 5))
+        assert conn.poll(5)
+        status, message = conn.recv()
+    finally:
+        process.kill()
+        process.join(1)
+    assert status == "error"
+    assert "sk-tenant-a-secret" not in message
+
+
+def test_transforms_run_in_the_pool(pool, run):
+    assert run(pool.run("sorted(input)", "eval", {"input": [3, 1, 2]}, 5)) == [1, 2, 3]
+
+
+def test_timed_out_workers_are_replaced(pool, run):
+    async def scenario():
+        with pytest.raises(TimeoutError):
+            await pool.run("sum(range(10 ** 12))", "eval", {}, 0.5)
+        return await pool.run("1 + 1", "eval", {}, 5)
+
+    assert run(scenario()) == 2
+    assert pool._idle.qsize() == 1
+
+
+def test_cancelled_runs_still_return_their_slot(pool, run):
+    async def scenario():
+        task = asyncio.ensure_future(pool.run("sum(range(10 ** 12))", "eval", {}, 5))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await pool.run("2 * 3", "eval", {}, 5)
+
+    assert run(scenario()) == 6
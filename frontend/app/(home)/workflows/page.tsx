@@ -300,6 +300,10 @@ export default function WorkflowHome() {
         toast.success("Execution completed");
       } else if (status === "failed") {
         toast.error("Execution failed");
+      } else if (status === "timed_out") {
+        toast.error("Execution timed out");
+      } else if (status === "cancelled") {
+        toast.error("Execution cancelled");
       }
     } catch (e: any) {
       const msg = e?.response?.data?.detail || e?.message || "Failed to fetch status";
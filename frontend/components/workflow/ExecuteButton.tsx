@@ -94,7 +94,7 @@ export const ExecuteButton: React.FC<ExecuteButtonProps> = ({
           toast.success('Workflow executed successfully');
           setTimeout(() => setStatus('idle'), 3000);
           return;
-        } else if (execStatus === 'failed') {
+        } else if (execStatus === 'failed' || execStatus === 'timed_out' || execStatus === 'cancelled') {
           setStatus('error');
           onExecutionComplete?.();
           toast.error('Workflow execution failed');
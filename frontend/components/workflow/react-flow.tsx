@@ -164,7 +164,7 @@ export default function ReactFlowComponent({ workflowId }: { workflowId?: number
           updateNodeExecutionStatus(nodeId, 'success', result);
           toast.success('Node executed successfully');
           return;
-        } else if (execStatus === 'failed') {
+        } else if (execStatus === 'failed' || execStatus === 'timed_out' || execStatus === 'cancelled') {
           updateNodeExecutionStatus(nodeId, 'error', undefined, error);
           toast.error('Node execution failed');
           return;
@@ -373,7 +373,6 @@ export default function ReactFlowComponent({ workflowId }: { workflowId?: number
         { key: "subject", label: "Subject", type: "text" },
         { key: "msg", label: "Message", type: "textarea" },
         { key: "wait_timeout_seconds", label: "Wait timeout seconds", type: "text" },
-        { key: "poll_interval_seconds", label: "Poll interval seconds", type: "text" },
       ],
     },
     telegram_message: {